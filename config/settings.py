@@ -145,6 +145,73 @@ STATICFILES_STORAGE = "django.contrib.staticfiles.storage.StaticFilesStorage"
 # --------------------------------------------------
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# --------------------------------------------------
+# ALERTES (délais en jours, lus uniquement ici par gestion/alertes.py ;
+# toutes les clés sont requises)
+# --------------------------------------------------
+DELAIS_ALERTES = {
+    'FIDELISATION_CITYPROP': 180,     # Relance Cityprop après intervention
+    'FIDELISATION_CLIMATISEUR': 90,   # Relance Climatiseur après intervention
+    'FIDELISATION_TAPIS': 180,        # Relance Tapis après livraison
+    'RETARD_TAPIS': 11,               # Tapis non livré après ramassage
+}
+
+# --------------------------------------------------
+# PAGINATION (voir gestion/pagination.py)
+# --------------------------------------------------
+# Au-delà de ce nombre de lignes, les listes passent en pagination par curseur
+PAGINATION_SEUIL_CURSEUR = int(os.environ.get("PAGINATION_SEUIL_CURSEUR", 500))
+# Durée (secondes) pendant laquelle le total d'une liste filtrée est réutilisé
+PAGINATION_COMPTE_TTL = int(os.environ.get("PAGINATION_COMPTE_TTL", 30))
+# Au-delà, total estimé par le planificateur (PostgreSQL uniquement) ; vide = toujours exact
+PAGINATION_SEUIL_ESTIMATION = (
+    int(os.environ["PAGINATION_SEUIL_ESTIMATION"]) if os.environ.get("PAGINATION_SEUIL_ESTIMATION") else None
+)
+
+# --------------------------------------------------
+# RECHERCHE CLIENT (voir gestion/recherche.py)
+# --------------------------------------------------
+# Vide = moteur selon la base (FTS5 / pg_trgm) ; "simple" = LIKE sur la table d'index
+RECHERCHE_MOTEUR = os.environ.get("RECHERCHE_MOTEUR", "")
+
+# --------------------------------------------------
+# TÂCHES EN ARRIÈRE-PLAN (voir gestion/taches.py)
+# --------------------------------------------------
+# True : les imports et rendus PDF (brouillards, factures, archives ZIP) sont mis
+# en file et traités par le travailleur, à déployer à côté du serveur web avec les
+# mêmes variables d'environnement :
+#   TACHES_EN_ARRIERE_PLAN=True python manage.py traiter_taches      (service permanent)
+#   ou, par cron : python manage.py traiter_taches --une-fois
+# False (défaut) : les mêmes points d'accès exécutent la tâche dans la requête
+# (aucun travailleur à lancer, mais la requête attend la fin du rendu).
+TACHES_EN_ARRIERE_PLAN = os.environ.get("TACHES_EN_ARRIERE_PLAN", "False") == "True"
+# Durée (s) au-delà de laquelle une tâche en cours est considérée interrompue
+# (travailleur arrêté en cours de tâche) et passe en échec
+TACHES_DUREE_MAXIMUM = int(os.environ.get("TACHES_DUREE_MAXIMUM", 3600))
+# Durée (s) pendant laquelle une vérification à blanc peut être importée par son jeton
+IMPORT_VERIFICATION_VALIDITE = 24 * 3600
+# Durée (s) de conservation des PDF rendus en arrière-plan
+TACHES_PDF_CONSERVATION = int(os.environ.get("TACHES_PDF_CONSERVATION", 24 * 3600))
+
+# --------------------------------------------------
+# RENDU PDF (voir gestion/documents.py)
+# --------------------------------------------------
+# Processus de rendu pour les archives de factures (défaut : nombre de CPU).
+# Utilisé par le travailleur (manage.py traiter_taches) et exporter_factures ;
+# avec TACHES_EN_ARRIERE_PLAN = False, l'archive ZIP est rendue en série dans la requête.
+PDF_PROCESSUS = int(os.environ["PDF_PROCESSUS"]) if os.environ.get("PDF_PROCESSUS") else None
+# Moteur HTML -> PDF : "xhtml2pdf" ou "weasyprint" (voir gestion/pdf.py et comparer_moteurs_pdf)
+PDF_MOTEUR = os.environ.get("PDF_MOTEUR", "xhtml2pdf")
+# Feuilles CSS communes, compilées une fois par processus (WeasyPrint uniquement)
+PDF_FEUILLES_STYLE = []
+
+# --------------------------------------------------
+# FORMULAIRES
+# --------------------------------------------------
+# Le brouillard de caisse envoie 7 champs par ligne : 500 lignes dépassent
+# la limite par défaut de Django (1000 champs)
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
+
 # --------------------------------------------------
 # AUTH / SESSIONS
 # --------------------------------------------------
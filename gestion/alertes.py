@@ -0,0 +1,192 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import CityClimaDetails, TapisDetails, CompteurAlertes
+
+
+# =================================================================
+#  DÉLAIS (settings.DELAIS_ALERTES, seule source lue à l'exécution)
+# =================================================================
+
+# Repli utilisé uniquement si le projet ne définit pas DELAIS_ALERTES.
+DELAIS_PAR_DEFAUT = {
+    'FIDELISATION_CITYPROP': 180,
+    'FIDELISATION_CLIMATISEUR': 90,
+    'FIDELISATION_TAPIS': 180,
+    'RETARD_TAPIS': 11,
+}
+
+STATUTS_LIVRES = ['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT']
+STATUTS_FINAUX = STATUTS_LIVRES + ['ABANDON']
+
+
+def delais():
+    return getattr(settings, 'DELAIS_ALERTES', DELAIS_PAR_DEFAUT)
+
+
+def delai(cle):
+    return delais()[cle]
+
+
+# =================================================================
+#  CALCUL DES ÉCHÉANCES (stockées sur les détails à l'enregistrement)
+# =================================================================
+
+def _en_date(valeur):
+    """Les vues affectent parfois les dates brutes du POST ('AAAA-MM-JJ')."""
+    if isinstance(valeur, str):
+        return parse_date(valeur) if valeur else None
+    return valeur
+
+
+def calculer_echeances(detail, type_commande=None):
+    """
+    Renseigne date_echeance_fidelisation / date_echeance_retard sur le détail.
+    Une échéance vide signifie que la règle ne s'applique pas (pas d'alerte).
+    """
+    if isinstance(detail, CityClimaDetails):
+        type_commande = type_commande or detail.commande.type_commande
+        cle = f'FIDELISATION_{type_commande}'
+        date_intervention = _en_date(detail.date_intervention)
+        if date_intervention and cle in delais():
+            detail.date_echeance_fidelisation = date_intervention + timedelta(days=delai(cle))
+        else:
+            detail.date_echeance_fidelisation = None
+        return detail
+
+    date_livraison = _en_date(detail.date_livraison)
+    if date_livraison and detail.statut in STATUTS_LIVRES:
+        detail.date_echeance_fidelisation = date_livraison + timedelta(days=delai('FIDELISATION_TAPIS'))
+    else:
+        detail.date_echeance_fidelisation = None
+
+    date_ramassage = _en_date(detail.date_ramassage)
+    if date_ramassage and detail.statut not in STATUTS_FINAUX:
+        detail.date_echeance_retard = date_ramassage + timedelta(days=delai('RETARD_TAPIS'))
+    else:
+        detail.date_echeance_retard = None
+    return detail
+
+
+# =================================================================
+#  REGISTRE DES RÈGLES D'ALERTES
+# =================================================================
+
+# Nom de la règle -> modèle, champ d'échéance et filtre complémentaire.
+# Chaque règle se lit "échéance <= aujourd'hui" (index partiel sur l'échéance).
+REGLES = {
+    'alertes_city': {
+        'modele': CityClimaDetails,
+        'echeance': 'date_echeance_fidelisation',
+        'filtre': Q(fidelise=False, commande__type_commande='CITYPROP'),
+    },
+    'alertes_clima': {
+        'modele': CityClimaDetails,
+        'echeance': 'date_echeance_fidelisation',
+        'filtre': Q(fidelise=False, commande__type_commande='CLIMATISEUR'),
+    },
+    'alertes_tapis_fidelisation': {
+        'modele': TapisDetails,
+        'echeance': 'date_echeance_fidelisation',
+        'filtre': Q(fidelise=False),
+    },
+    'alertes_tapis_retard': {
+        'modele': TapisDetails,
+        'echeance': 'date_echeance_retard',
+        'filtre': Q(),
+    },
+}
+
+
+def requete_alerte(nom, jour=None):
+    """Queryset d'une règle d'alerte : parcours d'index sur l'échéance <= jour."""
+    regle = REGLES[nom]
+    jour = jour or timezone.now().date()
+    return regle['modele'].objects.filter(
+        regle['filtre'], **{f"{regle['echeance']}__lte": jour}
+    )
+
+
+def etat_alertes(detail, jour, type_commande=None):
+    """
+    Même règle que requete_alerte, évaluée en Python sur une instance.
+    Retourne l'ensemble des compteurs dans lesquels le détail est compté.
+    """
+    etat = set()
+    if detail is None:
+        return etat
+
+    echeance_fid = detail.date_echeance_fidelisation
+    if isinstance(detail, CityClimaDetails):
+        type_commande = type_commande or detail.commande.type_commande
+        if not detail.fidelise and echeance_fid and echeance_fid <= jour:
+            if type_commande == 'CITYPROP':
+                etat.add('alertes_city')
+            elif type_commande == 'CLIMATISEUR':
+                etat.add('alertes_clima')
+        return etat
+
+    if not detail.fidelise and echeance_fid and echeance_fid <= jour:
+        etat.add('alertes_tapis_fidelisation')
+    if detail.date_echeance_retard and detail.date_echeance_retard <= jour:
+        etat.add('alertes_tapis_retard')
+    return etat
+
+
+# =================================================================
+#  LECTURE / MISE À JOUR DES COMPTEURS PERSISTÉS
+# =================================================================
+
+def calculer_compteurs(jour=None):
+    """Recalcule toutes les alertes depuis les tables (4 COUNT indexés)."""
+    jour = jour or timezone.now().date()
+    return {nom: requete_alerte(nom, jour).count() for nom in REGLES}
+
+
+def recalculer_compteurs(jour=None):
+    """Reconstruit la ligne unique de compteurs pour le jour donné."""
+    jour = jour or timezone.now().date()
+    valeurs = calculer_compteurs(jour)
+    CompteurAlertes.objects.update_or_create(
+        pk=CompteurAlertes.PK_UNIQUE, defaults={**valeurs, 'date_calcul': jour}
+    )
+    return valeurs
+
+
+def lire_compteurs():
+    """
+    Lecture par clé primaire. Si la bascule quotidienne n'a pas encore
+    tourné aujourd'hui, on recalcule une fois (filet de sécurité).
+    """
+    today = timezone.now().date()
+    compteur = CompteurAlertes.objects.filter(pk=CompteurAlertes.PK_UNIQUE).first()
+    if compteur is None or compteur.date_calcul != today:
+        return recalculer_compteurs(today)
+    return {nom: getattr(compteur, nom) for nom in REGLES}
+
+
+def appliquer_variation(avant, apres):
+    """
+    Applique la différence entre deux états (ensembles de compteurs) avec des
+    UPDATE atomiques. Les compteurs d'un autre jour sont ignorés : ils seront
+    reconstruits par la bascule quotidienne.
+    """
+    variations = {}
+    for nom in avant - apres:
+        variations[nom] = F(nom) - 1
+    for nom in apres - avant:
+        variations[nom] = F(nom) + 1
+    if not variations:
+        return
+
+    today = timezone.now().date()
+    transaction.on_commit(
+        lambda: CompteurAlertes.objects.filter(
+            pk=CompteurAlertes.PK_UNIQUE, date_calcul=today
+        ).update(**variations)
+    )
@@ -0,0 +1,260 @@
+import threading
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Q, RowRange, Sum, Value, When, Window
+
+from .models import ClotureCaisse, OperationCaisse
+
+
+# =================================================================
+#  SOLDE HISTORIQUE (solde cumulé maintenu sur chaque opération)
+# =================================================================
+# solde_historique = solde de la caisse après l'opération, dans l'ordre
+# (date, id). Le report d'une période est le solde de la dernière opération
+# qui la précède : une lecture par index, quel que soit l'historique.
+# Après un ajout, une modification ou une suppression, les soldes sont
+# recalculés à partir de la première date touchée (voir signals.py), une
+# seule fois par transaction.
+
+TAILLE_LOT = 500
+
+
+def solde_avant(jour):
+    """Solde de la caisse au début du jour donné (report)."""
+    solde = (
+        OperationCaisse.objects.filter(date__lt=jour).order_by('-date', '-id')
+        .values_list('solde_historique', flat=True).first()
+    )
+    return solde if solde is not None else Decimal(0)
+
+
+def ecarts_soldes(depuis=None):
+    """
+    Parcourt les opérations à partir de la date depuis (toutes si None) et
+    retourne [(id, solde stocké, solde attendu)] des soldes incorrects.
+    """
+    operations = OperationCaisse.objects.order_by('date', 'id')
+    solde = Decimal(0)
+    if depuis is not None:
+        operations = operations.filter(date__gte=depuis)
+        solde = solde_avant(depuis)
+
+    ecarts = []
+    for pk, type_mouvement, montant, stocke in operations.values_list(
+            'id', 'type_mouvement', 'montant', 'solde_historique').iterator(chunk_size=2000):
+        solde += montant if type_mouvement == 'ENTREE' else -montant
+        if stocke != solde:
+            ecarts.append((pk, stocke, solde))
+    return ecarts
+
+
+def recalculer_soldes(depuis=None):
+    """Corrige les soldes à partir de la date depuis ; retourne le nombre de lignes écrites."""
+    ecarts = ecarts_soldes(depuis)
+    OperationCaisse.objects.bulk_update(
+        [OperationCaisse(pk=pk, solde_historique=attendu) for pk, _, attendu in ecarts],
+        ['solde_historique'], batch_size=TAILLE_LOT,
+    )
+    return len(ecarts)
+
+
+_en_attente = threading.local()
+
+
+def _recalculer_en_attente():
+    depuis, _en_attente.depuis = getattr(_en_attente, 'depuis', None), None
+    if depuis is not None:
+        recalculer_soldes(depuis)
+        recalculer_clotures(depuis)
+
+
+def planifier_recalcul_soldes(jour):
+    """
+    Recalcul (soldes puis clôtures) après validation de la transaction en
+    cours, à partir de la plus ancienne date touchée : un formset de 300
+    lignes ne recalcule qu'une fois.
+    """
+    jour = OperationCaisse._meta.get_field('date').to_python(jour)
+    depuis = getattr(_en_attente, 'depuis', None)
+    _en_attente.depuis = jour if depuis is None else min(depuis, jour)
+    transaction.on_commit(_recalculer_en_attente)
+
+
+# =================================================================
+#  ENREGISTREMENT DU BROUILLARD (formset de l'écran de caisse)
+# =================================================================
+# Seules les lignes modifiées sont écrites : un bulk_create pour les
+# nouvelles, un bulk_update pour les modifiées, un DELETE pour les
+# supprimées, dans une transaction. Les écritures en masse n'envoient pas de
+# signaux : le recalcul des soldes est planifié ici, depuis la plus ancienne
+# date touchée (avant ou après modification).
+
+CHAMPS_SAISIE = ('date', 'equipe', 'libelle', 'type_mouvement', 'montant')
+
+
+def enregistrer_brouillard(formset, annee, mois):
+    """
+    Applique un formset valide ; les lignes datées hors du mois sont ignorées.
+    Retourne {'ajoutees', 'modifiees', 'supprimees'}.
+    """
+    debut, fin = bornes_mois(int(annee), int(mois))
+    a_supprimer = set(formset.deleted_forms)
+    supprimees, nouvelles, modifiees, dates = [], [], [], []
+
+    for form in formset.forms:
+        instance = form.instance
+        if form in a_supprimer:
+            if instance.pk:
+                supprimees.append(instance.pk)
+                dates.append(form.initial['date'])
+        elif form.has_changed() and debut <= instance.date < fin:
+            (modifiees if instance.pk else nouvelles).append(instance)
+            dates.append(instance.date)
+            if instance.pk:
+                dates.append(form.initial['date'])
+
+    with transaction.atomic():
+        if supprimees:
+            OperationCaisse.objects.filter(pk__in=supprimees).delete()
+        OperationCaisse.objects.bulk_create(nouvelles, batch_size=TAILLE_LOT)
+        OperationCaisse.objects.bulk_update(modifiees, CHAMPS_SAISIE, batch_size=TAILLE_LOT)
+        if dates:
+            planifier_recalcul_soldes(min(dates))
+
+    return {'ajoutees': len(nouvelles), 'modifiees': len(modifiees), 'supprimees': len(supprimees)}
+
+
+# =================================================================
+#  CLÔTURES MENSUELLES
+# =================================================================
+# Un mois clôturé est lu dans ClotureCaisse ; un mois ouvert est calculé sur
+# ses seules opérations (plage de dates indexée) et le report d'ouverture.
+# Modifier un mois recalcule sa clôture et toutes les suivantes.
+
+def bornes_mois(annee, mois):
+    """Premier jour du mois et premier jour du mois suivant (plage semi-ouverte)."""
+    return date(annee, mois, 1), date(annee + mois // 12, mois % 12 + 1, 1)
+
+
+def calculer_mois(annee, mois):
+    debut, fin = bornes_mois(annee, mois)
+    totaux = OperationCaisse.objects.filter(date__gte=debut, date__lt=fin).aggregate(
+        entrees=Sum('montant', filter=Q(type_mouvement='ENTREE')),
+        sorties=Sum('montant', filter=Q(type_mouvement='SORTIE')),
+        nb_operations=Count('id'),
+    )
+    report = solde_avant(debut)
+    entrees, sorties = totaux['entrees'] or Decimal(0), totaux['sorties'] or Decimal(0)
+    return {
+        'report': report, 'entrees': entrees, 'sorties': sorties,
+        'solde_cloture': report + entrees - sorties, 'nb_operations': totaux['nb_operations'],
+    }
+
+
+def bilan_mois(annee, mois):
+    """Clôture du mois, ou ClotureCaisse non enregistrée (pk None) si le mois est ouvert."""
+    annee, mois = int(annee), int(mois)
+    cloture = ClotureCaisse.objects.filter(annee=annee, mois=mois).first()
+    return cloture or ClotureCaisse(annee=annee, mois=mois, **calculer_mois(annee, mois))
+
+
+def cloturer_mois(annee, mois, utilisateur=None):
+    cloture, _ = ClotureCaisse.objects.update_or_create(
+        annee=annee, mois=mois,
+        defaults={
+            **calculer_mois(annee, mois),
+            'utilisateur': utilisateur if utilisateur and utilisateur.is_authenticated else None,
+        },
+    )
+    return cloture
+
+
+def recalculer_clotures(depuis):
+    """Recalcule les clôtures du mois de la date depuis et des mois suivants."""
+    clotures = ClotureCaisse.objects.filter(
+        Q(annee__gt=depuis.year) | Q(annee=depuis.year, mois__gte=depuis.month)
+    )
+    for cloture in clotures:
+        ClotureCaisse.objects.filter(pk=cloture.pk).update(**calculer_mois(cloture.annee, cloture.mois))
+    return len(clotures)
+
+
+def solde_annuel(annee):
+    """
+    Entrées moins sorties de l'année : mois clôturés lus dans leurs clôtures,
+    mois ouverts agrégés sur leurs plages de dates (une requête).
+    """
+    clotures = ClotureCaisse.objects.filter(annee=annee).values_list('mois', 'entrees', 'sorties')
+    solde = sum((entrees - sorties for _, entrees, sorties in clotures), Decimal(0))
+    clos = {mois for mois, _, _ in clotures}
+
+    # Mois ouverts consécutifs regroupés en une seule plage
+    plages, courante = [], None
+    for mois in range(1, 13):
+        if mois in clos:
+            courante = None
+        elif courante:
+            courante[1] = bornes_mois(annee, mois)[1]
+        else:
+            courante = list(bornes_mois(annee, mois))
+            plages.append(courante)
+    if plages:
+        filtre = Q()
+        for debut, fin in plages:
+            filtre |= Q(date__gte=debut, date__lt=fin)
+        totaux = OperationCaisse.objects.filter(filtre).aggregate(
+            entrees=Sum('montant', filter=Q(type_mouvement='ENTREE')),
+            sorties=Sum('montant', filter=Q(type_mouvement='SORTIE')),
+        )
+        solde += (totaux['entrees'] or 0) - (totaux['sorties'] or 0)
+    return solde
+
+
+# =================================================================
+#  BROUILLARD DE CAISSE (PDF mensuel)
+# =================================================================
+
+LISTE_MOIS = [
+    (1, 'JAN'), (2, 'FÉV'), (3, 'MAR'), (4, 'AVR'),
+    (5, 'MAI'), (6, 'JUN'), (7, 'JUL'), (8, 'AOÛ'),
+    (9, 'SEP'), (10, 'OCT'), (11, 'NOV'), (12, 'DÉC')
+]
+
+GABARIT_BROUILLARD = 'index/pdf_template.html'
+
+
+# Montant signé (entrée +, sortie -) et solde progressif calculés par la base,
+# en décimal exact : mêmes chiffres à l'écran, dans l'Excel et dans le PDF.
+MONTANT_SIGNE = Case(
+    When(type_mouvement='SORTIE', then=-F('montant')),
+    default=F('montant'),
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def operations_mois(annee, mois, report=Decimal(0)):
+    """
+    Opérations du mois dans l'ordre (date, id), annotées de solde_prog :
+    report + cumul des montants signés jusqu'à la ligne (fonction de fenêtre).
+    """
+    debut, fin = bornes_mois(int(annee), int(mois))
+    cumul = Window(
+        Sum(MONTANT_SIGNE), order_by=[F('date').asc(), F('id').asc()], frame=RowRange(start=None, end=0),
+    )
+    return OperationCaisse.objects.filter(date__gte=debut, date__lt=fin).annotate(
+        solde_prog=cumul + Value(report, output_field=DecimalField(max_digits=14, decimal_places=2)),
+    ).order_by('date', 'id')
+
+
+def contexte_brouillard(mois, annee):
+    """Mouvements du mois avec solde progressif, et report des mois précédents."""
+    # Report initial : clôture du mois, ou solde historique avant le mois
+    report_solde = bilan_mois(annee, mois).report
+    return {
+        'mouvements': operations_mois(annee, mois, report_solde),
+        'mois_nom': dict(LISTE_MOIS).get(int(mois), "Inconnu"),
+        'annee': annee,
+        'report_solde': report_solde,
+    }
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Client, Commande
+
+
+# =================================================================
+#  RATTACHEMENT COMMANDE -> CLIENT (numéro normalisé)
+# =================================================================
+
+def trouver_client(numero):
+    """Client existant pour ce numéro (lecture par index unique), ou None."""
+    cle = Client.normaliser_telephone(numero)
+    return Client.objects.filter(telephone=cle).first() if cle else None
+
+
+def rattacher_client(commande):
+    """Renseigne commande.client d'après son numéro (création si nouveau)."""
+    cle = Client.normaliser_telephone(commande.numero_client)
+    if not cle:
+        commande.client = None
+        return None
+    client, _ = Client.objects.get_or_create(
+        telephone=cle,
+        defaults={'nom': commande.nom_client, 'localisation': commande.localisation_client},
+    )
+    commande.client = client
+    return client
+
+
+# =================================================================
+#  AGRÉGATS PAR CLIENT (nombre de commandes, dernière commande, valeur)
+# =================================================================
+
+def _sous_requete(expression):
+    """Agrégat des commandes du client courant (sous-requête corrélée, index FK)."""
+    return Subquery(
+        Commande.objects.filter(client_id=OuterRef('pk')).order_by()
+        .values('client_id').annotate(valeur=expression).values('valeur')
+    )
+
+
+def _derniere_commande(champ):
+    return Subquery(
+        Commande.objects.filter(client_id=OuterRef('pk'))
+        .order_by('-date_creation', '-id').values(champ)[:1]
+    )
+
+
+def recalculer_clients(client_ids, taille_lot=500):
+    """
+    Recalcule les agrégats des clients donnés sur leurs seules commandes, en un
+    UPDATE par lot. Le nom et la localisation suivent la commande la plus récente.
+    """
+    client_ids = list(client_ids)
+    for debut in range(0, len(client_ids), taille_lot):
+        Client.objects.filter(pk__in=client_ids[debut:debut + taille_lot]).update(
+            nb_commandes=Coalesce(_sous_requete(Count('id')), 0),
+            date_derniere_commande=_sous_requete(Max('date_creation')),
+            valeur_totale=Coalesce(_sous_requete(Sum('cout')), 0),
+            nom=Coalesce(_derniere_commande('nom_client'), F('nom')),
+            localisation=Coalesce(_derniere_commande('localisation_client'), F('localisation')),
+        )
+
+
+def recalculer_client(client_id):
+    recalculer_clients([client_id])
+
+
+def planifier_recalcul_client(client_id):
+    """Recalcul après validation de la transaction en cours."""
+    if client_id:
+        transaction.on_commit(lambda: recalculer_client(client_id))
+
+
+def calculer_agregats_clients():
+    """Agrégats attendus de tous les clients ayant des commandes (GROUP BY unique)."""
+    agregats = (
+        Commande.objects.filter(client__isnull=False).values('client_id')
+        .annotate(
+            nb=Count('id'), derniere=Max('date_creation'), valeur=Coalesce(Sum('cout'), 0)
+        )
+    )
+    return {
+        a['client_id']: {
+            'nb_commandes': a['nb'], 'date_derniere_commande': a['derniere'], 'valeur_totale': a['valeur'],
+        }
+        for a in agregats
+    }
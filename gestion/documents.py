@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from .models import DocumentPDF
+from .pdf import html_vers_pdf
+
+
+# =================================================================
+#  RENDU PDF (moteur choisi par PDF_MOTEUR, voir pdf.py)
+# =================================================================
+
+GABARIT_FACTURE = 'index/facture_telechargement.html'
+
+# À incrémenter quand le rendu change sans que le gabarit change
+# (filtres pdf_extras, feuille de style, logo...)
+VERSION_RENDU = 1
+
+
+def parametres_moteur(moteur=None):
+    """Arguments de html_vers_pdf d'après les réglages (moteur imposé si fourni)."""
+    return {
+        'moteur': moteur or getattr(settings, 'PDF_MOTEUR', 'xhtml2pdf'),
+        'base_url': str(settings.STATIC_ROOT),
+        'feuilles': tuple(getattr(settings, 'PDF_FEUILLES_STYLE', ())),
+    }
+
+
+def rendre_pdf(gabarit, contexte, moteur=None):
+    """Octets du PDF, ou None si le moteur signale une erreur."""
+    return html_vers_pdf(get_template(gabarit).render(contexte), **parametres_moteur(moteur))
+
+
+# =================================================================
+#  CACHE DES PDF DE FACTURES (adressé par contenu)
+# =================================================================
+# L'empreinte couvre tout ce que le gabarit affiche : si elle est inchangée,
+# le PDF stocké est servi sans rendu. Les signaux suppriment le PDF stocké
+# dès que la facture ou ses lignes sont modifiées.
+
+@lru_cache(maxsize=None)
+def version_gabarit(gabarit):
+    with open(get_template(gabarit).origin.name, 'rb') as fichier:
+        return hashlib.sha256(fichier.read()).hexdigest()
+
+
+def empreinte_facture(facture):
+    """
+    sha256 de la facture, de ses lignes, du client, de la version du gabarit
+    et du moteur de rendu.
+    facture.lignes et facture.commande devraient être préchargés.
+    """
+    commande = facture.commande
+    donnees = [
+        VERSION_RENDU, version_gabarit(GABARIT_FACTURE), parametres_moteur()['moteur'],
+        facture.pk, facture.type_document, facture.numero_document, facture.date_emission,
+        facture.lieu_emission, facture.objet, facture.signature,
+        facture.taux_reduction_pourcentage, facture.montant_final_net,
+        commande.nom_client, commande.localisation_client, commande.numero_client,
+        [
+            (ligne.pk, ligne.designation, ligne.quantite, ligne.prix_unitaire, ligne.note_prix_unitaire)
+            for ligne in facture.lignes.all()
+        ],
+    ]
+    return hashlib.sha256(json.dumps(donnees, default=str).encode()).hexdigest()
+
+
+def pdf_facture(facture, empreinte=None):
+    """
+    Octets du PDF de la facture : lus en base si l'empreinte correspond,
+    sinon rendus puis stockés. None si le rendu échoue.
+    """
+    empreinte = empreinte or empreinte_facture(facture)
+    contenu = (
+        DocumentPDF.objects.filter(facture_id=facture.pk, empreinte=empreinte)
+        .values_list('contenu', flat=True).first()
+    )
+    if contenu is not None:
+        return bytes(contenu)
+
+    contenu = rendre_pdf(GABARIT_FACTURE, {'facture': facture})
+    if contenu is not None:
+        DocumentPDF.objects.update_or_create(
+            facture_id=facture.pk, defaults={'empreinte': empreinte, 'contenu': contenu}
+        )
+    return contenu
+
+
+def invalider_pdf(facture_id):
+    DocumentPDF.objects.filter(facture_id=facture_id).delete()
+
+
+# =================================================================
+#  ARCHIVE ZIP DES FACTURES (rendu en parallèle)
+# =================================================================
+# Le HTML est produit ici (gabarit Django, données préchargées) ; seule la
+# conversion PDF, coûteuse en CPU, part dans les processus du pool. Les PDF
+# à jour dans le cache sont repris sans rendu, les nouveaux y sont ajoutés.
+
+TAILLE_VAGUE = 32
+
+
+def nom_pdf(facture):
+    return f'{facture.type_document}_CityProp_{facture.numero_document}.pdf'
+
+
+def _ajouter(archive, noms, facture, contenu):
+    nom = nom_pdf(facture)
+    if nom in noms:
+        nom = f'{os.path.splitext(nom)[0]}_{facture.pk}.pdf'
+    noms.add(nom)
+    archive.writestr(nom, contenu)
+
+
+def zip_factures(factures, sortie, processus=None):
+    """
+    Écrit dans sortie (fichier binaire) l'archive ZIP des PDF des factures.
+    Nombre de requêtes constant par vague : factures et lignes préchargées,
+    empreintes et PDF stockés lus en bloc, nouveaux PDF stockés en un bulk_create.
+    Retourne {'documents', 'caches', 'rendus', 'erreurs'}.
+    """
+    factures = list(factures.select_related('commande').prefetch_related('lignes'))
+    empreintes = {facture.pk: empreinte_facture(facture) for facture in factures}
+    a_jour = {
+        facture_id
+        for facture_id, empreinte in DocumentPDF.objects.filter(facture__in=factures).values_list('facture_id', 'empreinte')
+        if empreintes[facture_id] == empreinte
+    }
+    rapport = {'documents': len(factures), 'caches': 0, 'rendus': 0, 'erreurs': []}
+    processus = processus or getattr(settings, 'PDF_PROCESSUS', None) or os.cpu_count()
+    par_pk = {facture.pk: facture for facture in factures}
+
+    with zipfile.ZipFile(sortie, 'w', zipfile.ZIP_DEFLATED) as archive:
+        noms = set()
+
+        # 1. PDF déjà à jour : relus du cache, par paquets
+        ids = sorted(a_jour)
+        for debut in range(0, len(ids), 500):
+            for facture_id, contenu in DocumentPDF.objects.filter(
+                facture_id__in=ids[debut:debut + 500]
+            ).values_list('facture_id', 'contenu').iterator():
+                _ajouter(archive, noms, par_pk[facture_id], bytes(contenu))
+                rapport['caches'] += 1
+
+        # 2. Les autres : rendus par vagues, en parallèle au-delà d'un document
+        a_rendre = [facture for facture in factures if facture.pk not in a_jour]
+        gabarit = get_template(GABARIT_FACTURE)
+        convertir_html = partial(html_vers_pdf, **parametres_moteur())
+        pool = (
+            ProcessPoolExecutor(max_workers=min(processus, len(a_rendre)))
+            if processus > 1 and len(a_rendre) > 1 else None
+        )
+        try:
+            convertir = pool.map if pool else map
+            for debut in range(0, len(a_rendre), TAILLE_VAGUE):
+                vague = a_rendre[debut:debut + TAILLE_VAGUE]
+                nouveaux = []
+                for facture, contenu in zip(vague, convertir(convertir_html, [gabarit.render({'facture': f}) for f in vague])):
+                    if contenu is None:
+                        rapport['erreurs'].append(nom_pdf(facture))
+                        continue
+                    _ajouter(archive, noms, facture, contenu)
+                    nouveaux.append(DocumentPDF(facture_id=facture.pk, empreinte=empreintes[facture.pk], contenu=contenu))
+                DocumentPDF.objects.bulk_create(
+                    nouveaux, update_conflicts=True, unique_fields=['facture'],
+                    update_fields=['empreinte', 'contenu', 'date_creation'],
+                )
+                rapport['rendus'] += len(nouveaux)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        if rapport['erreurs']:
+            archive.writestr('ERREURS.txt', "PDF non générés :\n" + "\n".join(rapport['erreurs']))
+    return rapport
@@ -0,0 +1,263 @@
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .filtres import filtrer_commandes, lire_date, lire_filtres
+from .models import CityClimaDetails, Commande, Facture, FactureLigne, OperationCaisse, TapisDetails
+
+
+# =================================================================
+#  EXPORT DES COMMANDES (une requête jointe, écriture en flux)
+# =================================================================
+# Les lignes sont lues par paquets (values_list + iterator) sur une seule
+# requête LEFT JOIN vers les deux tables de détail : le nombre de requêtes et
+# la mémoire ne dépendent pas du nombre de commandes.
+
+ENTETES = [
+    "Client", "Numéro", "Localisation", "Type", "Date Création",
+    "Désignation / Détails", "Coût (FCFA)", "Date Intervention / Ramassage",
+    "Fin de Traitement", "Prévu Livraison", "Livraison Réelle",
+    "Statut / Satisfaction", "Fidélisé", "Commentaire"
+]
+LARGEURS = [20, 15, 25, 12, 12, 35, 12, 15, 15, 15, 15, 20, 10, 30]
+
+CHAMPS = [
+    'nom_client', 'numero_client', 'localisation_client', 'type_commande', 'date_creation',
+    'cityclimadetails__id', 'cityclimadetails__designation', 'cityclimadetails__cout',
+    'cityclimadetails__date_intervention', 'cityclimadetails__satisfaction', 'cityclimadetails__fidelise',
+    'tapisdetails__id', 'tapisdetails__nombre_tapis', 'tapisdetails__cout',
+    'tapisdetails__date_ramassage', 'tapisdetails__date_traitement', 'tapisdetails__date_prevue_livraison',
+    'tapisdetails__date_livraison', 'tapisdetails__statut', 'tapisdetails__fidelise', 'tapisdetails__commentaire',
+]
+
+SATISFACTIONS = dict(CityClimaDetails.SATISFACTION_CHOICES)
+STATUTS_TAPIS = dict(TapisDetails.STATUT_CHOICES)
+TAILLE_PAQUET = 2000
+
+
+def _date(valeur):
+    return valeur.strftime("%d/%m/%Y") if valeur else "-"
+
+
+def lignes_export(commandes, taille_paquet=TAILLE_PAQUET):
+    """Lignes du fichier d'export (mêmes colonnes que ENTETES), au fil de la lecture."""
+    for (nom, numero, localisation, type_commande, date_creation,
+         city_id, designation, city_cout, date_intervention, satisfaction, city_fidelise,
+         tapis_id, nombre_tapis, tapis_cout, date_ramassage, date_traitement, date_prevue,
+         date_livraison, statut, tapis_fidelise, commentaire) in (
+            commandes.values_list(*CHAMPS).iterator(chunk_size=taille_paquet)):
+
+        details, cout, statut_texte, fidelise, comm = "-", 0, "-", "Non", "-"
+        dates = ["-", "-", "-", "-"]  # Intervention/Ramassage, Fin traitement, Prévue, Réelle
+
+        if type_commande in ["CITYPROP", "CLIMATISEUR"] and city_id:
+            details = designation or "Sans désignation"
+            cout = city_cout or 0
+            dates[0] = _date(date_intervention)
+            statut_texte = SATISFACTIONS.get(satisfaction, satisfaction) if satisfaction else "-"
+            fidelise = "Oui" if city_fidelise else "Non"
+
+        elif type_commande == "TAPISPROP" and tapis_id:
+            details = f"{nombre_tapis} tapis"
+            cout = tapis_cout or 0
+            dates = [_date(date_ramassage), _date(date_traitement), _date(date_prevue), _date(date_livraison)]
+            statut_texte = STATUTS_TAPIS.get(statut, statut)
+            fidelise = "Oui" if tapis_fidelise else "Non"
+            comm = commentaire or "-"
+
+        yield [
+            nom, numero, localisation, type_commande,
+            timezone.localtime(date_creation).strftime("%d/%m/%Y"),
+            details, cout, *dates, statut_texte, fidelise, comm,
+        ]
+
+
+def ecrire_xlsx(lignes, titre="Commandes Détaillées"):
+    """
+    Classeur openpyxl en écriture seule (les lignes ne restent pas en mémoire),
+    enregistré dans un fichier temporaire rembobiné, prêt à être envoyé.
+    """
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(titre)
+    for i, largeur in enumerate(LARGEURS, start=1):
+        feuille.column_dimensions[get_column_letter(i)].width = largeur
+
+    # 🎨 Styles de l'en-tête
+    remplissage = PatternFill(start_color="157347", end_color="157347", fill_type="solid")
+    police = Font(color="FFFFFF", bold=True)
+    centre = Alignment(vertical="center", horizontal="center", wrap_text=True)
+    entete = []
+    for texte in ENTETES:
+        cellule = WriteOnlyCell(feuille, value=texte)
+        cellule.fill, cellule.font, cellule.alignment = remplissage, police, centre
+        entete.append(cellule)
+    feuille.append(entete)
+
+    for ligne in lignes:
+        feuille.append(ligne)
+
+    fichier = tempfile.TemporaryFile()
+    classeur.save(fichier)
+    fichier.seek(0)
+    return fichier
+
+
+# =================================================================
+#  EXPORTS ANALYTIQUES (CSV en flux, Parquet / Feather en colonnes)
+# =================================================================
+# Colonnes typées pour un chargement sans conversion (pandas.read_parquet,
+# read_feather, ou read_csv avec parse_dates) : dates en dates, montants en
+# entiers (FCFA), codes bruts plutôt que libellés. Parquet et Feather
+# nécessitent pyarrow (requirements.txt ; 501 si absent de l'environnement).
+
+def _total_ht():
+    return Subquery(
+        FactureLigne.objects.filter(facture_id=OuterRef('pk')).order_by()
+        .values('facture_id').annotate(total=Sum(F('quantite') * F('prix_unitaire'))).values('total')
+    )
+
+
+# jeu -> (modèle, [(colonne, champ ou annotation, type)], annotations)
+JEUX = {
+    'commandes': (Commande, [
+        ('id', 'id', 'entier'),
+        ('client_id', 'client_id', 'entier'),
+        ('nom_client', 'nom_client', 'texte'),
+        ('numero_client', 'numero_client', 'texte'),
+        ('localisation_client', 'localisation_client', 'texte'),
+        ('type_commande', 'type_commande', 'texte'),
+        ('date_creation', 'date_creation', 'horodatage'),
+        ('date_operation', 'date_operation', 'date'),
+        ('statut', 'statut_code', 'texte'),
+        ('fidelise', 'fidelise', 'booleen'),
+        ('cout', 'cout', 'entier'),
+        ('designation', 'cityclimadetails__designation', 'texte'),
+        ('date_intervention', 'cityclimadetails__date_intervention', 'date'),
+        ('nombre_tapis', 'tapisdetails__nombre_tapis', 'entier'),
+        ('date_ramassage', 'tapisdetails__date_ramassage', 'date'),
+        ('date_traitement', 'tapisdetails__date_traitement', 'date'),
+        ('date_prevue_livraison', 'tapisdetails__date_prevue_livraison', 'date'),
+        ('date_livraison', 'tapisdetails__date_livraison', 'date'),
+        ('commentaire', 'tapisdetails__commentaire', 'texte'),
+    ], {}),
+    'factures': (Facture, [
+        ('id', 'id', 'entier'),
+        ('commande_id', 'commande_id', 'entier'),
+        ('nom_client', 'commande__nom_client', 'texte'),
+        ('numero_client', 'commande__numero_client', 'texte'),
+        ('type_document', 'type_document', 'texte'),
+        ('numero_document', 'numero_document', 'texte'),
+        ('date_emission', 'date_emission', 'date'),
+        ('objet', 'objet', 'texte'),
+        ('total_ht', 'total_ht', 'entier'),
+        ('taux_reduction_pourcentage', 'taux_reduction_pourcentage', 'decimal'),
+        ('montant_final_net', 'montant_final_net', 'entier'),
+    ], {'total_ht': _total_ht}),
+    'caisse': (OperationCaisse, [
+        ('id', 'id', 'entier'),
+        ('date', 'date', 'date'),
+        ('equipe', 'equipe', 'texte'),
+        ('libelle', 'libelle', 'texte'),
+        ('type_mouvement', 'type_mouvement', 'texte'),
+        ('montant', 'montant', 'entier'),
+        ('solde_historique', 'solde_historique', 'entier'),
+    ], {}),
+}
+
+# Colonne de date utilisée par date_debut / date_fin pour les factures et la caisse
+DATES_JEUX = {'factures': 'date_emission', 'caisse': 'date'}
+FORMATS_ANALYTIQUES = ('csv', 'parquet', 'feather')
+
+
+def _convertir(valeur, type_colonne):
+    if valeur is None:
+        return None
+    if type_colonne == 'entier':
+        return int(round(valeur))
+    if type_colonne == 'decimal':
+        return float(valeur)
+    if type_colonne == 'horodatage':
+        return timezone.localtime(valeur)
+    return valeur
+
+
+def requete_jeu(jeu, params):
+    """Requête d'un jeu de données (une seule requête jointe), filtrée d'après params."""
+    modele, colonnes, annotations = JEUX[jeu]
+    qs = modele.objects.annotate(**{nom: fabrique() for nom, fabrique in annotations.items()})
+    if jeu == 'commandes':
+        qs = filtrer_commandes(qs, lire_filtres(params))
+    else:
+        for borne, operateur in (('date_debut', 'gte'), ('date_fin', 'lte')):
+            valeur = lire_date(params.get(borne, ''))
+            if valeur:
+                qs = qs.filter(**{f'{DATES_JEUX[jeu]}__{operateur}': valeur})
+    return qs.order_by('id').values_list(*[champ for _, champ, _ in colonnes])
+
+
+def paquets_jeu(jeu, params, taille_paquet=TAILLE_PAQUET):
+    """Lignes typées, par paquets de taille_paquet (seul un paquet est en mémoire)."""
+    types = [type_colonne for _, _, type_colonne in JEUX[jeu][1]]
+    paquet = []
+    for ligne in requete_jeu(jeu, params).iterator(chunk_size=taille_paquet):
+        paquet.append([_convertir(valeur, type_colonne) for valeur, type_colonne in zip(ligne, types)])
+        if len(paquet) >= taille_paquet:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+
+def flux_csv(jeu, params):
+    """Générateur pour StreamingHttpResponse : en-tête puis un morceau de texte par paquet."""
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon)
+    ecrivain.writerow([colonne for colonne, _, _ in JEUX[jeu][1]])
+    for paquet in paquets_jeu(jeu, params):
+        ecrivain.writerows(
+            [v.isoformat() if isinstance(v, (date, datetime)) else v for v in ligne] for ligne in paquet
+        )
+        yield tampon.getvalue()
+        tampon.seek(0)
+        tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue()
+
+
+def ecrire_arrow(jeu, params, format_fichier):
+    """
+    Fichier Parquet ou Feather (Arrow IPC) écrit paquet par paquet dans un
+    fichier temporaire. ImportError si pyarrow n'est pas installé.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types_arrow = {
+        'entier': pa.int64(), 'decimal': pa.float64(), 'texte': pa.string(), 'booleen': pa.bool_(),
+        'date': pa.date32(), 'horodatage': pa.timestamp('us', tz=settings.TIME_ZONE),
+    }
+    colonnes = JEUX[jeu][1]
+    schema = pa.schema([(colonne, types_arrow[type_colonne]) for colonne, _, type_colonne in colonnes])
+
+    fichier = tempfile.TemporaryFile()
+    if format_fichier == 'parquet':
+        ecrivain = pq.ParquetWriter(fichier, schema, compression='snappy')
+    else:
+        ecrivain = pa.ipc.new_file(fichier, schema)
+    with ecrivain:
+        for paquet in paquets_jeu(jeu, params):
+            valeurs = list(zip(*paquet))
+            ecrivain.write_batch(pa.record_batch(
+                [pa.array(valeurs[i], type=schema.field(i).type) for i in range(len(colonnes))], schema=schema
+            ))
+    fichier.seek(0)
+    return fichier
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+from django.db.models import Q
+
+from .recherche import filtre_recherche
+from .statistiques import bornes_jour
+
+
+# =================================================================
+#  FILTRES DE LA LISTE DES FICHES (partagés avec les exports)
+# =================================================================
+# Les mêmes paramètres GET donnent les mêmes lignes à l'écran et dans le
+# fichier exporté.
+
+PARAMETRES = [
+    'q', 'type_commande', 'statut', 'nom_client', 'numero_client',
+    'date_crea', 'date_debut', 'date_fin', 'fidelise',
+]
+
+
+def lire_filtres(params):
+    """Valeurs des filtres ('' si absents) depuis request.GET."""
+    return {nom: params.get(nom, '') for nom in PARAMETRES}
+
+
+def lire_date(valeur):
+    """Date AAAA-MM-JJ, ou None si absente ou invalide."""
+    try:
+        return datetime.strptime(valeur, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def filtrer_commandes(commandes_qs, filtres):
+    if filtres['q']:
+        commandes_qs = commandes_qs.filter(filtre_recherche(filtres['q']))
+    if filtres['type_commande']:
+        commandes_qs = commandes_qs.filter(type_commande=filtres['type_commande'])
+
+    if filtres['nom_client']:
+        commandes_qs = commandes_qs.filter(nom_client__icontains=filtres['nom_client'])
+
+    if filtres['numero_client']:
+        commandes_qs = commandes_qs.filter(numero_client__icontains=filtres['numero_client'])
+
+    # Jour de création : plage [minuit local, lendemain) sur la colonne indexée
+    date_crea = lire_date(filtres['date_crea'])
+    if date_crea:
+        debut, fin = bornes_jour(date_crea)
+        commandes_qs = commandes_qs.filter(date_creation__gte=debut, date_creation__lt=fin)
+
+    # Statut et fidélisation : colonnes de résumé de la commande (sans jointure)
+    if filtres['statut']:
+        commandes_qs = commandes_qs.filter(statut_code=filtres['statut'])
+
+    if filtres['fidelise'] == "oui":
+        commandes_qs = commandes_qs.filter(fidelise=True)
+    elif filtres['fidelise'] == "non":
+        commandes_qs = commandes_qs.filter(fidelise=False)
+
+    # Filtrage par PLAGE sur la date d'opération (colonne indexée de Commande)
+    date_debut, date_fin = lire_date(filtres['date_debut']), lire_date(filtres['date_fin'])
+    if date_debut:
+        commandes_qs = commandes_qs.filter(date_operation__gte=date_debut)
+    if date_fin:
+        commandes_qs = commandes_qs.filter(date_operation__lte=date_fin)
+
+    return commandes_qs
+
+
+# =================================================================
+#  FILTRES DU TABLEAU DE BORD FINANCIER (partagés avec l'archive ZIP)
+# =================================================================
+
+PARAMETRES_FACTURES = ['start_date', 'end_date', 'type_commande', 'search_name']
+
+
+def lire_filtres_factures(params):
+    """
+    Valeurs des filtres ('' si absents). Une période inversée (Du > Au) est
+    ignorée et signalée par 'periode_inversee'.
+    """
+    filtres = {nom: params.get(nom) or '' for nom in PARAMETRES_FACTURES}
+    filtres['periode_inversee'] = bool(
+        filtres['start_date'] and filtres['end_date'] and filtres['start_date'] > filtres['end_date']
+    )
+    if filtres['periode_inversee']:
+        filtres['start_date'] = filtres['end_date'] = ''
+    return filtres
+
+
+def filtrer_factures(factures_qs, filtres):
+    if filtres['start_date']:
+        factures_qs = factures_qs.filter(date_emission__gte=filtres['start_date'])
+    if filtres['end_date']:
+        factures_qs = factures_qs.filter(date_emission__lte=filtres['end_date'])
+
+    # Filtre par type et recherche par nom/numéro
+    if filtres['type_commande']:
+        factures_qs = factures_qs.filter(commande__type_commande=filtres['type_commande'])
+
+    if filtres['search_name']:
+        factures_qs = factures_qs.filter(
+            filtre_recherche(filtres['search_name'], 'commande_id') |
+            Q(numero_document__icontains=filtres['search_name'])
+        )
+    return factures_qs
@@ -0,0 +1,27 @@
+from django.core.exceptions import ValidationError
+from django.forms import BaseModelFormSet
+
+
+class FormSetBrouillard(BaseModelFormSet):
+    """
+    Formset du brouillard de caisse. Le champ id de chaque ligne est validé
+    sur les opérations du mois déjà chargées par le formset, au lieu d'un
+    SELECT par ligne (comportement de ModelChoiceField) ; un id hors du mois
+    est refusé.
+    """
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        champ_id = form.fields[self.model._meta.pk.name]
+        if not hasattr(self, '_lignes_du_mois'):
+            self._lignes_du_mois = {str(operation.pk): operation for operation in self.get_queryset()}
+
+        def to_python(valeur):
+            if valeur in champ_id.empty_values:
+                return None
+            try:
+                return self._lignes_du_mois[str(valeur)]
+            except KeyError:
+                raise ValidationError(champ_id.error_messages['invalid_choice'], code='invalid_choice')
+
+        champ_id.to_python = to_python
@@ -0,0 +1,582 @@
+import codecs
+import csv
+import gzip
+import hashlib
+import os
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .alertes import calculer_echeances, recalculer_compteurs
+from .clients import recalculer_clients
+from .models import Client, Commande, CityClimaDetails, TapisDetails
+from .recherche import indexer_commandes
+from .statistiques import bornes_jour, recalculer_jour
+
+
+# =================================================================
+#  FORMAT DU FICHIER D'IMPORT (voir generer_modele_excel)
+# =================================================================
+
+# En-tête Excel -> nom de colonne interne
+COLONNES = {
+    'Date': 'date',
+    'Nom Client': 'nom',
+    'Numéro Client': 'numero',
+    'Localisation': 'localisation',
+    'Type Commande': 'type_commande',
+    'Fidélisé': 'fidelise',
+    'Satisfaction / Statut': 'statut',
+    'Date Intervention': 'date_intervention',
+    'Tapis (Nb)': 'nombre_tapis',
+    'Coût': 'cout',
+    'Date Ramassage': 'date_ramassage',
+    'Date Fin Traitement': 'date_traitement',
+    'Date Livraison': 'date_livraison',
+    'Commentaire': 'commentaire',
+}
+
+# Dictionnaire de correspondance (Label Excel -> Code Base de données)
+TRADUCTION_STATUTS = {
+    'En cours': 'NON_RESPECTE',
+    'En attente': 'PRET',
+    'Tapis prêt Client indisponible': 'CLIENT_INDISPO',
+    'Livré - Client satisfait': 'LIVRE_SATISFAIT',
+    'Livré - Client insatisfait': 'LIVRE_INSATISFAIT',
+    'Tapis abandonné': 'ABANDON',
+    'OK': 'OK',
+    'KO_Retouche': 'KO_RET',
+    'KO_Refus': 'KO_REFUS'
+}
+
+COLONNES_OBLIGATOIRES = ['Date', 'Nom Client', 'Numéro Client', 'Localisation', 'Type Commande']
+DATES_OPTIONNELLES = {
+    'date_intervention': 'Date Intervention',
+    'date_ramassage': 'Date Ramassage',
+    'date_traitement': 'Date Fin Traitement',
+    'date_livraison': 'Date Livraison',
+}
+
+VALEURS_OUI = ['oui', 'yes', 'true', '1']
+TYPES_VALIDES = [code for code, _ in Commande.TYPE_CHOICES]
+TYPES_CITYCLIMA = ['CITYPROP', 'CLIMATISEUR']
+TAILLE_LOT = 1000
+
+
+# =================================================================
+#  LECTURE PAR BLOCS (mémoire bornée, XLSX et CSV)
+# =================================================================
+# Chaque bloc est un DataFrame de taille_lot lignes au plus, indexé par la
+# position de la ligne de données (0 = ligne 2 du fichier, sous l'en-tête).
+
+FORMATS_ACCEPTES = ('.xlsx', '.xlsm', '.csv')
+
+
+def format_fichier(nom_fichier):
+    extension = os.path.splitext(nom_fichier or '')[1].lower()
+    if extension not in FORMATS_ACCEPTES:
+        raise ValueError(
+            f"Format de fichier non pris en charge ({extension or 'inconnu'}) : "
+            f"utiliser {', '.join(FORMATS_ACCEPTES)}."
+        )
+    return extension
+
+
+def _ligne_vide(valeurs):
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in valeurs)
+
+
+def _blocs_xlsx(fichier, taille_lot):
+    """openpyxl en lecture seule : les lignes sont lues au fil de l'eau."""
+    classeur = load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        lignes = classeur.active.iter_rows(values_only=True)
+        entete = next(lignes, None)
+        if entete is None:
+            return
+        entete = [str(c).strip() if c is not None else '' for c in entete]
+        largeur = len(entete)
+
+        positions, valeurs = [], []
+        for position, ligne in enumerate(lignes):
+            if _ligne_vide(ligne):
+                continue
+            ligne = tuple(ligne[:largeur]) + (None,) * (largeur - len(ligne))
+            positions.append(position)
+            valeurs.append(ligne)
+            if len(valeurs) >= taille_lot:
+                yield pd.DataFrame(valeurs, columns=entete, index=positions)
+                positions, valeurs = [], []
+        if valeurs:
+            yield pd.DataFrame(valeurs, columns=entete, index=positions)
+    finally:
+        classeur.close()
+
+
+def _blocs_csv(fichier, taille_lot):
+    """read_csv par morceaux ; encodage (UTF-8 ou Windows) et séparateur détectés."""
+    echantillon = fichier.read(64 * 1024)
+    fichier.seek(0)
+    try:
+        texte = codecs.getincrementaldecoder('utf-8')().decode(echantillon, final=False)
+        encodage = 'utf-8-sig'
+    except UnicodeDecodeError:
+        texte, encodage = echantillon.decode('cp1252', errors='replace'), 'cp1252'
+    try:
+        separateur = csv.Sniffer().sniff(texte.splitlines()[0] if texte else '', delimiters=',;\t').delimiter
+    except csv.Error:
+        separateur = ','
+
+    # dtype=str : les numéros gardent leur zéro initial
+    yield from pd.read_csv(
+        fichier, sep=separateur, encoding=encodage, dtype=str,
+        keep_default_na=False, chunksize=taille_lot,
+    )
+
+
+def lire_par_blocs(fichier, nom_fichier, taille_lot=TAILLE_LOT):
+    if format_fichier(nom_fichier) == '.csv':
+        return _blocs_csv(fichier, taille_lot)
+    return _blocs_xlsx(fichier, taille_lot)
+
+
+def estimer_lignes(contenu, nom_fichier):
+    """Nombre de lignes de données (approximatif), pour la progression."""
+    if format_fichier(nom_fichier) == '.csv':
+        return max(contenu.count(b'\n') - 1, 0)
+    classeur = load_workbook(BytesIO(contenu), read_only=True)
+    try:
+        return max((classeur.active.max_row or 1) - 1, 0)
+    finally:
+        classeur.close()
+
+
+# =================================================================
+#  VALIDATION ET CONVERSION (pandas, une passe par colonne)
+# =================================================================
+
+def _texte(serie):
+    """Cellules -> texte nettoyé ; 707123456.0 (numéro lu en nombre) -> '707123456'."""
+    def convertir(valeur):
+        if valeur is None or (isinstance(valeur, float) and pd.isna(valeur)):
+            return ''
+        if isinstance(valeur, float) and valeur.is_integer():
+            return str(int(valeur))
+        return str(valeur).strip()
+    return serie.astype(object).map(convertir)
+
+
+def _dates(serie):
+    """Dates Excel ou texte (JJ/MM/AAAA, AAAA-MM-JJ...) ; NaT si invalide."""
+    return pd.to_datetime(serie, errors='coerce', format='mixed', dayfirst=True).dt.date
+
+
+def _entiers(serie):
+    return pd.to_numeric(serie, errors='coerce').fillna(0).clip(lower=0).astype('int64')
+
+
+def colonnes_manquantes(df):
+    """En-têtes obligatoires absents du fichier."""
+    presentes = {str(c).strip() for c in df.columns}
+    return [c for c in COLONNES_OBLIGATOIRES if c not in presentes]
+
+
+def controler(df):
+    """
+    Valide et convertit un bloc d'un coup, colonne par colonne.
+    Retourne (lignes converties, erreurs, avertissements) : deux séries de
+    messages indexées comme df ('' si rien à signaler). Tous les contrôles en
+    échec d'une ligne sont cités. Un avertissement n'empêche pas l'import.
+    """
+    df = df.rename(columns=lambda c: str(c).strip()).rename(columns=COLONNES)
+    for colonne in COLONNES.values():
+        if colonne not in df.columns:
+            df[colonne] = None
+
+    lignes = pd.DataFrame(index=df.index)
+    lignes['ligne'] = df.index + 2
+    for colonne in ('nom', 'numero', 'localisation', 'commentaire'):
+        lignes[colonne] = _texte(df[colonne])
+    lignes['type_commande'] = _texte(df['type_commande']).str.upper()
+
+    date_brute = _texte(df['date'])
+    lignes['date'] = _dates(df['date'])
+    avertissements = []
+    for colonne, libelle in DATES_OPTIONNELLES.items():
+        lignes[colonne] = _dates(df[colonne])
+        avertissements.append(
+            ((_texte(df[colonne]) != '') & lignes[colonne].isna(), f"{libelle} invalide : ignorée.")
+        )
+
+    lignes['fidelise'] = _texte(df['fidelise']).str.lower().isin(VALEURS_OUI)
+    statut = _texte(df['statut']).replace('', 'En cours')
+    lignes['statut'] = statut.map(TRADUCTION_STATUTS).fillna('NON_RESPECTE')
+    avertissements.insert(0, (
+        ~statut.isin(list(TRADUCTION_STATUTS)), "Statut inconnu : 'En cours' sera appliqué."
+    ))
+    lignes['nombre_tapis'] = _entiers(df['nombre_tapis'])
+    lignes['cout'] = _entiers(df['cout'])
+
+    controles = [
+        (date_brute == '', "La 'Date' (Création) est obligatoire."),
+        ((date_brute != '') & lignes['date'].isna(), "Format de Date invalide."),
+        ((lignes[['nom', 'numero', 'localisation', 'type_commande']] == '').any(axis=1),
+         "Nom, Numéro, Localisation et Type sont obligatoires."),
+        ((lignes['type_commande'] != '') & ~lignes['type_commande'].isin(TYPES_VALIDES),
+         f"Type de commande inconnu (attendu : {', '.join(TYPES_VALIDES)})."),
+    ]
+    return lignes, _messages(controles, df.index), _messages(avertissements, df.index)
+
+
+def _messages(controles, index):
+    message = pd.Series('', index=index, dtype=object)
+    for masque, texte in controles:
+        message[masque] = message[masque] + ' ' + texte
+    return message.str.strip()
+
+
+def preparer(df):
+    """
+    Retourne (lignes valides, erreurs) ; chaque erreur = {'ligne', 'message'},
+    la ligne étant le numéro de ligne Excel (en-tête = ligne 1).
+    """
+    lignes, messages, _ = controler(df)
+    invalides = messages != ''
+    erreurs = [
+        {'ligne': int(ligne), 'message': texte}
+        for ligne, texte in zip(lignes.loc[invalides, 'ligne'], messages[invalides])
+    ]
+    return lignes[~invalides], erreurs
+
+
+# =================================================================
+#  DOUBLONS (une recherche ensembliste sur les clés existantes)
+# =================================================================
+
+def _cle(nom, numero, jour, type_commande):
+    return (nom, numero, jour, type_commande)
+
+
+def cles_existantes(lignes, taille_lot=500):
+    """
+    Clés (nom, numéro, jour, type) déjà en base pour les numéros du fichier.
+    Le jour est celui de date_creation, qui porte la colonne Date du fichier
+    pour les commandes importées (voir _inserer_lot).
+    """
+    numeros = sorted(set(lignes['numero']))
+    cles = set()
+    for debut in range(0, len(numeros), taille_lot):
+        existantes = (
+            Commande.objects.filter(numero_client__in=numeros[debut:debut + taille_lot])
+            .annotate(jour=TruncDate('date_creation'))
+            .values_list('nom_client', 'numero_client', 'jour', 'type_commande')
+        )
+        cles.update(_cle(*valeurs) for valeurs in existantes)
+    return cles
+
+
+def _empreinte(cle):
+    """Empreinte compacte (8 octets) d'une clé, pour suivre les lignes déjà vues."""
+    return hashlib.blake2b(repr(cle).encode(), digest_size=8).digest()
+
+
+def reperer_doublons(lignes, vus=None):
+    """
+    Origine de chaque doublon : 'base' (commande déjà enregistrée), 'fichier'
+    (répétition d'une ligne précédente) ou None.
+    vus : empreintes des clés des blocs précédents (complété au passage).
+    """
+    cles = pd.Series(
+        [_cle(*valeurs) for valeurs in zip(lignes['nom'], lignes['numero'], lignes['date'], lignes['type_commande'])],
+        index=lignes.index, dtype=object,
+    )
+    origine = pd.Series(None, index=lignes.index, dtype=object)
+    origine[cles.isin(cles_existantes(lignes))] = 'base'
+    repetees = cles.duplicated()
+    if vus is not None:
+        empreintes = cles.map(_empreinte)
+        repetees |= empreintes.isin(vus)
+    origine[repetees & origine.isna()] = 'fichier'
+    if vus is not None:
+        vus.update(empreintes[origine.isna()])
+    return origine
+
+
+def retirer_doublons(lignes, vus=None):
+    """Écarte les lignes déjà en base et les répétitions dans le fichier."""
+    doublons = reperer_doublons(lignes, vus).notna()
+    return lignes[~doublons], int(doublons.sum())
+
+
+# =================================================================
+#  INSERTION PAR LOTS (bulk_create) ET DONNÉES DÉRIVÉES
+# =================================================================
+# bulk_create ne déclenche pas les signaux : les échéances, le résumé des
+# commandes, les clients, l'index de recherche, les statistiques et les
+# compteurs d'alertes sont calculés ici explicitement.
+
+def _clients(lignes):
+    """Client par numéro normalisé : une lecture + un bulk_create des nouveaux."""
+    derniers = {}
+    for nom, numero, localisation in zip(lignes['nom'], lignes['numero'], lignes['localisation']):
+        cle = Client.normaliser_telephone(numero)
+        if cle:
+            derniers[cle] = (nom, localisation)
+
+    cles = list(derniers)
+    existants = {}
+    for debut in range(0, len(cles), 500):
+        existants.update(Client.objects.filter(telephone__in=cles[debut:debut + 500]).values_list('telephone', 'id'))
+
+    nouveaux = [
+        Client(telephone=cle, nom=derniers[cle][0], localisation=derniers[cle][1])
+        for cle in cles if cle not in existants
+    ]
+    Client.objects.bulk_create(nouveaux, batch_size=TAILLE_LOT)
+    existants.update((c.telephone, c.pk) for c in nouveaux)
+    return existants
+
+
+def _detail(ligne, commande):
+    if ligne.type_commande in TYPES_CITYCLIMA:
+        return CityClimaDetails(
+            commande=commande,
+            date_intervention=ligne.date_intervention or ligne.date,
+            fidelise=ligne.fidelise,
+            satisfaction=ligne.statut,
+        )
+    return TapisDetails(
+        commande=commande,
+        fidelise=ligne.fidelise,
+        nombre_tapis=ligne.nombre_tapis,
+        cout=ligne.cout,
+        date_ramassage=ligne.date_ramassage or ligne.date,
+        date_traitement=ligne.date_traitement,
+        date_livraison=ligne.date_livraison,
+        statut=ligne.statut,
+        commentaire=ligne.commentaire,
+    )
+
+
+def _inserer_lot(lot, clients):
+    """Insère un lot de lignes validées ; retourne les commandes créées."""
+    commandes, city, tapis = [], [], []
+    for ligne in lot.itertuples(index=False):
+        ligne = ligne._replace(**{
+            champ: None for champ in ('date_intervention', 'date_ramassage', 'date_traitement', 'date_livraison')
+            if pd.isna(getattr(ligne, champ))
+        })
+        commande = Commande(
+            nom_client=ligne.nom, numero_client=ligne.numero,
+            localisation_client=ligne.localisation, type_commande=ligne.type_commande,
+            client_id=clients.get(Client.normaliser_telephone(ligne.numero)),
+            date_creation=bornes_jour(ligne.date)[0],
+        )
+        detail = _detail(ligne, commande)
+        calculer_echeances(detail, type_commande=ligne.type_commande)
+        if isinstance(detail, TapisDetails):
+            commande.tapisdetails = detail
+            tapis.append(detail)
+        else:
+            commande.cityclimadetails = detail
+            city.append(detail)
+        commande.calculer_resume()
+        commandes.append(commande)
+
+    # Les détails reprennent la pk de leur commande au moment de leur propre insertion
+    dates = [commande.date_creation for commande in commandes]
+    Commande.objects.bulk_create(commandes)
+    # date_creation (auto_now_add) est écrasée par l'insertion : on rétablit la
+    # date du fichier, qui sert de clé aux doublons (voir cles_existantes)
+    for commande, date_creation in zip(commandes, dates):
+        commande.date_creation = date_creation
+    Commande.objects.bulk_update(commandes, ['date_creation'], batch_size=TAILLE_LOT)
+    CityClimaDetails.objects.bulk_create(city)
+    TapisDetails.objects.bulk_create(tapis)
+    return commandes
+
+
+def _maj_donnees_derivees(cases, client_ids):
+    """Agrégats clients, statistiques journalières et compteurs d'alertes, une fois par import."""
+    if not cases:
+        return
+
+    def maj():
+        recalculer_clients(sorted(client_ids))
+        for jour, type_commande in cases:
+            recalculer_jour(jour, type_commande)
+        recalculer_compteurs()
+    transaction.on_commit(maj)
+
+
+def _noter_erreurs(rapport, erreurs, limite_erreurs):
+    rapport['erreurs'] += erreurs[:max(limite_erreurs - len(rapport['erreurs']), 0)]
+
+
+def importer_blocs(blocs, progression=None, limite_erreurs=500, deja_valides=False):
+    """
+    Point d'entrée unique de l'import (tâches d'import, voir taches.py).
+    Valide puis insère chaque bloc indépendamment, dans sa propre transaction :
+    la mémoire reste bornée à un bloc. Les lignes invalides sont écartées et
+    signalées, les autres importées.
+    deja_valides : blocs issus d'une vérification à blanc (voir lire_lot),
+    déjà convertis ; seuls les doublons en base sont recherchés à nouveau.
+    progression(rapport) est appelée après chaque bloc.
+    """
+    rapport = {'lignes': 0, 'importes': 0, 'doublons': 0, 'rejetees': 0, 'erreurs': []}
+    cases, client_ids, vus = set(), set(), set()
+    try:
+        for numero, df in enumerate(blocs):
+            if deja_valides:
+                lignes, erreurs = df, []
+            else:
+                manquantes = colonnes_manquantes(df) if numero == 0 else []
+                if manquantes:
+                    raise ValueError(f"Colonnes obligatoires absentes : {', '.join(manquantes)}.")
+                lignes, erreurs = preparer(df)
+            rapport['lignes'] += len(df)
+            rapport['rejetees'] += len(erreurs)
+            _noter_erreurs(rapport, erreurs, limite_erreurs)
+
+            lignes, doublons = retirer_doublons(lignes, vus)
+            rapport['doublons'] += doublons
+            if not lignes.empty:
+                with transaction.atomic():
+                    commandes = _inserer_lot(lignes, _clients(lignes))
+                    indexer_commandes(commandes)
+                rapport['importes'] += len(commandes)
+                cases.update((timezone.localdate(c.date_creation), c.type_commande) for c in commandes)
+                client_ids.update(c.client_id for c in commandes if c.client_id)
+            if progression:
+                progression(rapport)
+    finally:
+        # Même après un échec, les blocs déjà validés ont leurs données dérivées à jour
+        _maj_donnees_derivees(cases, client_ids)
+    return rapport
+
+
+# =================================================================
+#  VÉRIFICATION À BLANC (aucune écriture en base)
+# =================================================================
+# Tout le fichier est contrôlé en une passe : chaque ligne reçoit un résultat
+# (OK, AVERTISSEMENT, DOUBLON, ERREUR) reporté dans un classeur annoté. Les
+# lignes importables sont conservées, déjà converties, dans un lot compressé
+# (JSON Lines + gzip) que l'import réel reprend sans relire le fichier.
+
+COULEURS_RESULTATS = {'AVERTISSEMENT': 'FFF3CD', 'DOUBLON': 'E2E3E5', 'ERREUR': 'F8D7DA'}
+MOTIFS_DOUBLONS = {
+    'base': "Doublon : commande déjà enregistrée (même client, jour et type).",
+    'fichier': "Doublon : répète une ligne précédente du fichier.",
+}
+COLONNES_DATES = ['date', *DATES_OPTIONNELLES]
+
+
+def ecrire_lot(flux, lignes):
+    """Ajoute des lignes validées au lot (flux gzip ouvert en écriture)."""
+    if not lignes.empty:
+        texte = lignes.to_json(orient='records', lines=True, date_format='iso')
+        flux.write((texte if texte.endswith('\n') else texte + '\n').encode('utf-8'))
+
+
+def lire_lot(contenu, taille_lot=TAILLE_LOT):
+    """Relit un lot validé par blocs, dans le format produit par controler()."""
+    with gzip.open(BytesIO(contenu), 'rt', encoding='utf-8') as flux:
+        if not flux.readline():
+            return
+        flux.seek(0)
+        for lignes in pd.read_json(flux, lines=True, dtype=False, chunksize=taille_lot):
+            for colonne in COLONNES_DATES:
+                lignes[colonne] = pd.to_datetime(lignes[colonne], errors='coerce').dt.date
+            yield lignes
+
+
+def _valeur_cellule(valeur):
+    if valeur is None or (not isinstance(valeur, str) and pd.isna(valeur)):
+        return None
+    return valeur
+
+
+class RapportAnnote:
+    """Classeur en écriture seule : lignes d'origine + colonnes Résultat et Détail."""
+
+    def __init__(self):
+        self.classeur = Workbook(write_only=True)
+        self.feuille = self.classeur.create_sheet('Vérification')
+        self.entete = None
+        self.remplissages = {
+            resultat: PatternFill('solid', fgColor=couleur) for resultat, couleur in COULEURS_RESULTATS.items()
+        }
+
+    def ajouter(self, df, resultats, details):
+        if self.entete is None:
+            self.entete = [str(c) for c in df.columns]
+            self.feuille.append(self.entete + ['Résultat', 'Détail'])
+        for valeurs, resultat, detail in zip(df.itertuples(index=False, name=None), resultats, details):
+            cellule = WriteOnlyCell(self.feuille, value=resultat)
+            if resultat in self.remplissages:
+                cellule.fill = self.remplissages[resultat]
+            self.feuille.append([_valeur_cellule(v) for v in valeurs] + [cellule, detail])
+
+    def enregistrer(self):
+        if self.entete is None:
+            self.feuille.append(['Résultat', 'Détail'])
+        sortie = BytesIO()
+        self.classeur.save(sortie)
+        return sortie.getvalue()
+
+
+def verifier_blocs(blocs, progression=None, limite_erreurs=500):
+    """
+    Contrôle tout le fichier sans rien écrire en base.
+    Retourne (rapport, lot validé, classeur annoté en octets).
+    progression(rapport) est appelée après chaque bloc.
+    """
+    rapport = {
+        'lignes': 0, 'valides': 0, 'doublons': 0, 'rejetees': 0, 'avertissements': 0,
+        'erreurs': [], 'colonnes_manquantes': [],
+    }
+    annote, lot, vus = RapportAnnote(), BytesIO(), set()
+    with gzip.GzipFile(fileobj=lot, mode='wb') as flux:
+        for numero, df in enumerate(blocs):
+            if numero == 0:
+                rapport['colonnes_manquantes'] = colonnes_manquantes(df)
+                if rapport['colonnes_manquantes']:
+                    _noter_erreurs(rapport, [{
+                        'ligne': 1,
+                        'message': f"Colonnes obligatoires absentes : {', '.join(rapport['colonnes_manquantes'])}.",
+                    }], limite_erreurs)
+
+            lignes, erreurs, avertissements = controler(df)
+            invalides = erreurs != ''
+            origine = reperer_doublons(lignes[~invalides], vus)
+            ecrire_lot(flux, lignes[~invalides][origine.isna()])
+
+            resultats = pd.Series('OK', index=df.index, dtype=object)
+            resultats[avertissements != ''] = 'AVERTISSEMENT'
+            details = avertissements.copy()
+            for motif, texte in MOTIFS_DOUBLONS.items():
+                doublons = origine.index[origine == motif]
+                resultats[doublons] = 'DOUBLON'
+                details[doublons] = texte
+            resultats[invalides] = 'ERREUR'
+            details[invalides] = erreurs[invalides]
+            annote.ajouter(df, resultats, details)
+
+            rapport['lignes'] += len(df)
+            rapport['valides'] += int(resultats.isin(['OK', 'AVERTISSEMENT']).sum())
+            rapport['doublons'] += int(origine.notna().sum())
+            rapport['rejetees'] += int(invalides.sum())
+            rapport['avertissements'] += int((resultats == 'AVERTISSEMENT').sum())
+            _noter_erreurs(rapport, [
+                {'ligne': int(ligne), 'message': texte}
+                for ligne, texte in zip(lignes.loc[invalides, 'ligne'], erreurs[invalides])
+            ], limite_erreurs)
+            if progression:
+                progression(rapport)
+    return rapport, lot.getvalue(), annote.enregistrer()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from gestion.alertes import recalculer_compteurs
+
+
+class Command(BaseCommand):
+    help = "Bascule quotidienne des compteurs d'alertes (à lancer chaque nuit via cron)."
+
+    def handle(self, *args, **options):
+        valeurs = recalculer_compteurs()
+        self.stdout.write(self.style.SUCCESS(
+            "Compteurs basculés : " + ", ".join(f"{nom}={valeur}" for nom, valeur in valeurs.items())
+        ))
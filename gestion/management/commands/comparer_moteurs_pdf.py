@@ -0,0 +1,147 @@
+import statistics
+import time
+import tracemalloc
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.template.loader import get_template
+
+from gestion.caisse import GABARIT_BROUILLARD, contexte_brouillard
+from gestion.documents import GABARIT_FACTURE, parametres_moteur
+from gestion.models import Commande, Facture, FactureLigne, OperationCaisse
+from gestion.pdf import MOTEURS, MoteurIndisponible
+
+
+class AnnulerDonnees(Exception):
+    """Annule la transaction des données d'exemple."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les moteurs PDF sur une facture représentative et un mois de "
+        "caisse : premier rendu (chargement du moteur compris), latence médiane "
+        "et minimale, pic mémoire Python (tracemalloc) et taille du PDF."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--moteurs', nargs='+', default=list(MOTEURS), help="Moteurs à comparer (défaut : tous).")
+        parser.add_argument('--repetitions', type=int, default=5, help="Rendus mesurés par document (défaut : 5).")
+        parser.add_argument('--facture', type=int, default=None, help="Facture à rendre (défaut : celle qui a le plus de lignes).")
+        parser.add_argument('--mois', type=int, default=None, help="Mois de caisse (défaut : le plus chargé).")
+        parser.add_argument('--annee', type=int, default=None)
+
+    def handle(self, *args, **options):
+        inconnus = set(options['moteurs']) - set(MOTEURS)
+        if inconnus:
+            raise CommandError(f"Moteur(s) inconnu(s) : {', '.join(sorted(inconnus))}.")
+
+        # Les données d'exemple éventuelles sont créées puis annulées
+        try:
+            with transaction.atomic():
+                documents = self.documents(options)
+                raise AnnulerDonnees
+        except AnnulerDonnees:
+            pass
+
+        for libelle, html in documents:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{libelle} ({len(html) // 1024} Ko de HTML)"))
+            for nom in options['moteurs']:
+                self.stdout.write(f"  {nom:<12} {self.mesurer(nom, html, options['repetitions'])}")
+
+    # -----------------------------------------------------------------
+    #  Documents mesurés (HTML rendu une fois : seul le moteur est chronométré)
+    # -----------------------------------------------------------------
+
+    def documents(self, options):
+        facture = self.facture(options['facture'])
+        mois, annee = self.periode_caisse(options['mois'], options['annee'])
+        contexte = contexte_brouillard(mois, annee)
+        return [
+            (f"Facture #{facture.pk} ({facture.lignes.count()} lignes)",
+             get_template(GABARIT_FACTURE).render({'facture': facture})),
+            (f"Brouillard de caisse {mois:02d}/{annee} ({len(contexte['mouvements'])} mouvements)",
+             get_template(GABARIT_BROUILLARD).render(contexte)),
+        ]
+
+    def facture(self, facture_id):
+        if facture_id:
+            try:
+                return Facture.objects.select_related('commande').get(pk=facture_id)
+            except Facture.DoesNotExist:
+                raise CommandError(f"Facture {facture_id} introuvable.")
+        facture = (
+            Facture.objects.select_related('commande').annotate(nb_lignes=Count('lignes'))
+            .order_by('-nb_lignes', '-id').first()
+        )
+        if facture:
+            return facture
+
+        commande = Commande.objects.create(
+            nom_client="Client exemple", numero_client="0700000000",
+            localisation_client="Abidjan", type_commande='CITYPROP',
+        )
+        facture = Facture.objects.create(commande=commande, type_document='FACTURE', objet="Entretien")
+        FactureLigne.objects.bulk_create([
+            FactureLigne(facture=facture, designation=f"Prestation {i}", quantite=i, prix_unitaire=15000)
+            for i in range(1, 13)
+        ])
+        return facture
+
+    def periode_caisse(self, mois, annee):
+        if mois and annee:
+            return mois, annee
+        plus_charge = (
+            OperationCaisse.objects.values('date__year', 'date__month')
+            .annotate(nb=Count('id')).order_by('-nb').first()
+        )
+        if plus_charge:
+            return plus_charge['date__month'], plus_charge['date__year']
+
+        aujourd_hui = date.today()
+        OperationCaisse.objects.bulk_create([
+            OperationCaisse(
+                date=aujourd_hui.replace(day=1 + i % 28), equipe=f"Équipe {i % 4 + 1}", libelle=f"Opération {i}",
+                type_mouvement='SORTIE' if i % 3 else 'ENTREE', montant=5000 + 250 * i,
+            )
+            for i in range(120)
+        ])
+        return aujourd_hui.month, aujourd_hui.year
+
+    # -----------------------------------------------------------------
+    #  Mesures
+    # -----------------------------------------------------------------
+
+    def mesurer(self, nom, html, repetitions):
+        parametres = parametres_moteur(nom)
+        debut = time.perf_counter()
+        try:
+            # Nouvelle instance : le premier rendu inclut le chargement du moteur
+            moteur = MOTEURS[nom](parametres['feuilles'])
+        except MoteurIndisponible as e:
+            return self.style.WARNING(f"indisponible ({e})")
+        try:
+            contenu = moteur.rendre(html, parametres['base_url'])
+        except Exception as e:  # gabarit non pris en charge par ce moteur
+            return self.style.ERROR(f"erreur de rendu ({type(e).__name__} : {e})")
+        premier = time.perf_counter() - debut
+        if contenu is None:
+            return self.style.ERROR("erreur de rendu")
+
+        durees = []
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            moteur.rendre(html, parametres['base_url'])
+            durees.append(time.perf_counter() - debut)
+
+        # Pic mémoire sur un rendu séparé (tracemalloc ralentit les rendus)
+        tracemalloc.start()
+        moteur.rendre(html, parametres['base_url'])
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return (
+            f"premier {premier * 1000:7.0f} ms | médiane {statistics.median(durees) * 1000:7.0f} ms"
+            f" | min {min(durees) * 1000:7.0f} ms | pic {pic / 2**20:6.1f} Mo | PDF {len(contenu) // 1024} Ko"
+        )
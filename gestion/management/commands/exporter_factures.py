@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.documents import zip_factures
+from gestion.filtres import filtrer_factures, lire_filtres_factures
+from gestion.models import Facture
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive ZIP des PDF des factures, avec les filtres du tableau de bord "
+        "financier (rendu en parallèle, PDF déjà à jour repris du cache)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Chemin du fichier ZIP à écrire.")
+        parser.add_argument('--du', dest='start_date', default='', help="Date d'émission minimale (AAAA-MM-JJ).")
+        parser.add_argument('--au', dest='end_date', default='', help="Date d'émission maximale (AAAA-MM-JJ).")
+        parser.add_argument('--type', dest='type_commande', default='', help="CITYPROP, CLIMATISEUR ou TAPISPROP.")
+        parser.add_argument('--recherche', dest='search_name', default='', help="Client ou numéro de facture.")
+        parser.add_argument('--processus', type=int, default=None, help="Processus de rendu (défaut : PDF_PROCESSUS).")
+
+    def handle(self, *args, **options):
+        filtres = lire_filtres_factures(options)
+        if filtres['periode_inversee']:
+            raise CommandError("La date --du est postérieure à la date --au.")
+        factures = filtrer_factures(Facture.objects.filter(type_document='FACTURE'), filtres).order_by('date_emission', 'id')
+
+        with open(options['sortie'], 'wb') as sortie:
+            rapport = zip_factures(factures, sortie, processus=options['processus'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{rapport['documents']} facture(s) : {rapport['rendus']} rendue(s), "
+            f"{rapport['caches']} reprise(s) du cache -> {options['sortie']}"
+        ))
+        if rapport['erreurs']:
+            self.stdout.write(self.style.WARNING(f"{len(rapport['erreurs'])} PDF en erreur (voir ERREURS.txt)."))
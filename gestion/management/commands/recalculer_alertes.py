@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion.alertes import REGLES, calculer_compteurs, recalculer_compteurs
+from gestion.models import CompteurAlertes
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les compteurs d'alertes et les compare aux requêtes actuelles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verifier', action='store_true',
+            help="Compare seulement, sans réécrire (code retour non nul si écart)."
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        attendu = calculer_compteurs(today)
+        compteur = CompteurAlertes.objects.filter(pk=CompteurAlertes.PK_UNIQUE).first()
+
+        ecarts = []
+        for nom in REGLES:
+            stocke = getattr(compteur, nom) if compteur else None
+            if stocke != attendu[nom]:
+                ecarts.append(f"{nom}: stocké={stocke} attendu={attendu[nom]}")
+        if compteur and compteur.date_calcul != today:
+            ecarts.append(f"date_calcul: {compteur.date_calcul} (attendu {today})")
+
+        for ecart in ecarts:
+            self.stdout.write(self.style.WARNING(ecart))
+
+        if options['verifier']:
+            if ecarts:
+                raise CommandError(f"{len(ecarts)} écart(s) détecté(s).")
+            self.stdout.write(self.style.SUCCESS("Compteurs cohérents."))
+            return
+
+        recalculer_compteurs(today)
+        self.stdout.write(self.style.SUCCESS(f"Compteurs reconstruits ({len(ecarts)} écart(s) corrigé(s))."))
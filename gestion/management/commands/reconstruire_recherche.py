@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from gestion.models import Commande, IndexRecherche
+from gestion.recherche import indexer_commandes
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche client (nom, localisation, téléphone) de toutes les commandes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taille = options['taille_lot']
+        commandes = Commande.objects.only('nom_client', 'numero_client', 'localisation_client').order_by('pk')
+
+        total = 0
+        with transaction.atomic():
+            IndexRecherche.objects.all().delete()
+            lot = []
+            for commande in commandes.iterator(chunk_size=taille):
+                lot.append(commande)
+                if len(lot) >= taille:
+                    total += indexer_commandes(lot, taille)
+                    lot = []
+            if lot:
+                total += indexer_commandes(lot, taille)
+
+            if connection.vendor == 'sqlite':
+                # Resynchronise la table FTS5 avec la table d'index
+                with connection.cursor() as curseur:
+                    curseur.execute("INSERT INTO gestion_recherche_fts(gestion_recherche_fts) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f"{total} commande(s) indexée(s)."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.models import StatistiqueJournaliere
+from gestion.statistiques import CHAMPS, calculer_tout, reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les statistiques journalières du tableau de bord depuis les commandes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verifier', action='store_true',
+            help="Compare seulement, sans réécrire (code retour non nul si écart)."
+        )
+
+    def handle(self, *args, **options):
+        if not options['verifier']:
+            nb = reconstruire()
+            self.stdout.write(self.style.SUCCESS(f"{nb} case(s) (jour, type) reconstruite(s)."))
+            return
+
+        attendu = calculer_tout()
+        stocke = {
+            (s.jour, s.type_commande): {champ: getattr(s, champ) for champ in CHAMPS}
+            for s in StatistiqueJournaliere.objects.all()
+        }
+        ecarts = [
+            f"{cle[0]} {cle[1]} : stocké={stocke.get(cle)} attendu={attendu.get(cle)}"
+            for cle in sorted(set(attendu) | set(stocke), key=lambda c: (str(c[0]), c[1]))
+            if stocke.get(cle) != attendu.get(cle)
+        ]
+        for ecart in ecarts:
+            self.stdout.write(self.style.WARNING(ecart))
+        if ecarts:
+            raise CommandError(f"{len(ecarts)} écart(s) détecté(s).")
+        self.stdout.write(self.style.SUCCESS("Statistiques cohérentes."))
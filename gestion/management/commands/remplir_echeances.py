@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from gestion.alertes import calculer_echeances, recalculer_compteurs
+from gestion.models import CityClimaDetails, TapisDetails
+
+
+class Command(BaseCommand):
+    help = "Calcule les échéances d'alerte des détails existants (après un changement de délais)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taille = options['taille_lot']
+        champs = {
+            CityClimaDetails: ['date_echeance_fidelisation'],
+            TapisDetails: ['date_echeance_fidelisation', 'date_echeance_retard'],
+        }
+
+        for modele, champs_maj in champs.items():
+            lot, total = [], 0
+            for detail in modele.objects.select_related('commande').iterator(chunk_size=taille):
+                lot.append(calculer_echeances(detail))
+                if len(lot) >= taille:
+                    total += modele.objects.bulk_update(lot, champs_maj)
+                    lot = []
+            if lot:
+                total += modele.objects.bulk_update(lot, champs_maj)
+            self.stdout.write(f"{modele.__name__} : {total} ligne(s) mise(s) à jour.")
+
+        recalculer_compteurs()
+        self.stdout.write(self.style.SUCCESS("Échéances remplies et compteurs d'alertes reconstruits."))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from gestion.taches import traiter_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Travailleur de la file de tâches en base (rendus PDF, imports de commandes). "
+        "Tourne en continu, ou une seule fois avec --une-fois (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help="Vide la file puis s'arrête.")
+        parser.add_argument('--intervalle', type=float, default=2.0, help="Attente (s) quand la file est vide.")
+
+    def handle(self, *args, **options):
+        if options['une_fois']:
+            nb = traiter_file()
+            self.stdout.write(self.style.SUCCESS(f"{nb} tâche(s) traitée(s)."))
+            return
+
+        self.stdout.write("Travailleur démarré (Ctrl+C pour arrêter).")
+        try:
+            while True:
+                # Comme entre deux requêtes web : une connexion coupée ou trop
+                # ancienne (CONN_MAX_AGE) est refermée puis rouverte
+                close_old_connections()
+                try:
+                    nb = traiter_file()
+                except DatabaseError as e:
+                    self.stderr.write(f"Erreur de base de données ({e}) : nouvel essai.")
+                    nb = 0
+                if nb:
+                    self.stdout.write(self.style.SUCCESS(f"{nb} tâche(s) traitée(s)."))
+                else:
+                    time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            self.stdout.write("Travailleur arrêté.")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.models import Client
+from gestion.clients import calculer_agregats_clients, recalculer_client
+
+CHAMPS = ('nb_commandes', 'date_derniere_commande', 'valeur_totale')
+VIDE = {'nb_commandes': 0, 'date_derniere_commande': None, 'valeur_totale': 0}
+
+
+class Command(BaseCommand):
+    help = "Vérifie (et répare avec --reparer) les agrégats maintenus sur les clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparer', action='store_true', help="Recalcule les clients incohérents.")
+
+    def handle(self, *args, **options):
+        attendu = calculer_agregats_clients()
+
+        incoherents = []
+        for client in Client.objects.only(*CHAMPS).iterator(chunk_size=2000):
+            stocke = {champ: getattr(client, champ) for champ in CHAMPS}
+            if stocke != attendu.get(client.pk, VIDE):
+                incoherents.append(client.pk)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"Client #{client.pk} : stocké={stocke} attendu={attendu.get(client.pk, VIDE)}")
+
+        if options['reparer']:
+            for client_id in incoherents:
+                recalculer_client(client_id)
+
+        if not incoherents:
+            self.stdout.write(self.style.SUCCESS("Agrégats clients cohérents."))
+        elif options['reparer']:
+            self.stdout.write(self.style.SUCCESS(f"{len(incoherents)} client(s) réparé(s)."))
+        else:
+            raise CommandError(f"{len(incoherents)} client(s) incohérent(s) (relancer avec --reparer).")
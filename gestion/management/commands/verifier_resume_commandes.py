@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.clients import recalculer_clients
+from gestion.models import Commande
+
+
+class Command(BaseCommand):
+    help = "Vérifie (et répare avec --reparer) les colonnes de résumé dénormalisées de Commande."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparer', action='store_true', help="Réécrit les lignes incohérentes.")
+        parser.add_argument('--taille-lot', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        taille = options['taille_lot']
+        champs = list(Commande.CHAMPS_RESUME)
+        commandes = Commande.objects.select_related('cityclimadetails', 'tapisdetails').order_by('id')
+
+        incoherentes, lot, clients = 0, [], set()
+        for commande in commandes.iterator(chunk_size=taille):
+            stocke = {champ: getattr(commande, champ) for champ in champs}
+            if commande.calculer_resume() == stocke:
+                continue
+            incoherentes += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Commande #{commande.pk} : stocké={stocke}")
+            if options['reparer']:
+                lot.append(commande)
+                if commande.client_id:
+                    clients.add(commande.client_id)
+                if len(lot) >= taille:
+                    Commande.objects.bulk_update(lot, champs)
+                    lot = []
+        if lot:
+            Commande.objects.bulk_update(lot, champs)
+        # bulk_update n'envoie pas de signaux : la valeur totale des clients suit le coût réparé
+        recalculer_clients(clients)
+
+        if not incoherentes:
+            self.stdout.write(self.style.SUCCESS("Résumés des commandes cohérents."))
+        elif options['reparer']:
+            self.stdout.write(self.style.SUCCESS(f"{incoherentes} commande(s) réparée(s)."))
+        else:
+            raise CommandError(f"{incoherentes} commande(s) incohérente(s) (relancer avec --reparer).")
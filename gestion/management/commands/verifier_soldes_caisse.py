@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.caisse import ecarts_soldes, recalculer_soldes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le solde cumulé de toutes les opérations de caisse et le compare "
+        "au solde historique stocké (répare avec --reparer)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparer', action='store_true', help="Réécrit les soldes incorrects.")
+
+    def handle(self, *args, **options):
+        ecarts = ecarts_soldes()
+        if options['verbosity'] > 1:
+            for pk, stocke, attendu in ecarts[:50]:
+                self.stdout.write(f"Opération #{pk} : stocké={stocke} attendu={attendu}")
+
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS("Soldes de caisse cohérents."))
+        elif options['reparer']:
+            recalculer_soldes()
+            self.stdout.write(self.style.SUCCESS(f"{len(ecarts)} solde(s) réparé(s)."))
+        else:
+            raise CommandError(
+                f"{len(ecarts)} solde(s) incorrect(s), à partir de l'opération #{ecarts[0][0]} "
+                f"(relancer avec --reparer)."
+            )
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0025_alter_cityclimadetails_satisfaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurAlertes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alertes_city', models.IntegerField(default=0)),
+                ('alertes_clima', models.IntegerField(default=0)),
+                ('alertes_tapis_fidelisation', models.IntegerField(default=0)),
+                ('alertes_tapis_retard', models.IntegerField(default=0)),
+                ('date_calcul', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': "Compteur d'alertes",
+                'verbose_name_plural': "Compteurs d'alertes",
+            },
+        ),
+    ]
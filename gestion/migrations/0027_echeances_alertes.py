@@ -0,0 +1,92 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:38
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copie figée de gestion/alertes.py (délais et calculer_echeances)
+DELAIS_PAR_DEFAUT = {
+    'FIDELISATION_CITYPROP': 180,
+    'FIDELISATION_CLIMATISEUR': 90,
+    'FIDELISATION_TAPIS': 180,
+    'RETARD_TAPIS': 11,
+}
+STATUTS_LIVRES = ['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT']
+STATUTS_FINAUX = STATUTS_LIVRES + ['ABANDON']
+
+
+def _delai(cle):
+    return getattr(settings, 'DELAIS_ALERTES', {}).get(cle, DELAIS_PAR_DEFAUT[cle])
+
+
+def remplir_echeances(apps, schema_editor):
+    """Échéances des détails existants (seules les échéances non vides sont écrites)."""
+    CityClimaDetails = apps.get_model('gestion', 'CityClimaDetails')
+    TapisDetails = apps.get_model('gestion', 'TapisDetails')
+
+    lot = []
+    details = CityClimaDetails.objects.exclude(date_intervention=None).values_list(
+        'id', 'commande__type_commande', 'date_intervention'
+    )
+    for pk, type_commande, date_intervention in details.iterator(chunk_size=2000):
+        cle = f'FIDELISATION_{type_commande}'
+        if cle in DELAIS_PAR_DEFAUT:
+            lot.append(CityClimaDetails(
+                pk=pk, date_echeance_fidelisation=date_intervention + timedelta(days=_delai(cle)),
+            ))
+    CityClimaDetails.objects.bulk_update(lot, ['date_echeance_fidelisation'], batch_size=500)
+
+    lot = []
+    tapis = TapisDetails.objects.values_list('id', 'statut', 'date_livraison', 'date_ramassage')
+    for pk, statut, date_livraison, date_ramassage in tapis.iterator(chunk_size=2000):
+        detail = TapisDetails(pk=pk)
+        if date_livraison and statut in STATUTS_LIVRES:
+            detail.date_echeance_fidelisation = date_livraison + timedelta(days=_delai('FIDELISATION_TAPIS'))
+        if date_ramassage and statut not in STATUTS_FINAUX:
+            detail.date_echeance_retard = date_ramassage + timedelta(days=_delai('RETARD_TAPIS'))
+        if detail.date_echeance_fidelisation or detail.date_echeance_retard:
+            lot.append(detail)
+    TapisDetails.objects.bulk_update(
+        lot, ['date_echeance_fidelisation', 'date_echeance_retard'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0026_compteuralertes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cityclimadetails',
+            name='date_echeance_fidelisation',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tapisdetails',
+            name='date_echeance_fidelisation',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tapisdetails',
+            name='date_echeance_retard',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cityclimadetails',
+            index=models.Index(condition=models.Q(('fidelise', False)), fields=['date_echeance_fidelisation'], name='city_echeance_fid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tapisdetails',
+            index=models.Index(condition=models.Q(('fidelise', False)), fields=['date_echeance_fidelisation'], name='tapis_echeance_fid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tapisdetails',
+            index=models.Index(condition=models.Q(('date_echeance_retard__isnull', False)), fields=['date_echeance_retard'], name='tapis_echeance_retard_idx'),
+        ),
+        # Les compteurs (table vide) sont recalculés à la première lecture
+        migrations.RunPython(remplir_echeances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0027_echeances_alertes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('type_commande', models.CharField(choices=[('CITYPROP', 'Cityprop'), ('CLIMATISEUR', 'Climatiseur'), ('TAPISPROP', 'Tapisprop')], max_length=20)),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('nb_ko', models.PositiveIntegerField(default=0)),
+                ('nb_non_fidelises', models.PositiveIntegerField(default=0)),
+                ('nb_livraisons', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'ordering': ['jour', 'type_commande'],
+                'constraints': [models.UniqueConstraint(fields=('jour', 'type_commande'), name='stat_jour_type_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:42
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+
+def remplir_resume(apps, schema_editor):
+    """
+    Résumé des commandes existantes (copie figée de Commande.calculer_resume) :
+    date d'opération, statut, fidélisation et coût du détail principal.
+    """
+    Commande = apps.get_model('gestion', 'Commande')
+
+    commandes = Commande.objects.order_by('id').values_list(
+        'id', 'type_commande', 'date_creation',
+        'tapisdetails__id', 'tapisdetails__date_ramassage', 'tapisdetails__statut',
+        'tapisdetails__fidelise', 'tapisdetails__cout',
+        'cityclimadetails__id', 'cityclimadetails__date_intervention', 'cityclimadetails__satisfaction',
+        'cityclimadetails__fidelise', 'cityclimadetails__cout',
+    )
+    lot = []
+    for pk, type_commande, date_creation, *details in commandes.iterator(chunk_size=2000):
+        tapis, city = details[:5], details[5:]
+        # Détail principal : le tapis d'une commande TAPISPROP, sinon le CityClima
+        if tapis[0] and (type_commande == 'TAPISPROP' or not city[0]):
+            detail = tapis
+        else:
+            detail = city if city[0] else None
+
+        commande = Commande(pk=pk, date_operation=timezone.localdate(date_creation or timezone.now()))
+        if detail is not None:
+            _, date_operation, statut, fidelise, cout = detail
+            commande.date_operation = date_operation or commande.date_operation
+            commande.statut_code = statut or ''
+            commande.fidelise = fidelise
+            commande.cout = cout or 0
+        lot.append(commande)
+        if len(lot) >= 500:
+            Commande.objects.bulk_update(lot, ['date_operation', 'statut_code', 'fidelise', 'cout'])
+            lot = []
+    Commande.objects.bulk_update(lot, ['date_operation', 'statut_code', 'fidelise', 'cout'])
+
+
+def remplir_statistiques(apps, schema_editor):
+    """
+    Agrégats journaliers de l'historique (table créée par 0028), calculés sur
+    le résumé qui vient d'être rempli : copie figée de statistiques.reconstruire.
+    """
+    Commande = apps.get_model('gestion', 'Commande')
+    StatistiqueJournaliere = apps.get_model('gestion', 'StatistiqueJournaliere')
+
+    lignes = (
+        Commande.objects.annotate(jour=TruncDate('date_creation'))
+        .values('jour', 'type_commande')
+        .annotate(
+            nb_commandes=Count('id'),
+            nb_ko=Count('id', filter=Q(statut_code='KO_RET')),
+            nb_non_fidelises=Count('id', filter=Q(fidelise=False)),
+            nb_livraisons=Count('id', filter=Q(statut_code__in=['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT'])),
+            chiffre_affaires=Coalesce(Sum('cout'), 0),
+        )
+        .order_by()
+    )
+    StatistiqueJournaliere.objects.all().delete()
+    StatistiqueJournaliere.objects.bulk_create([StatistiqueJournaliere(**ligne) for ligne in lignes], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0028_statistiquejournaliere'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='cout',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='date_operation',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='fidelise',
+            field=models.BooleanField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='statut_code',
+            field=models.CharField(blank=True, default='', editable=False, max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_operation', 'id'], name='cmd_date_op_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['type_commande', 'date_operation'], name='cmd_type_date_op_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut_code', 'date_operation'], name='cmd_statut_date_op_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['fidelise', 'date_operation'], name='cmd_fidelise_date_op_idx'),
+        ),
+        migrations.RunPython(remplir_resume, migrations.RunPython.noop),
+        migrations.RunPython(remplir_statistiques, migrations.RunPython.noop),
+    ]
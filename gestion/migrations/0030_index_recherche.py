@@ -0,0 +1,112 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:48
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Index plein texte selon la base : FTS5 (trigrammes) sur SQLite,
+# pg_trgm sur PostgreSQL. Les autres bases gardent la recherche LIKE.
+SQLITE_CREATION = [
+    """CREATE VIRTUAL TABLE gestion_recherche_fts USING fts5(
+        contenu, telephone,
+        content='gestion_indexrecherche', content_rowid='commande_id',
+        tokenize='trigram'
+    )""",
+    """CREATE TRIGGER gestion_recherche_ai AFTER INSERT ON gestion_indexrecherche BEGIN
+        INSERT INTO gestion_recherche_fts(rowid, contenu, telephone)
+        VALUES (new.commande_id, new.contenu, new.telephone);
+    END""",
+    """CREATE TRIGGER gestion_recherche_ad AFTER DELETE ON gestion_indexrecherche BEGIN
+        INSERT INTO gestion_recherche_fts(gestion_recherche_fts, rowid, contenu, telephone)
+        VALUES ('delete', old.commande_id, old.contenu, old.telephone);
+    END""",
+    """CREATE TRIGGER gestion_recherche_au AFTER UPDATE ON gestion_indexrecherche BEGIN
+        INSERT INTO gestion_recherche_fts(gestion_recherche_fts, rowid, contenu, telephone)
+        VALUES ('delete', old.commande_id, old.contenu, old.telephone);
+        INSERT INTO gestion_recherche_fts(rowid, contenu, telephone)
+        VALUES (new.commande_id, new.contenu, new.telephone);
+    END""",
+]
+SQLITE_SUPPRESSION = [
+    "DROP TRIGGER IF EXISTS gestion_recherche_au",
+    "DROP TRIGGER IF EXISTS gestion_recherche_ad",
+    "DROP TRIGGER IF EXISTS gestion_recherche_ai",
+    "DROP TABLE IF EXISTS gestion_recherche_fts",
+]
+POSTGRESQL_CREATION = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX gestion_recherche_contenu_trgm ON gestion_indexrecherche USING gin (contenu gin_trgm_ops)",
+    "CREATE INDEX gestion_recherche_tel_trgm ON gestion_indexrecherche USING gin (telephone gin_trgm_ops)",
+]
+POSTGRESQL_SUPPRESSION = [
+    "DROP INDEX IF EXISTS gestion_recherche_tel_trgm",
+    "DROP INDEX IF EXISTS gestion_recherche_contenu_trgm",
+]
+
+
+def _executer(schema_editor, requetes):
+    for requete in requetes.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(requete)
+
+
+def creer_index_texte(apps, schema_editor):
+    _executer(schema_editor, {'sqlite': SQLITE_CREATION, 'postgresql': POSTGRESQL_CREATION})
+
+
+def supprimer_index_texte(apps, schema_editor):
+    _executer(schema_editor, {'sqlite': SQLITE_SUPPRESSION, 'postgresql': POSTGRESQL_SUPPRESSION})
+
+
+def _normaliser(texte):
+    # Copie figée de recherche.normaliser
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texte.lower()))
+
+
+def indexer_commandes(apps, schema_editor):
+    """Index des commandes existantes ; les déclencheurs alimentent la table FTS5."""
+    Commande = apps.get_model('gestion', 'Commande')
+    IndexRecherche = apps.get_model('gestion', 'IndexRecherche')
+
+    commandes = Commande.objects.order_by('id').values_list(
+        'id', 'nom_client', 'localisation_client', 'numero_client'
+    )
+    lot = []
+    for pk, nom, localisation, numero in commandes.iterator(chunk_size=2000):
+        lot.append(IndexRecherche(
+            commande_id=pk,
+            contenu=_normaliser(' '.join([nom, localisation, numero])),
+            telephone=re.sub(r'\D', '', numero or ''),
+        ))
+        if len(lot) >= 1000:
+            IndexRecherche.objects.bulk_create(lot)
+            lot = []
+    IndexRecherche.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0029_resume_commande'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexRecherche',
+            fields=[
+                ('commande', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='index_recherche', serialize=False, to='gestion.commande')),
+                ('contenu', models.TextField(blank=True, default='')),
+                ('telephone', models.CharField(blank=True, default='', max_length=50)),
+            ],
+            options={
+                'verbose_name': 'Index de recherche',
+                'verbose_name_plural': 'Index de recherche',
+            },
+        ),
+        migrations.RunPython(creer_index_texte, supprimer_index_texte),
+        migrations.RunPython(indexer_commandes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:50
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _normaliser_telephone(numero):
+    # Copie figée de Client.normaliser_telephone
+    chiffres = re.sub(r'\D', '', numero or '')
+    if chiffres.startswith('00'):
+        chiffres = chiffres[2:]
+    if chiffres.startswith('225') and len(chiffres) == 13:
+        chiffres = chiffres[3:]
+    return chiffres
+
+
+def regrouper_clients(apps, schema_editor):
+    """
+    Un client par numéro normalisé : les commandes dont le numéro ne diffère
+    que par la mise en forme (espaces, +225...) sont fusionnées sur le même
+    client, qui prend le nom et la localisation de la commande la plus récente.
+    """
+    Client = apps.get_model('gestion', 'Client')
+    Commande = apps.get_model('gestion', 'Commande')
+
+    groupes = {}
+    commandes = Commande.objects.order_by('date_creation', 'id').values_list(
+        'id', 'numero_client', 'nom_client', 'localisation_client', 'date_creation', 'cout'
+    )
+    for pk, numero, nom, localisation, date_creation, cout in commandes.iterator(chunk_size=2000):
+        cle = _normaliser_telephone(numero)
+        if not cle:
+            continue
+        groupe = groupes.setdefault(cle, {'ids': [], 'valeur_totale': 0})
+        groupe['ids'].append(pk)
+        groupe['valeur_totale'] += cout or 0
+        groupe.update(nom=nom, localisation=localisation, date_derniere_commande=date_creation)
+
+    Client.objects.bulk_create([
+        Client(
+            telephone=cle, nom=g['nom'], localisation=g['localisation'],
+            nb_commandes=len(g['ids']), date_derniere_commande=g['date_derniere_commande'],
+            valeur_totale=g['valeur_totale'],
+        )
+        for cle, g in groupes.items()
+    ], batch_size=1000)
+
+    for cle, client_id in Client.objects.values_list('telephone', 'id'):
+        ids = groupes[cle]['ids']
+        for debut in range(0, len(ids), 500):
+            Commande.objects.filter(id__in=ids[debut:debut + 500]).update(client_id=client_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0030_index_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Client',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telephone', models.CharField(max_length=50, unique=True)),
+                ('nom', models.CharField(blank=True, default='', max_length=255)),
+                ('localisation', models.CharField(blank=True, default='', max_length=255)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('date_derniere_commande', models.DateTimeField(blank=True, null=True)),
+                ('valeur_totale', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-nb_commandes', 'id'], name='client_top_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='client',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commandes', to='gestion.client'),
+        ),
+        migrations.RunPython(regrouper_clients, migrations.RunPython.noop),
+    ]
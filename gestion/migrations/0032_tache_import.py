@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0031_client'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('fichier', models.BinaryField()),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('lignes_total', models.PositiveIntegerField(default=0)),
+                ('lignes_traitees', models.PositiveIntegerField(default=0)),
+                ('importes', models.PositiveIntegerField(default=0)),
+                ('doublons', models.PositiveIntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taches_import', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Tâche d'import",
+                'verbose_name_plural': "Tâches d'import",
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='tache_import_file_idx')],
+            },
+        ),
+    ]
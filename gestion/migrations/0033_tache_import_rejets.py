@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0032_tache_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheimport',
+            name='lignes_rejetees',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
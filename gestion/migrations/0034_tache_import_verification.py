@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0033_tache_import_rejets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheimport',
+            name='avertissements',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='jeton',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=43),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='lignes_valides',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='lot_valide',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='mode',
+            field=models.CharField(choices=[('IMPORT', 'Import'), ('VERIFICATION', 'Vérification à blanc')], default='IMPORT', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='rapport',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='verification',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports', to='gestion.tacheimport'),
+        ),
+    ]
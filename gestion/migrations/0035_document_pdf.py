@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0034_tache_import_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentPDF',
+            fields=[
+                ('facture', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pdf', serialize=False, to='gestion.facture')),
+                ('empreinte', models.CharField(max_length=64)),
+                ('contenu', models.BinaryField()),
+                ('date_creation', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'PDF de facture',
+                'verbose_name_plural': 'PDF de factures',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0035_document_pdf'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TachePDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.CharField(choices=[('BROUILLARD', 'Brouillard de caisse'), ('FACTURE', 'Facture / devis')], max_length=20)),
+                ('parametres', models.JSONField(blank=True, default=dict)),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINE', 'Terminé'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=20)),
+                ('nom_fichier', models.CharField(blank=True, default='', max_length=255)),
+                ('contenu', models.BinaryField(default=b'')),
+                ('message', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taches_pdf', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tâche PDF',
+                'verbose_name_plural': 'Tâches PDF',
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='tache_pdf_file_idx')],
+            },
+        ),
+    ]
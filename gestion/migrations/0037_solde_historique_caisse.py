@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:24
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def calculer_soldes(apps, schema_editor):
+    """Solde cumulé de chaque opération existante, dans l'ordre (date, id)."""
+    OperationCaisse = apps.get_model('gestion', 'OperationCaisse')
+
+    solde, soldes = Decimal(0), []
+    operations = OperationCaisse.objects.order_by('date', 'id').values_list('id', 'type_mouvement', 'montant')
+    for pk, type_mouvement, montant in operations.iterator(chunk_size=2000):
+        solde += montant if type_mouvement == 'ENTREE' else -montant
+        soldes.append(OperationCaisse(pk=pk, solde_historique=solde))
+    OperationCaisse.objects.bulk_update(soldes, ['solde_historique'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0036_tache_pdf'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operationcaisse',
+            index=models.Index(fields=['date', 'id'], name='caisse_date_id_idx'),
+        ),
+        migrations.RunPython(calculer_soldes, migrations.RunPython.noop),
+    ]
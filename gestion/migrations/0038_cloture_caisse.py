@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0037_solde_historique_caisse'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClotureCaisse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.PositiveSmallIntegerField()),
+                ('mois', models.PositiveSmallIntegerField()),
+                ('report', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('entrees', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sorties', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('solde_cloture', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nb_operations', models.PositiveIntegerField(default=0)),
+                ('date_cloture', models.DateTimeField(auto_now_add=True)),
+                ('date_recalcul', models.DateTimeField(auto_now=True)),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clotures_caisse', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Clôture de caisse',
+                'verbose_name_plural': 'Clôtures de caisse',
+                'ordering': ['annee', 'mois'],
+                'constraints': [models.UniqueConstraint(fields=('annee', 'mois'), name='cloture_caisse_mois_unique')],
+            },
+        ),
+    ]
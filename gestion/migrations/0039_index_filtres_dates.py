@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0038_cloture_caisse'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cityclimadetails',
+            index=models.Index(condition=models.Q(('satisfaction', 'KO_RET')), fields=['date_intervention', 'id'], name='city_retouche_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['date_creation', 'id'], name='cmd_date_crea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['type_commande', 'date_creation'], name='cmd_type_date_crea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['client', 'date_creation'], name='cmd_client_date_crea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['numero_client'], name='cmd_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['type_document', 'date_emission', 'id'], name='facture_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tapisdetails',
+            index=models.Index(fields=['statut', 'date_traitement', 'id'], name='tapis_statut_traitement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tapisdetails',
+            index=models.Index(fields=['statut', 'date_ramassage', 'id'], name='tapis_statut_ramassage_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0039_index_filtres_dates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tachepdf',
+            name='document',
+            field=models.CharField(choices=[('BROUILLARD', 'Brouillard de caisse'), ('FACTURE', 'Facture / devis'), ('ARCHIVE', 'Archive ZIP de factures')], max_length=20),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import re
 from datetime import date
 from django.db import models
 from django.utils import timezone
@@ -93,6 +94,12 @@ class Facture(models.Model):
             
         return self.montant_final_net
 
+    class Meta:
+        indexes = [
+            # Tableau de bord financier et archive ZIP (type + période d'émission)
+            models.Index(fields=['type_document', 'date_emission', 'id'], name='facture_type_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type_document} #{self.numero_document}"
 
@@ -111,6 +118,43 @@ class FactureLigne(models.Model):
     def prix_total(self):
         return self.quantite * self.prix_unitaire       
     
+class Client(models.Model):
+    """
+    Client identifié par son numéro de téléphone normalisé (clé unique).
+    Les agrégats sont maintenus par gestion/signals.py (voir gestion/clients.py).
+    """
+    telephone = models.CharField(max_length=50, unique=True)
+    nom = models.CharField(max_length=255, blank=True, default='')
+    localisation = models.CharField(max_length=255, blank=True, default='')
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    # Agrégats maintenus
+    nb_commandes = models.PositiveIntegerField(default=0)
+    date_derniere_commande = models.DateTimeField(blank=True, null=True)
+    valeur_totale = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-nb_commandes', 'id'], name='client_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} ({self.telephone})"
+
+    @staticmethod
+    def normaliser_telephone(numero):
+        """
+        Chiffres seuls, sans préfixe international ivoirien :
+        '+225 07 07 12 34 56' et '0707123456' donnent '0707123456'.
+        """
+        chiffres = re.sub(r'\D', '', numero or '')
+        if chiffres.startswith('00'):
+            chiffres = chiffres[2:]
+        if chiffres.startswith('225') and len(chiffres) == 13:
+            chiffres = chiffres[3:]
+        return chiffres
+
+
 class Commande(models.Model):
     TYPE_CHOICES = (
         ('CITYPROP', 'Cityprop'),
@@ -123,10 +167,71 @@ class Commande(models.Model):
     localisation_client = models.CharField(max_length=255)
     type_commande = models.CharField(max_length=20, choices=TYPE_CHOICES)
     date_creation = models.DateTimeField(auto_now_add=True)
+    client = models.ForeignKey(
+        Client, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='commandes'
+    )
+
+    # Résumé dénormalisé du détail (maintenu par gestion/signals.py)
+    date_operation = models.DateField(blank=True, null=True, editable=False)
+    statut_code = models.CharField(max_length=30, blank=True, default='', editable=False)
+    fidelise = models.BooleanField(null=True, editable=False)
+    cout = models.PositiveIntegerField(default=0, editable=False)
+
+    CHAMPS_RESUME = ('date_operation', 'statut_code', 'fidelise', 'cout')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_operation', 'id'], name='cmd_date_op_idx'),
+            models.Index(fields=['type_commande', 'date_operation'], name='cmd_type_date_op_idx'),
+            models.Index(fields=['statut_code', 'date_operation'], name='cmd_statut_date_op_idx'),
+            models.Index(fields=['fidelise', 'date_operation'], name='cmd_fidelise_date_op_idx'),
+            # Plages de date de création (liste, tableau de bord, statistiques du jour)
+            models.Index(fields=['date_creation', 'id'], name='cmd_date_crea_idx'),
+            models.Index(fields=['type_commande', 'date_creation'], name='cmd_type_date_crea_idx'),
+            models.Index(fields=['client', 'date_creation'], name='cmd_client_date_crea_idx'),
+            # Doublons à l'import (numero_client__in)
+            models.Index(fields=['numero_client'], name='cmd_numero_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type_commande} - {self.nom_client}"
 
+    def detail_principal(self):
+        """Tapis pour une commande TAPISPROP, sinon le détail CityClima s'il existe."""
+        tapis = getattr(self, 'tapisdetails', None)
+        city = getattr(self, 'cityclimadetails', None)
+        if self.type_commande == 'TAPISPROP' and tapis:
+            return tapis
+        return city or tapis
+
+    def calculer_resume(self):
+        """
+        Recopie sur la commande la date d'opération, le statut unifié, la
+        fidélisation et le coût du détail principal.
+        """
+        detail = self.detail_principal()
+        date_creation = timezone.localdate(self.date_creation or timezone.now())
+
+        if isinstance(detail, TapisDetails):
+            self.date_operation = detail.date_ramassage or date_creation
+            self.statut_code = detail.statut or ''
+        elif detail is not None:
+            self.date_operation = detail.date_intervention or date_creation
+            self.statut_code = detail.satisfaction or ''
+        else:
+            self.date_operation = date_creation
+            self.statut_code = ''
+
+        self.fidelise = detail.fidelise if detail is not None else None
+        self.cout = (detail.cout or 0) if detail is not None else 0
+        return {champ: getattr(self, champ) for champ in self.CHAMPS_RESUME}
+
+    def sauver_resume(self):
+        """Écrit uniquement les colonnes de résumé (UPDATE direct, sans signaux)."""
+        resume = self.calculer_resume()
+        Commande.objects.filter(pk=self.pk).update(**resume)
+        return resume
+
 
 class CityClimaDetails(models.Model):
     commande = models.OneToOneField(Commande, on_delete=models.CASCADE)
@@ -159,6 +264,24 @@ class CityClimaDetails(models.Model):
         verbose_name="Coût"
     )
 
+    # Échéance calculée à l'enregistrement (voir gestion/alertes.py)
+    date_echeance_fidelisation = models.DateField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['date_echeance_fidelisation'],
+                name='city_echeance_fid_idx',
+                condition=models.Q(fidelise=False),
+            ),
+            # Suivi des retouches (satisfaction KO_RET, intervention la plus ancienne en haut)
+            models.Index(
+                fields=['date_intervention', 'id'],
+                name='city_retouche_idx',
+                condition=models.Q(satisfaction='KO_RET'),
+            ),
+        ]
+
     def __str__(self):
         return f"Détails {self.commande}"
 
@@ -200,6 +323,27 @@ class TapisDetails(models.Model):
         choices=STATUT_CHOICES,
         default='NON_RESPECTE'
     )
+
+    # Échéances calculées à l'enregistrement (voir gestion/alertes.py)
+    date_echeance_fidelisation = models.DateField(blank=True, null=True, editable=False)
+    date_echeance_retard = models.DateField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['date_echeance_fidelisation'],
+                name='tapis_echeance_fid_idx',
+                condition=models.Q(fidelise=False),
+            ),
+            models.Index(
+                fields=['date_echeance_retard'],
+                name='tapis_echeance_retard_idx',
+                condition=models.Q(date_echeance_retard__isnull=False),
+            ),
+            # Listes par statut : atelier (par date de traitement), abandons (par ramassage)
+            models.Index(fields=['statut', 'date_traitement', 'id'], name='tapis_statut_traitement_idx'),
+            models.Index(fields=['statut', 'date_ramassage', 'id'], name='tapis_statut_ramassage_idx'),
+        ]
     
     @property
     def niveau_urgence(self):
@@ -268,7 +412,8 @@ class OperationCaisse(models.Model):
         default=0.00
     )
     
-    # Correction : Utilisation de decimal_places et ajout de default
+    # Solde de la caisse après cette opération, ordre (date, id) ; maintenu
+    # par gestion/signals.py (voir caisse.py)
     solde_historique = models.DecimalField(
         max_digits=12, 
         decimal_places=2, 
@@ -283,9 +428,255 @@ class OperationCaisse(models.Model):
         verbose_name = "Opération de Caisse"
         verbose_name_plural = "Opérations de Caisse"
         ordering = ['date', 'id'] # Chronologique : du plus ancien au plus récent
+        indexes = [
+            # Ordre du solde historique : report = dernière opération avant une date
+            models.Index(fields=['date', 'id'], name='caisse_date_id_idx'),
+        ]
         
     @property
     def montant_signe(self):
         if self.type_mouvement == 'SORTIE':
             return -self.montant
         return self.montant
+
+
+class ClotureCaisse(models.Model):
+    """
+    Clôture mensuelle de la caisse : report d'ouverture, entrées, sorties et
+    solde de clôture du mois. Créée par l'action "Clôturer le mois", puis
+    recalculée (avec les clôtures suivantes) quand une opération du mois ou
+    d'un mois antérieur est modifiée ; voir gestion/caisse.py.
+    """
+    annee = models.PositiveSmallIntegerField()
+    mois = models.PositiveSmallIntegerField()
+    report = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    entrees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sorties = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    solde_cloture = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nb_operations = models.PositiveIntegerField(default=0)
+    utilisateur = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='clotures_caisse'
+    )
+    date_cloture = models.DateTimeField(auto_now_add=True)
+    date_recalcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Clôture de caisse"
+        verbose_name_plural = "Clôtures de caisse"
+        ordering = ['annee', 'mois']
+        constraints = [
+            models.UniqueConstraint(fields=['annee', 'mois'], name='cloture_caisse_mois_unique'),
+        ]
+
+    def __str__(self):
+        return f"Clôture {self.mois:02d}/{self.annee} : {self.solde_cloture} FCFA"
+
+
+class CompteurAlertes(models.Model):
+    """
+    Compteurs des alertes de la barre latérale (ligne unique).
+    Mis à jour par les signaux et reconstruits chaque jour.
+    """
+    PK_UNIQUE = 1
+
+    alertes_city = models.IntegerField(default=0)
+    alertes_clima = models.IntegerField(default=0)
+    alertes_tapis_fidelisation = models.IntegerField(default=0)
+    alertes_tapis_retard = models.IntegerField(default=0)
+    date_calcul = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Compteur d'alertes"
+        verbose_name_plural = "Compteurs d'alertes"
+
+    def __str__(self):
+        return f"Compteurs d'alertes du {self.date_calcul}"
+
+
+class StatistiqueJournaliere(models.Model):
+    """
+    Agrégats quotidiens du tableau de bord, par (jour, type de commande).
+    Jour = date locale de création de la commande (voir gestion/statistiques.py).
+    """
+    jour = models.DateField()
+    type_commande = models.CharField(max_length=20, choices=Commande.TYPE_CHOICES)
+
+    nb_commandes = models.PositiveIntegerField(default=0)
+    nb_ko = models.PositiveIntegerField(default=0)
+    nb_non_fidelises = models.PositiveIntegerField(default=0)
+    nb_livraisons = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+        ordering = ['jour', 'type_commande']
+        constraints = [
+            models.UniqueConstraint(fields=['jour', 'type_commande'], name='stat_jour_type_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} - {self.type_commande} ({self.nb_commandes})"
+
+
+class IndexRecherche(models.Model):
+    """
+    Index de recherche client (une ligne par commande), tenu à jour à
+    l'enregistrement. Texte normalisé sans accents + téléphone en chiffres.
+    Indexé en FTS5 (SQLite) ou pg_trgm (PostgreSQL), voir gestion/recherche.py.
+    """
+    commande = models.OneToOneField(
+        Commande, on_delete=models.CASCADE, primary_key=True, related_name='index_recherche'
+    )
+    contenu = models.TextField(default='', blank=True)
+    telephone = models.CharField(max_length=50, default='', blank=True)
+
+    class Meta:
+        verbose_name = "Index de recherche"
+        verbose_name_plural = "Index de recherche"
+
+    def __str__(self):
+        return self.contenu
+
+
+class TacheImport(models.Model):
+    """
+    Import de commandes exécuté en arrière-plan (file d'attente en base,
+    traitée par "manage.py traiter_taches"). Le fichier est conservé en base
+    jusqu'au traitement.
+
+    En mode VERIFICATION (à blanc), rien n'est écrit dans les commandes : la
+    tâche produit un rapport annoté et conserve le lot déjà validé, que
+    l'import réel reprend ensuite par son jeton.
+    """
+    MODE_CHOICES = (
+        ('IMPORT', 'Import'),
+        ('VERIFICATION', 'Vérification à blanc'),
+    )
+    STATUT_CHOICES = (
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    )
+
+    nom_fichier = models.CharField(max_length=255)
+    fichier = models.BinaryField()
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='IMPORT')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    utilisateur = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='taches_import'
+    )
+
+    # Progression
+    lignes_total = models.PositiveIntegerField(default=0)
+    lignes_traitees = models.PositiveIntegerField(default=0)
+    importes = models.PositiveIntegerField(default=0)
+    doublons = models.PositiveIntegerField(default=0)
+    lignes_rejetees = models.PositiveIntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True, default='')
+
+    # Vérification à blanc
+    lignes_valides = models.PositiveIntegerField(default=0)
+    avertissements = models.PositiveIntegerField(default=0)
+    jeton = models.CharField(max_length=43, blank=True, default='', db_index=True)
+    lot_valide = models.BinaryField(default=b'')
+    rapport = models.BinaryField(default=b'')
+    verification = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='imports'
+    )
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(blank=True, null=True)
+    date_fin = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Tâche d'import"
+        verbose_name_plural = "Tâches d'import"
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='tache_import_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_mode_display()} {self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def terminee(self):
+        return self.statut in ('TERMINE', 'ECHEC')
+
+    def duree_restante(self):
+        """Estimation (secondes) au débit observé depuis le début du traitement."""
+        if self.statut != 'EN_COURS' or not self.date_debut or not self.lignes_traitees:
+            return None
+        ecoule = (timezone.now() - self.date_debut).total_seconds()
+        debit = self.lignes_traitees / ecoule if ecoule > 0 else 0
+        if not debit:
+            return None
+        return round((self.lignes_total - self.lignes_traitees) / debit)
+
+
+class TachePDF(models.Model):
+    """
+    Rendu PDF exécuté en arrière-plan par le même travailleur que les imports
+    ("manage.py traiter_taches") : la vue met la tâche en file, le navigateur
+    interroge son état puis télécharge le PDF conservé ici.
+    """
+    DOCUMENT_CHOICES = (
+        ('BROUILLARD', 'Brouillard de caisse'),
+        ('FACTURE', 'Facture / devis'),
+        ('ARCHIVE', 'Archive ZIP de factures'),
+    )
+    STATUT_CHOICES = TacheImport.STATUT_CHOICES
+
+    document = models.CharField(max_length=20, choices=DOCUMENT_CHOICES)
+    parametres = models.JSONField(default=dict, blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    utilisateur = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, null=True, blank=True, related_name='taches_pdf'
+    )
+
+    nom_fichier = models.CharField(max_length=255, blank=True, default='')
+    contenu = models.BinaryField(default=b'')
+    message = models.TextField(blank=True, default='')
+
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(blank=True, null=True)
+    date_fin = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Tâche PDF"
+        verbose_name_plural = "Tâches PDF"
+        indexes = [
+            models.Index(fields=['statut', 'date_creation'], name='tache_pdf_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_document_display()} {self.parametres} ({self.get_statut_display()})"
+
+    @property
+    def terminee(self):
+        return self.statut in ('TERMINE', 'ECHEC')
+
+    @property
+    def type_contenu(self):
+        return 'application/zip' if self.document == 'ARCHIVE' else 'application/pdf'
+
+
+class DocumentPDF(models.Model):
+    """
+    PDF rendu d'une facture / d'un devis, conservé avec l'empreinte de ce qui
+    l'a produit (facture, lignes, client, version du gabarit). Servi tel quel
+    tant que l'empreinte est inchangée ; voir gestion/documents.py.
+    """
+    facture = models.OneToOneField(Facture, on_delete=models.CASCADE, primary_key=True, related_name='pdf')
+    empreinte = models.CharField(max_length=64)
+    contenu = models.BinaryField()
+    date_creation = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "PDF de facture"
+        verbose_name_plural = "PDF de factures"
+
+    def __str__(self):
+        return f"PDF {self.facture_id} ({self.empreinte[:12]})"
@@ -0,0 +1,299 @@
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+# =================================================================
+#  PAGINATION PAR CURSEUR (KEYSET / SEEK)
+# =================================================================
+# La page suivante est lue avec "WHERE (clé) > (dernière clé vue)" sur l'ordre
+# de tri de la vue, au lieu d'un OFFSET : une page profonde coûte autant que
+# la première. Le dernier champ de l'ordre doit être unique (id).
+
+PARAM_APRES = 'apres'
+PARAM_AVANT = 'avant'
+
+
+def seuil_curseur():
+    """En dessous de ce nombre de lignes, on garde la pagination numérotée."""
+    return getattr(settings, 'PAGINATION_SEUIL_CURSEUR', 500)
+
+
+# =================================================================
+#  COMPTAGE (une fois par requête, cache court, estimation optionnelle)
+# =================================================================
+
+def cle_compte(request):
+    """Clé de cache : vue + paramètres de filtre normalisés (sans la pagination)."""
+    params = sorted(
+        (cle, valeur) for cle, valeurs in request.GET.lists() for valeur in valeurs
+        if cle not in ('page', PARAM_APRES, PARAM_AVANT) and valeur != ''
+    )
+    vue = request.resolver_match.view_name if request.resolver_match else request.path
+    empreinte = hashlib.sha1(json.dumps([vue, params]).encode()).hexdigest()
+    return f'compte:{empreinte}'
+
+
+def estimer_compte(queryset):
+    """
+    Estimation du planificateur PostgreSQL (EXPLAIN), sans parcourir la table.
+    Retourne None si la base ne fournit pas d'estimation (SQLite).
+    """
+    connexion = connections[queryset.db]
+    if connexion.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connexion.cursor() as curseur:
+        curseur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = curseur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def compter(queryset, cle=None):
+    """
+    Nombre de lignes du queryset, calculé au plus une fois :
+    - lu dans le cache si la même liste filtrée a été comptée il y a peu ;
+    - estimé (PostgreSQL) au-delà de PAGINATION_SEUIL_ESTIMATION ;
+    - sinon COUNT(*) exact.
+    Retourne (total, estime).
+    """
+    if cle:
+        en_cache = cache.get(cle)
+        if en_cache is not None:
+            return en_cache
+
+    seuil_estimation = getattr(settings, 'PAGINATION_SEUIL_ESTIMATION', None)
+    resultat = None
+    if seuil_estimation is not None:
+        estimation = estimer_compte(queryset)
+        if estimation is not None and estimation > seuil_estimation:
+            resultat = (estimation, True)
+    if resultat is None:
+        resultat = (queryset.count(), False)
+
+    if cle:
+        cache.set(cle, resultat, getattr(settings, 'PAGINATION_COMPTE_TTL', 30))
+    return resultat
+
+
+class PaginatorCompte(Paginator):
+    """Paginator dont le COUNT(*) passe par compter() (cache) ou est déjà connu."""
+
+    def __init__(self, object_list, per_page, cle=None, total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cle = cle
+        self.total_connu = total
+
+    @cached_property
+    def count(self):
+        if self.total_connu is not None:
+            return self.total_connu
+        return compter(self.object_list, self.cle)[0]
+
+
+# =================================================================
+#  JETONS DE CURSEUR
+# =================================================================
+
+def encoder_curseur(valeurs):
+    """Jeton opaque (base64 URL) à partir des valeurs de la clé de tri."""
+    types = []
+    for v in valeurs:
+        if v is None:
+            types.append(['n', None])
+        elif isinstance(v, datetime):
+            types.append(['t', v.isoformat()])
+        elif isinstance(v, date):
+            types.append(['d', v.isoformat()])
+        elif isinstance(v, Decimal):
+            types.append(['m', str(v)])
+        else:
+            types.append(['v', v])
+    brut = json.dumps(types, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(brut).decode().rstrip('=')
+
+
+def decoder_curseur(jeton):
+    """Valeurs de la clé de tri, ou None si le jeton est invalide."""
+    try:
+        brut = base64.urlsafe_b64decode(jeton + '=' * (-len(jeton) % 4))
+        valeurs = []
+        for type_valeur, v in json.loads(brut):
+            if type_valeur == 't':
+                v = datetime.fromisoformat(v)
+            elif type_valeur == 'd':
+                v = date.fromisoformat(v)
+            elif type_valeur == 'm':
+                v = Decimal(v)
+            valeurs.append(v)
+        return valeurs
+    except (ValueError, TypeError):
+        return None
+
+
+class PageCurseur:
+    """Page compatible avec les templates (itération, has_next, has_previous...)."""
+    est_curseur = True
+
+    def __init__(self, object_list, curseur_suivant=None, curseur_precedent=None):
+        self.object_list = object_list
+        self.curseur_suivant = curseur_suivant
+        self.curseur_precedent = curseur_precedent
+        self.compteur = None
+
+    @cached_property
+    def _compte(self):
+        return self.compteur() if self.compteur else (len(self.object_list), False)
+
+    @property
+    def total(self):
+        """Total de la liste filtrée, calculé seulement si le template l'affiche."""
+        return self._compte[0]
+
+    @property
+    def total_estime(self):
+        return self._compte[1]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.curseur_suivant is not None
+
+    def has_previous(self):
+        return self.curseur_precedent is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class PaginateurCurseur:
+    """
+    ordre : champs de tri ('-date', '-id'), le dernier étant unique.
+    Les valeurs NULL sont triées en dernier, quel que soit le sens.
+    """
+
+    def __init__(self, queryset, par_page, ordre):
+        self.queryset = queryset
+        self.par_page = par_page
+        self.cles = []
+        for champ in ordre:
+            nom = champ.lstrip('-')
+            self.cles.append((nom, champ.startswith('-'), self._nullable(nom)))
+
+    def _nullable(self, nom):
+        """Les annotations sont considérées comme pouvant valoir NULL."""
+        if nom == 'pk':
+            return False
+        try:
+            return self.queryset.model._meta.get_field(nom).null
+        except Exception:
+            return True
+
+    def _tri(self, inverse=False):
+        tri = []
+        for nom, desc, nullable in self.cles:
+            if not nullable:
+                tri.append(nom if desc == inverse else f'-{nom}')
+                continue
+            options = {'nulls_first': True} if inverse else {'nulls_last': True}
+            tri.append(F(nom).desc(**options) if desc != inverse else F(nom).asc(**options))
+        return tri
+
+    def _condition(self, valeurs, apres=True, i=0):
+        """Lignes strictement après (ou avant) la clé donnée, dans l'ordre de tri."""
+        nom, desc, nullable = self.cles[i]
+        v = valeurs[i]
+        suite = self._condition(valeurs, apres, i + 1) if i + 1 < len(self.cles) else None
+
+        if v is None:
+            if apres:
+                return Q(**{f'{nom}__isnull': True}) & suite if suite is not None else Q(pk__in=[])
+            condition = Q(**{f'{nom}__isnull': False})
+            if suite is not None:
+                condition |= Q(**{f'{nom}__isnull': True}) & suite
+            return condition
+
+        operateur = 'lt' if desc == apres else 'gt'
+        condition = Q(**{f'{nom}__{operateur}': v})
+        if apres and nullable:
+            condition |= Q(**{f'{nom}__isnull': True})
+        if suite is not None:
+            condition |= Q(**{nom: v}) & suite
+        return condition
+
+    def _cle(self, ligne):
+        if isinstance(ligne, dict):
+            return [ligne[nom] for nom, _, _ in self.cles]
+        return [getattr(ligne, nom) for nom, _, _ in self.cles]
+
+    def page(self, apres=None, avant=None):
+        valeurs_apres = decoder_curseur(apres) if apres else None
+        valeurs_avant = decoder_curseur(avant) if avant else None
+        if valeurs_apres and len(valeurs_apres) != len(self.cles):
+            valeurs_apres = None
+        if valeurs_avant and len(valeurs_avant) != len(self.cles):
+            valeurs_avant = None
+
+        if valeurs_avant:
+            # Page précédente : on lit à rebours puis on remet dans l'ordre
+            qs = self.queryset.filter(self._condition(valeurs_avant, apres=False)).order_by(*self._tri(inverse=True))
+            lignes = list(qs[:self.par_page + 1])
+            plus = len(lignes) > self.par_page
+            lignes = lignes[:self.par_page][::-1]
+            precedent = encoder_curseur(self._cle(lignes[0])) if plus and lignes else None
+            suivant = encoder_curseur(self._cle(lignes[-1])) if lignes else None
+            return PageCurseur(lignes, suivant, precedent)
+
+        qs = self.queryset.order_by(*self._tri())
+        if valeurs_apres:
+            qs = qs.filter(self._condition(valeurs_apres, apres=True))
+        lignes = list(qs[:self.par_page + 1])
+        plus = len(lignes) > self.par_page
+        lignes = lignes[:self.par_page]
+        suivant = encoder_curseur(self._cle(lignes[-1])) if plus else None
+        precedent = encoder_curseur(self._cle(lignes[0])) if valeurs_apres and lignes else None
+        return PageCurseur(lignes, suivant, precedent)
+
+
+def paginer(request, queryset, par_page, ordre, total=None):
+    """
+    Pagination d'une vue de liste.
+    - Petits résultats (<= seuil) : Paginator numéroté classique (?page=).
+    - Au-delà, ou si un curseur est présent : pagination par curseur (?apres= / ?avant=).
+    Le total (page.total) n'est compté qu'une fois par requête : "total" s'il est
+    déjà connu de la vue, sinon le COUNT borné, sinon compter() (cache / estimation).
+    """
+    apres = request.GET.get(PARAM_APRES)
+    avant = request.GET.get(PARAM_AVANT)
+    paginateur = PaginateurCurseur(queryset, par_page, ordre)
+    cle = cle_compte(request)
+
+    if not apres and not avant:
+        # COUNT borné : ne parcourt jamais plus de seuil + 1 lignes
+        if total is None:
+            borne = queryset.order_by()[:seuil_curseur() + 1].count()
+            total = borne if borne <= seuil_curseur() else None
+        if total is not None and total <= seuil_curseur():
+            paginator = PaginatorCompte(queryset.order_by(*paginateur._tri()), par_page, cle=cle, total=total)
+            page = paginator.get_page(request.GET.get('page'))
+            page.total, page.total_estime = paginator.count, False
+            return page
+
+    page = paginateur.page(apres=apres, avant=avant)
+    page.compteur = (lambda: (total, False)) if total is not None else (lambda: compter(queryset, cle))
+    return page
@@ -0,0 +1,73 @@
+from io import BytesIO
+
+
+# =================================================================
+#  MOTEURS DE RENDU HTML -> PDF
+# =================================================================
+# Sans import Django : ce module est chargé tel quel par les processus du
+# pool de rendu (voir documents.zip_factures), y compris en mode "spawn".
+# Le moteur est choisi par le réglage PDF_MOTEUR ; chaque processus garde une
+# instance par moteur, pour réutiliser ce qui peut l'être d'un rendu à l'autre.
+
+class MoteurIndisponible(Exception):
+    """Bibliothèque du moteur absente (ou bibliothèques système manquantes)."""
+
+
+class MoteurXhtml2pdf:
+    """xhtml2pdf (sur ReportLab) : pur Python, gère les <style> des gabarits actuels."""
+    nom = 'xhtml2pdf'
+
+    def __init__(self, feuilles=()):
+        # Les feuilles externes ne sont pas prises en charge : styles dans le gabarit
+        try:
+            from xhtml2pdf import pisa
+        except ImportError as e:
+            raise MoteurIndisponible(str(e))
+        self.pisa = pisa
+
+    def rendre(self, html, base_url=None):
+        resultat = BytesIO()
+        pdf = self.pisa.pisaDocument(BytesIO(html.encode("UTF-8")), resultat, path=base_url)
+        return None if pdf.err else resultat.getvalue()
+
+
+class MoteurWeasyPrint:
+    """
+    WeasyPrint (Pango) : la configuration des polices, les feuilles de style
+    compilées et le cache des images sont conservés entre les rendus.
+    """
+    nom = 'weasyprint'
+
+    def __init__(self, feuilles=()):
+        try:
+            import weasyprint
+            from weasyprint.text.fonts import FontConfiguration
+        except (ImportError, OSError) as e:  # OSError : Pango absent du système
+            raise MoteurIndisponible(str(e))
+        self.weasyprint = weasyprint
+        self.polices = FontConfiguration()
+        self.feuilles = [weasyprint.CSS(filename=chemin, font_config=self.polices) for chemin in feuilles]
+        self.images = {}
+
+    def rendre(self, html, base_url=None):
+        document = self.weasyprint.HTML(string=html, base_url=base_url)
+        return document.write_pdf(stylesheets=self.feuilles, font_config=self.polices, cache=self.images)
+
+
+MOTEURS = {moteur.nom: moteur for moteur in (MoteurXhtml2pdf, MoteurWeasyPrint)}
+_instances = {}
+
+
+def obtenir_moteur(nom, feuilles=()):
+    """Instance du moteur pour ce processus (créée au premier appel)."""
+    if nom not in MOTEURS:
+        raise ValueError(f"Moteur PDF inconnu : {nom} (disponibles : {', '.join(MOTEURS)}).")
+    cle = (nom, tuple(feuilles))
+    if cle not in _instances:
+        _instances[cle] = MOTEURS[nom](feuilles)
+    return _instances[cle]
+
+
+def html_vers_pdf(html, moteur='xhtml2pdf', base_url=None, feuilles=()):
+    """Octets du PDF, ou None si le moteur signale une erreur."""
+    return obtenir_moteur(moteur, feuilles).rendre(html, base_url)
@@ -0,0 +1,132 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import IndexRecherche
+
+
+# =================================================================
+#  NORMALISATION (sans accents, minuscules, téléphone en chiffres)
+# =================================================================
+
+def normaliser(texte):
+    """'Kouadio Émilie, Cocody' -> 'kouadio emilie cocody'"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'[a-z0-9]+', texte.lower()))
+
+
+def chiffres(texte):
+    """'+225 07-07.12 34' -> '22507071234'"""
+    return re.sub(r'\D', '', texte or '')
+
+
+def _est_telephone(q):
+    """Recherche composée uniquement de chiffres et de séparateurs de numéro."""
+    return bool(re.fullmatch(r'[\d\s+().-]+', q)) and len(chiffres(q)) >= 3
+
+
+# =================================================================
+#  SYNCHRONISATION DE L'INDEX
+# =================================================================
+
+def valeurs_index(commande):
+    return {
+        'contenu': normaliser(' '.join([
+            commande.nom_client, commande.localisation_client, commande.numero_client,
+        ])),
+        'telephone': chiffres(commande.numero_client),
+    }
+
+
+def indexer_commande(commande):
+    IndexRecherche.objects.update_or_create(commande_id=commande.pk, defaults=valeurs_index(commande))
+
+
+def indexer_commandes(commandes, taille_lot=1000):
+    """Indexation en masse (imports, reconstruction) : remplace les lignes existantes."""
+    lignes = [IndexRecherche(commande_id=c.pk, **valeurs_index(c)) for c in commandes]
+    IndexRecherche.objects.filter(commande_id__in=[l.commande_id for l in lignes]).delete()
+    IndexRecherche.objects.bulk_create(lignes, batch_size=taille_lot)
+    return len(lignes)
+
+
+# =================================================================
+#  MOTEURS DE RECHERCHE (choisis selon la base)
+# =================================================================
+# Chaque moteur fournit un filtre : Q() sur les ids, sous-requête sur l'index
+# sans limite (listes, totaux et exports gardent toutes les correspondances et
+# leur propre tri).
+
+def _filtre_simple(q):
+    if _est_telephone(q):
+        return Q(telephone__contains=chiffres(q))
+    filtre = Q()
+    for mot in normaliser(q).split():
+        filtre &= Q(contenu__contains=mot)
+    return filtre
+
+
+def _filtrer_simple(q, champ):
+    """LIKE servi par la table d'index (et ses index pg_trgm sur PostgreSQL)."""
+    return Q(**{f'{champ}__in': IndexRecherche.objects.filter(_filtre_simple(q)).values('commande_id')})
+
+
+def _requete_sqlite(q):
+    """
+    SELECT rowid de la table FTS5 à trigrammes (recherche de sous-chaînes),
+    ou None si aucun mot n'est assez long pour les trigrammes.
+    """
+    if _est_telephone(q):
+        mots, colonne = [chiffres(q)], 'telephone'
+    else:
+        mots, colonne = normaliser(q).split(), 'contenu'
+    longs = [m for m in mots if len(m) >= 3]
+    if not longs:
+        return None
+
+    courts = [m for m in mots if len(m) < 3]
+    expression = ' AND '.join(f'{colonne} : "{m}"' for m in longs)
+    sql = 'SELECT rowid FROM gestion_recherche_fts WHERE gestion_recherche_fts MATCH %s'
+    params = [expression]
+    for mot in courts:
+        sql += f' AND {colonne} LIKE %s'
+        params.append(f'%{mot}%')
+    return sql, params
+
+
+def _filtrer_sqlite(q, champ):
+    requete = _requete_sqlite(q)
+    if requete is None:
+        # Les trigrammes ne couvrent pas les mots de moins de 3 lettres
+        return _filtrer_simple(q, champ)
+    return Q(**{f'{champ}__in': RawSQL(*requete)})
+
+
+# Sur PostgreSQL, les LIKE du moteur simple sont servis par les index pg_trgm
+MOTEURS = {
+    'simple': _filtrer_simple,
+    'sqlite': _filtrer_sqlite,
+    'postgresql': _filtrer_simple,
+}
+
+
+def _moteur():
+    """Moteur de settings.RECHERCHE_MOTEUR s'il est renseigné, sinon celui de la base."""
+    nom = getattr(settings, 'RECHERCHE_MOTEUR', None) or connection.vendor
+    return MOTEURS.get(nom, MOTEURS['simple'])
+
+
+def filtre_recherche(q, champ='pk'):
+    """
+    Q() à appliquer sur une liste ou un export : champ = chemin vers l'id de
+    la commande. Toutes les correspondances sont retenues (sous-requête).
+    """
+    q = (q or '').strip()
+    if not q:
+        return Q(**{f'{champ}__in': []})
+    return _moteur()(q, champ)
@@ -0,0 +1,219 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Commande, CityClimaDetails, Facture, FactureLigne, OperationCaisse, TapisDetails
+from .alertes import etat_alertes, appliquer_variation, calculer_echeances
+from .statistiques import planifier_recalcul
+from .recherche import indexer_commande
+from .clients import rattacher_client, planifier_recalcul_client
+from .documents import invalider_pdf
+from .caisse import planifier_recalcul_soldes
+
+
+# =================================================================
+#  COMPTEURS D'ALERTES (Barre latérale)
+# =================================================================
+
+@receiver(pre_save, sender=CityClimaDetails)
+@receiver(pre_save, sender=TapisDetails)
+def memoriser_alertes_detail(sender, instance, **kwargs):
+    """
+    Calcule les échéances d'alerte du détail et mémorise l'état d'alerte
+    avant modification (lecture de l'ancienne ligne).
+    """
+    calculer_echeances(instance)
+    ancien = sender.objects.filter(pk=instance.pk).select_related('commande').first() if instance.pk else None
+    instance._alertes_avant = etat_alertes(ancien, timezone.now().date())
+
+
+@receiver(post_save, sender=CityClimaDetails)
+@receiver(post_save, sender=TapisDetails)
+def maj_alertes_detail(sender, instance, **kwargs):
+    avant = getattr(instance, '_alertes_avant', set())
+    apres = etat_alertes(instance, timezone.now().date())
+    appliquer_variation(avant, apres)
+    instance._alertes_avant = apres
+
+
+@receiver(pre_delete, sender=CityClimaDetails)
+@receiver(pre_delete, sender=TapisDetails)
+def memoriser_alertes_suppression(sender, instance, **kwargs):
+    instance._alertes_avant = etat_alertes(instance, timezone.now().date())
+
+
+@receiver(post_delete, sender=CityClimaDetails)
+@receiver(post_delete, sender=TapisDetails)
+def maj_alertes_suppression(sender, instance, **kwargs):
+    appliquer_variation(getattr(instance, '_alertes_avant', set()), set())
+
+
+@receiver(pre_save, sender=Commande)
+def memoriser_type_commande(sender, instance, **kwargs):
+    if instance.pk:
+        instance._type_avant = sender.objects.filter(pk=instance.pk).values_list('type_commande', flat=True).first()
+
+
+@receiver(post_save, sender=Commande)
+def maj_alertes_type_commande(sender, instance, created, **kwargs):
+    """
+    Un changement CITYPROP <-> CLIMATISEUR change le délai de fidélisation
+    et déplace l'alerte d'un compteur à l'autre.
+    """
+    type_avant = getattr(instance, '_type_avant', None)
+    if created or type_avant == instance.type_commande:
+        return
+    detail = CityClimaDetails.objects.filter(commande=instance).first()
+    if detail is None:
+        return
+    today = timezone.now().date()
+    avant = etat_alertes(detail, today, type_commande=type_avant)
+    calculer_echeances(detail, type_commande=instance.type_commande)
+    CityClimaDetails.objects.filter(pk=detail.pk).update(
+        date_echeance_fidelisation=detail.date_echeance_fidelisation
+    )
+    appliquer_variation(avant, etat_alertes(detail, today, type_commande=instance.type_commande))
+
+
+# =================================================================
+#  RÉSUMÉ DÉNORMALISÉ DES COMMANDES (listes et filtres mono-table)
+#  Enregistré avant les statistiques, qui s'appuient sur ce résumé.
+# =================================================================
+
+@receiver(pre_save, sender=Commande)
+def calculer_resume_commande(sender, instance, **kwargs):
+    instance.calculer_resume()
+
+
+@receiver(post_save, sender=CityClimaDetails)
+@receiver(post_save, sender=TapisDetails)
+@receiver(post_delete, sender=CityClimaDetails)
+@receiver(post_delete, sender=TapisDetails)
+def maj_resume_commande(sender, instance, **kwargs):
+    commande = (
+        Commande.objects.select_related('cityclimadetails', 'tapisdetails')
+        .filter(pk=instance.commande_id).first()
+    )
+    if commande is not None:
+        commande.sauver_resume()
+
+# =================================================================
+#  STATISTIQUES JOURNALIÈRES (Tableau de bord)
+# =================================================================
+
+@receiver(post_save, sender=Commande)
+def maj_statistiques_commande(sender, instance, created, **kwargs):
+    type_avant = getattr(instance, '_type_avant', None)
+    if not created and type_avant and type_avant != instance.type_commande:
+        planifier_recalcul(instance.date_creation, type_avant)
+    planifier_recalcul(instance.date_creation, instance.type_commande)
+
+
+@receiver(post_delete, sender=Commande)
+def maj_statistiques_suppression_commande(sender, instance, **kwargs):
+    planifier_recalcul(instance.date_creation, instance.type_commande)
+
+
+@receiver(post_save, sender=CityClimaDetails)
+@receiver(post_save, sender=TapisDetails)
+def maj_statistiques_detail(sender, instance, **kwargs):
+    planifier_recalcul(instance.commande.date_creation, instance.commande.type_commande)
+
+
+@receiver(pre_delete, sender=CityClimaDetails)
+@receiver(pre_delete, sender=TapisDetails)
+def maj_statistiques_suppression_detail(sender, instance, **kwargs):
+    # La commande peut être supprimée dans la même cascade : on lit sa case maintenant
+    case = Commande.objects.filter(pk=instance.commande_id).values_list('date_creation', 'type_commande').first()
+    if case:
+        planifier_recalcul(*case)
+
+
+# =================================================================
+#  INDEX DE RECHERCHE CLIENT
+# =================================================================
+
+@receiver(post_save, sender=Commande)
+def maj_index_recherche(sender, instance, **kwargs):
+    indexer_commande(instance)
+
+
+# =================================================================
+#  CLIENTS (rattachement par numéro et agrégats maintenus)
+# =================================================================
+
+@receiver(pre_save, sender=Commande)
+def rattacher_client_commande(sender, instance, **kwargs):
+    instance._client_avant = instance.client_id if instance.pk else None
+    rattacher_client(instance)
+
+
+@receiver(post_save, sender=Commande)
+@receiver(post_delete, sender=Commande)
+def maj_agregats_client(sender, instance, **kwargs):
+    client_avant = getattr(instance, '_client_avant', None)
+    if client_avant and client_avant != instance.client_id:
+        planifier_recalcul_client(client_avant)
+    planifier_recalcul_client(instance.client_id)
+
+
+@receiver(post_save, sender=CityClimaDetails)
+@receiver(post_save, sender=TapisDetails)
+@receiver(post_delete, sender=CityClimaDetails)
+@receiver(post_delete, sender=TapisDetails)
+def maj_valeur_client(sender, instance, **kwargs):
+    # Le coût du détail alimente la valeur totale du client
+    client_id = Commande.objects.filter(pk=instance.commande_id).values_list('client_id', flat=True).first()
+    planifier_recalcul_client(client_id)
+
+
+# =================================================================
+#  CACHE DES PDF DE FACTURES
+# =================================================================
+# Le PDF stocké est supprimé à chaque modification de la facture ou de ses
+# lignes (modifier_facture, admin...) ; la suppression de la facture
+# l'emporte par cascade.
+
+@receiver(post_save, sender=Facture)
+def invalider_pdf_facture(sender, instance, **kwargs):
+    invalider_pdf(instance.pk)
+
+
+@receiver(post_save, sender=FactureLigne)
+@receiver(post_delete, sender=FactureLigne)
+def invalider_pdf_ligne(sender, instance, **kwargs):
+    invalider_pdf(instance.facture_id)
+
+
+# =================================================================
+#  SOLDE HISTORIQUE DE LA CAISSE
+# =================================================================
+# Recalcul à partir de la plus ancienne date touchée (ancienne ou nouvelle
+# date de l'opération) ; inutile si seuls l'équipe ou le libellé changent.
+
+@receiver(pre_save, sender=OperationCaisse)
+def memoriser_operation_caisse(sender, instance, **kwargs):
+    avant = (
+        OperationCaisse.objects.filter(pk=instance.pk)
+        .values_list('date', 'type_mouvement', 'montant', 'solde_historique').first()
+        if instance.pk else None
+    )
+    instance._caisse_avant = avant[:3] if avant else None
+    if avant:
+        # L'instance en mémoire peut porter un solde périmé : on garde celui de la base
+        instance.solde_historique = avant[3]
+
+
+@receiver(post_save, sender=OperationCaisse)
+def maj_soldes_caisse(sender, instance, created, **kwargs):
+    avant = getattr(instance, '_caisse_avant', None)
+    if avant is not None and avant == (instance.date, instance.type_mouvement, instance.montant):
+        return
+    planifier_recalcul_soldes(avant[0] if avant else instance.date)
+    if avant:
+        planifier_recalcul_soldes(instance.date)
+
+
+@receiver(post_delete, sender=OperationCaisse)
+def maj_soldes_caisse_suppression(sender, instance, **kwargs):
+    planifier_recalcul_soldes(instance.date)
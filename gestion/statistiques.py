@@ -0,0 +1,83 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Commande, StatistiqueJournaliere
+
+
+# =================================================================
+#  AGRÉGATS PAR (JOUR, TYPE) - TABLEAU DE BORD
+# =================================================================
+
+STATUTS_LIVRES = ['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT']
+
+CHAMPS = ['nb_commandes', 'nb_ko', 'nb_non_fidelises', 'nb_livraisons', 'chiffre_affaires']
+
+# Agrégats calculés sur les colonnes de résumé de Commande (requête mono-table)
+AGREGATS = {
+    'nb_commandes': Count('id'),
+    'nb_ko': Count('id', filter=Q(statut_code='KO_RET')),
+    'nb_non_fidelises': Count('id', filter=Q(fidelise=False)),
+    'nb_livraisons': Count('id', filter=Q(statut_code__in=STATUTS_LIVRES)),
+    'chiffre_affaires': Coalesce(Sum('cout'), 0),
+}
+
+
+def _valeurs(agregat):
+    return {champ: agregat[champ] for champ in CHAMPS}
+
+
+def bornes_jour(jour):
+    """Intervalle [début, lendemain) du jour local, en datetimes conscients."""
+    debut = timezone.make_aware(datetime.combine(jour, time.min))
+    return debut, debut + timedelta(days=1)
+
+
+def recalculer_jour(jour, type_commande):
+    """Recalcule une seule case (jour, type) : un agrégat borné à une journée."""
+    debut, fin = bornes_jour(jour)
+    agregat = Commande.objects.filter(
+        type_commande=type_commande, date_creation__gte=debut, date_creation__lt=fin
+    ).aggregate(**AGREGATS)
+
+    if not agregat['nb_commandes']:
+        StatistiqueJournaliere.objects.filter(jour=jour, type_commande=type_commande).delete()
+        return None
+    stat, _ = StatistiqueJournaliere.objects.update_or_create(
+        jour=jour, type_commande=type_commande, defaults=_valeurs(agregat)
+    )
+    return stat
+
+
+def planifier_recalcul(date_creation, type_commande):
+    """Recalcul de la case après validation de la transaction en cours."""
+    if not date_creation or not type_commande:
+        return
+    jour = timezone.localdate(date_creation)
+    transaction.on_commit(lambda: recalculer_jour(jour, type_commande))
+
+
+def calculer_tout():
+    """Agrégats attendus pour toutes les cases, calculés depuis les tables de base."""
+    lignes = (
+        Commande.objects.annotate(jour=TruncDate('date_creation'))
+        .values('jour', 'type_commande')
+        .annotate(**AGREGATS)
+        .order_by()
+    )
+    return {(l['jour'], l['type_commande']): _valeurs(l) for l in lignes}
+
+
+@transaction.atomic
+def reconstruire():
+    """Reconstruit entièrement la table d'agrégats (un GROUP BY)."""
+    attendu = calculer_tout()
+    StatistiqueJournaliere.objects.all().delete()
+    StatistiqueJournaliere.objects.bulk_create([
+        StatistiqueJournaliere(jour=jour, type_commande=type_commande, **valeurs)
+        for (jour, type_commande), valeurs in attendu.items()
+    ], batch_size=1000)
+    return len(attendu)
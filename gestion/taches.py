@@ -0,0 +1,289 @@
+import logging
+import secrets
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caisse import GABARIT_BROUILLARD, LISTE_MOIS, contexte_brouillard
+from .documents import nom_pdf, pdf_facture, rendre_pdf, zip_factures
+from .filtres import filtrer_factures, lire_filtres_factures
+from .importation import (
+    estimer_lignes, format_fichier, importer_blocs, lire_lot, lire_par_blocs, verifier_blocs,
+)
+from .models import Facture, TacheImport, TachePDF
+
+logger = logging.getLogger(__name__)
+
+
+# =================================================================
+#  FILE D'ATTENTE EN BASE (sans courtier externe)
+# =================================================================
+# Les tâches sont créées par les vues et exécutées par
+# "manage.py traiter_taches". Sans travailleur (TACHES_EN_ARRIERE_PLAN = False),
+# la vue exécute la tâche immédiatement : le suivi reste identique.
+# Une tâche restée EN_COURS au-delà de TACHES_DUREE_MAXIMUM (travailleur
+# arrêté en cours de route) passe en échec : le suivi ne tourne pas sans fin.
+
+def en_arriere_plan():
+    return getattr(settings, 'TACHES_EN_ARRIERE_PLAN', False)
+
+
+def _utilisateur(utilisateur):
+    return utilisateur if utilisateur and utilisateur.is_authenticated else None
+
+
+def creer_tache_import(fichier, utilisateur=None, verification=False):
+    """verification=True : vérification à blanc, sans écriture dans les commandes."""
+    format_fichier(fichier.name)  # ValueError si le format n'est pas pris en charge
+    tache = TacheImport.objects.create(
+        nom_fichier=fichier.name,
+        fichier=fichier.read(),
+        mode='VERIFICATION' if verification else 'IMPORT',
+        utilisateur=_utilisateur(utilisateur),
+    )
+    if not en_arriere_plan():
+        executer_tache_import(tache)
+    return tache
+
+
+def creer_import_verifie(jeton, utilisateur=None):
+    """
+    Import des lignes d'une vérification à blanc, retrouvée par son jeton :
+    le lot déjà validé est repris tel quel, le fichier n'est pas relu.
+    """
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_VERIFICATION_VALIDITE', 86400))
+    verification = (
+        TacheImport.objects.defer('fichier', 'lot_valide', 'rapport')
+        .filter(mode='VERIFICATION', statut='TERMINE', jeton=jeton, date_fin__gte=limite)
+        .first()
+    ) if jeton else None
+    if verification is None:
+        raise ValueError("Vérification introuvable ou expirée : relancer la vérification du fichier.")
+    if verification.utilisateur_id not in (None, getattr(utilisateur, 'pk', None)):
+        raise ValueError("Cette vérification appartient à un autre utilisateur.")
+    # Le jeton ne sert qu'une fois (UPDATE conditionnel, comme prendre_tache)
+    if not TacheImport.objects.filter(pk=verification.pk, jeton=jeton).update(jeton=''):
+        raise ValueError("Ce fichier vérifié est déjà en cours d'import.")
+
+    tache = TacheImport.objects.create(
+        nom_fichier=verification.nom_fichier,
+        fichier=b'',
+        verification=verification,
+        lignes_total=verification.lignes_valides,
+        utilisateur=_utilisateur(utilisateur),
+    )
+    if not en_arriere_plan():
+        executer_tache_import(tache)
+    return tache
+
+
+def prendre_tache(modele=TacheImport):
+    """
+    Réserve la plus ancienne tâche en attente (TacheImport ou TachePDF).
+    L'UPDATE conditionnel garantit qu'un seul travailleur l'obtient, quelle
+    que soit la base : plusieurs "traiter_taches" peuvent tourner ensemble.
+    """
+    for pk in modele.objects.filter(statut='EN_ATTENTE').order_by('date_creation').values_list('pk', flat=True)[:5]:
+        reservee = modele.objects.filter(pk=pk, statut='EN_ATTENTE').update(
+            statut='EN_COURS', date_debut=timezone.now()
+        )
+        if reservee:
+            return modele.objects.get(pk=pk)
+    return None
+
+
+def expirer_taches():
+    """
+    Passe en échec les tâches EN_COURS depuis plus de TACHES_DUREE_MAXIMUM
+    secondes. Elles ne sont pas relancées : un import interrompu a déjà
+    validé une partie de ses blocs. Retourne le nombre de tâches expirées.
+    """
+    maintenant = timezone.now()
+    limite = maintenant - timedelta(seconds=getattr(settings, 'TACHES_DUREE_MAXIMUM', 3600))
+    return sum(
+        modele.objects.filter(statut='EN_COURS', date_debut__lt=limite).update(
+            statut='ECHEC', date_fin=maintenant,
+            message="Tâche interrompue (travailleur arrêté) : relancer l'opération.",
+        )
+        for modele in (TachePDF, TacheImport)
+    )
+
+
+# =================================================================
+#  EXÉCUTION D'UN IMPORT
+# =================================================================
+
+def _progression(tache):
+    def maj(rapport):
+        TacheImport.objects.filter(pk=tache.pk).update(
+            lignes_traitees=rapport['lignes'], importes=rapport.get('importes', 0),
+            doublons=rapport['doublons'], lignes_rejetees=rapport['rejetees'],
+            erreurs=rapport['erreurs'], lignes_valides=rapport.get('valides', 0),
+            avertissements=rapport.get('avertissements', 0),
+        )
+    return maj
+
+
+def _importer(tache):
+    """
+    Lit, valide et importe le fichier bloc par bloc (mémoire bornée), ou
+    reprend le lot d'une vérification à blanc. Chaque bloc est validé (commit)
+    séparément : la progression est visible depuis les autres requêtes. Les
+    lignes invalides sont écartées et listées.
+    """
+    if tache.verification_id:
+        verification = TacheImport.objects.only('lot_valide').get(pk=tache.verification_id)
+        blocs, deja_valides = lire_lot(bytes(verification.lot_valide)), True
+    else:
+        contenu = bytes(tache.fichier)
+        TacheImport.objects.filter(pk=tache.pk).update(lignes_total=estimer_lignes(contenu, tache.nom_fichier))
+        blocs, deja_valides = lire_par_blocs(BytesIO(contenu), tache.nom_fichier), False
+
+    rapport = importer_blocs(blocs, progression=_progression(tache), deja_valides=deja_valides)
+    tache.message = f"{rapport['importes']} importés, {rapport['doublons']} doublons ignorés."
+    if rapport['rejetees']:
+        tache.message += f" {rapport['rejetees']} ligne(s) invalide(s) écartée(s)."
+    TacheImport.objects.filter(pk=tache.pk).update(lignes_total=rapport['lignes'])
+    if tache.verification_id:
+        TacheImport.objects.filter(pk=tache.verification_id).update(lot_valide=b'')
+
+
+def _verifier(tache):
+    """Vérification à blanc : rapport annoté et lot validé, repris par jeton."""
+    contenu = bytes(tache.fichier)
+    TacheImport.objects.filter(pk=tache.pk).update(lignes_total=estimer_lignes(contenu, tache.nom_fichier))
+    rapport, lot, classeur = verifier_blocs(
+        lire_par_blocs(BytesIO(contenu), tache.nom_fichier), progression=_progression(tache)
+    )
+    tache.message = (
+        f"{rapport['valides']} ligne(s) importable(s), {rapport['doublons']} doublon(s), "
+        f"{rapport['rejetees']} ligne(s) en erreur, {rapport['avertissements']} avertissement(s)."
+    )
+    importable = rapport['valides'] > 0 and not rapport['colonnes_manquantes']
+    TacheImport.objects.filter(pk=tache.pk).update(
+        lignes_total=rapport['lignes'],
+        lot_valide=lot if importable else b'',
+        jeton=secrets.token_urlsafe(32) if importable else '',
+        rapport=classeur,
+    )
+
+
+def executer_tache_import(tache):
+    if tache.statut == 'EN_ATTENTE':
+        tache.statut, tache.date_debut = 'EN_COURS', timezone.now()
+        tache.save(update_fields=['statut', 'date_debut'])
+
+    try:
+        if tache.mode == 'VERIFICATION':
+            _verifier(tache)
+        else:
+            _importer(tache)
+        tache.statut = 'TERMINE'
+    except Exception as e:
+        logger.exception("Échec de la tâche d'import %s", tache.pk)
+        tache.statut = 'ECHEC'
+        tache.message = f"Erreur: {e}"
+
+    tache.refresh_from_db(fields=[
+        'lignes_total', 'lignes_traitees', 'importes', 'doublons', 'lignes_rejetees', 'erreurs',
+        'lignes_valides', 'avertissements', 'jeton',
+    ])
+    tache.date_fin = timezone.now()
+    # Le fichier n'est plus utile une fois la tâche terminée
+    tache.fichier = b''
+    tache.save(update_fields=['statut', 'message', 'date_fin', 'fichier'])
+    return tache
+
+
+# =================================================================
+#  RENDU PDF EN ARRIÈRE-PLAN
+# =================================================================
+# Brouillards de caisse, factures volumineuses et archives ZIP de factures :
+# la requête web ne fait que créer la tâche, le rendu est fait par le
+# travailleur et le document conservé jusqu'au téléchargement (puis purgé
+# après TACHES_PDF_CONSERVATION secondes).
+
+def creer_tache_pdf(document, parametres, utilisateur=None):
+    tache = TachePDF.objects.create(
+        document=document, parametres=parametres, utilisateur=_utilisateur(utilisateur)
+    )
+    if not en_arriere_plan():
+        executer_tache_pdf(tache)
+    return tache
+
+
+def _rendre_document(tache, travailleur=False):
+    """(nom du fichier, octets du document) ; ValueError si le rendu échoue."""
+    parametres = tache.parametres
+    if tache.document == 'BROUILLARD':
+        mois, annee = int(parametres['mois']), int(parametres['annee'])
+        contenu = rendre_pdf(GABARIT_BROUILLARD, contexte_brouillard(mois, annee))
+        nom = f"Brouillard_{mois}_{annee}.pdf"
+        tache.message = f"Brouillard de caisse {dict(LISTE_MOIS)[mois]} {annee}."
+    elif tache.document == 'ARCHIVE':
+        filtres = lire_filtres_factures(parametres)
+        factures = filtrer_factures(Facture.objects.filter(type_document='FACTURE'), filtres).order_by('date_emission', 'id')
+        sortie = BytesIO()
+        # Pool de processus (PDF_PROCESSUS, défaut : nombre de CPU) dans le
+        # travailleur seulement ; dans la requête web, rendu en série
+        rapport = zip_factures(factures, sortie, processus=None if travailleur else 1)
+        contenu = sortie.getvalue()
+        periode = '_'.join(filter(None, [filtres['start_date'], filtres['end_date']])) or timezone.localdate().isoformat()
+        nom = f"factures_{periode}.zip"
+        tache.message = f"{rapport['documents']} facture(s), {len(rapport['erreurs'])} PDF en erreur."
+    else:
+        facture = Facture.objects.select_related('commande').prefetch_related('lignes').get(pk=parametres['facture_id'])
+        contenu = pdf_facture(facture)
+        nom = nom_pdf(facture)
+        tache.message = f"{facture.get_type_document_display()} {facture.numero_document}."
+    if contenu is None:
+        raise ValueError("Erreur technique lors de la génération du PDF")
+    return nom, contenu
+
+
+def executer_tache_pdf(tache, travailleur=False):
+    """travailleur=True : appelé par traiter_file (pool de rendu autorisé)."""
+    if tache.statut == 'EN_ATTENTE':
+        tache.statut, tache.date_debut = 'EN_COURS', timezone.now()
+        tache.save(update_fields=['statut', 'date_debut'])
+
+    try:
+        tache.nom_fichier, tache.contenu = _rendre_document(tache, travailleur)
+        tache.statut = 'TERMINE'
+    except Exception as e:
+        logger.exception("Échec de la tâche PDF %s", tache.pk)
+        tache.statut = 'ECHEC'
+        tache.message = f"Erreur: {e}"
+
+    tache.date_fin = timezone.now()
+    tache.save(update_fields=['statut', 'message', 'nom_fichier', 'contenu', 'date_fin'])
+    return tache
+
+
+def purger_taches_pdf():
+    """Supprime les PDF terminés depuis plus de TACHES_PDF_CONSERVATION secondes."""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TACHES_PDF_CONSERVATION', 86400))
+    return TachePDF.objects.filter(date_fin__lt=limite).delete()[0]
+
+
+def traiter_file(maximum=None):
+    """
+    Exécute les tâches en attente ; retourne le nombre de tâches traitées.
+    Les PDF (attendus par un utilisateur) passent avant les imports.
+    """
+    purger_taches_pdf()
+    expirer_taches()
+    traitees = 0
+    while maximum is None or traitees < maximum:
+        tache = prendre_tache(TachePDF)
+        if tache is not None:
+            executer_tache_pdf(tache, travailleur=True)
+        else:
+            tache = prendre_tache(TacheImport)
+            if tache is None:
+                break
+            executer_tache_import(tache)
+        traitees += 1
+    return traitees
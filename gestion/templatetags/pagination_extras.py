@@ -0,0 +1,15 @@
+from django import template
+
+from gestion.pagination import PARAM_APRES, PARAM_AVANT
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def url_curseur(context, param, jeton):
+    """Query string de la page courante avec le curseur remplacé (filtres conservés)."""
+    params = context['request'].GET.copy()
+    for cle in ('page', PARAM_APRES, PARAM_AVANT):
+        params.pop(cle, None)
+    params[param] = jeton
+    return '?' + params.urlencode()
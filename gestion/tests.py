@@ -1,3 +1,668 @@
+import csv
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from openpyxl import load_workbook
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .alertes import REGLES, calculer_compteurs, recalculer_compteurs, requete_alerte
+from .caisse import cloturer_mois, ecarts_soldes, operations_mois, solde_avant
+from .documents import pdf_facture
+from .exports import ENTETES, JEUX, ecrire_xlsx, flux_csv, lignes_export
+from .filtres import filtrer_commandes, filtrer_factures, lire_filtres, lire_filtres_factures
+from .importation import MOTIFS_DOUBLONS, importer_blocs, lire_lot, lire_par_blocs, verifier_blocs
+from .models import (
+    CityClimaDetails, ClotureCaisse, Commande, CompteurAlertes, DocumentPDF, Facture, FactureLigne, OperationCaisse,
+    StatistiqueJournaliere, TapisDetails,
+)
+from .pagination import PaginateurCurseur, compter, estimer_compte
+from .recherche import filtre_recherche
+from .statistiques import bornes_jour
+from .views import ORDRE_FICHES
+
+
+# =================================================================
+#  PLANS D'EXÉCUTION DES REQUÊTES FRÉQUENTES (SQLite)
+# =================================================================
+# Chaque requête doit passer par un index (SEARCH ... USING INDEX) et aucune
+# table ne doit être parcourue en entier : un filtre non indexable
+# (date__month, __date...) ou un index manquant fait échouer le test.
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN propre à SQLite")
+class PlansRequetesTests(TestCase):
+    jour = date(2025, 3, 4)
+
+    def assertUtiliseIndex(self, queryset, index=None):
+        plan = queryset.explain()
+        for ligne in plan.splitlines():
+            # "SCAN table" seul = parcours complet ; "SCAN ... USING INDEX" (index partiel) est accepté
+            if re.search(r'\bSCAN gestion_\w+$', ligne):
+                self.fail(f"Parcours complet de table :\n{plan}")
+        self.assertRegex(plan, r'USING (COVERING )?INDEX ' + (re.escape(index) if index else ''))
+
+    def test_caisse(self):
+        self.assertUtiliseIndex(operations_mois(2025, 3), 'caisse_date_id_idx')
+        # Report : dernière opération avant le mois (caisse.solde_avant)
+        self.assertUtiliseIndex(
+            OperationCaisse.objects.filter(date__lt=self.jour).order_by('-date', '-id')[:1], 'caisse_date_id_idx'
+        )
+
+    def test_commandes_par_date_de_creation(self):
+        fiches = filtrer_commandes(Commande.objects.all(), lire_filtres({'date_crea': '2025-03-04'}))
+        self.assertUtiliseIndex(fiches.order_by(*ORDRE_FICHES), 'cmd_date_crea_idx')
+
+        debut, fin = bornes_jour(self.jour)
+        # Tableau de bord (commandes récentes sur la période) et statistiques du jour
+        self.assertUtiliseIndex(
+            Commande.objects.filter(date_creation__gte=debut, date_creation__lt=fin).order_by('-date_creation')[:5],
+            'cmd_date_crea_idx',
+        )
+        self.assertUtiliseIndex(
+            Commande.objects.filter(type_commande='TAPISPROP', date_creation__gte=debut, date_creation__lt=fin),
+            'cmd_type_date_crea_idx',
+        )
+        self.assertUtiliseIndex(
+            Commande.objects.filter(client_id=1).order_by('-date_creation'), 'cmd_client_date_crea_idx'
+        )
+        self.assertUtiliseIndex(Commande.objects.filter(numero_client__in=['0707000000']), 'cmd_numero_idx')
+
+    def test_filtres_resume_commandes(self):
+        # (fidelise, booléen peu sélectif, reste un parcours de table)
+        for filtres in ({'statut': 'PRET'}, {'type_commande': 'TAPISPROP'}):
+            self.assertUtiliseIndex(filtrer_commandes(Commande.objects.all(), lire_filtres(filtres)))
+
+    def test_alertes(self):
+        self.assertUtiliseIndex(requete_alerte('alertes_tapis_retard', self.jour), 'tapis_echeance_retard_idx')
+        self.assertUtiliseIndex(requete_alerte('alertes_tapis_fidelisation', self.jour), 'tapis_echeance_fid_idx')
+        for regle in ('alertes_city', 'alertes_clima'):
+            self.assertUtiliseIndex(requete_alerte(regle, self.jour))
+
+    def test_suivi_tapis_et_retouches(self):
+        self.assertUtiliseIndex(
+            TapisDetails.objects.filter(statut='NON_RESPECTE').order_by('date_traitement', 'id'),
+            'tapis_statut_traitement_idx',
+        )
+        self.assertUtiliseIndex(
+            TapisDetails.objects.filter(statut='ABANDON').order_by('-date_ramassage', '-id'),
+            'tapis_statut_ramassage_idx',
+        )
+        self.assertUtiliseIndex(
+            CityClimaDetails.objects.filter(satisfaction='KO_RET').order_by('date_intervention', 'id'),
+            'city_retouche_idx',
+        )
+
+    def test_factures_et_statistiques(self):
+        filtres = lire_filtres_factures({'start_date': '2025-01-01', 'end_date': '2025-03-31'})
+        self.assertUtiliseIndex(
+            filtrer_factures(Facture.objects.filter(type_document='FACTURE'), filtres).order_by('-date_emission'),
+            'facture_type_date_idx',
+        )
+        self.assertUtiliseIndex(StatistiqueJournaliere.objects.filter(jour__gte=self.jour, jour__lte=self.jour))
+
+
+# =================================================================
+#  COMPTEURS D'ALERTES MAINTENUS PAR LES SIGNAUX
+# =================================================================
+# Après chaque écriture, la ligne de compteurs doit égaler le recomptage
+# complet des règles (requete_alerte) : une dérive entre les compteurs de
+# la barre latérale et les listes d'alertes fait échouer le test.
+
+class CompteursAlertesTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.now().date()
+        recalculer_compteurs(self.today)
+
+    def assertCompteursExacts(self, **attendus):
+        compteur = CompteurAlertes.objects.get(pk=CompteurAlertes.PK_UNIQUE)
+        stockes = {nom: getattr(compteur, nom) for nom in REGLES}
+        self.assertEqual(stockes, calculer_compteurs(self.today))
+        for nom, valeur in attendus.items():
+            self.assertEqual(stockes[nom], valeur, nom)
+
+    def ecrire(self, fonction, *args):
+        # Les compteurs sont mis à jour après validation de la transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            fonction(*args)
+
+    def test_city_clima(self):
+        commande = Commande.objects.create(
+            nom_client="Awa", numero_client="0707000001", localisation_client="Cocody", type_commande='CITYPROP',
+        )
+        detail = CityClimaDetails(commande=commande, date_intervention=self.today - timedelta(days=200))
+        self.ecrire(detail.save)
+        self.assertCompteursExacts(alertes_city=1, alertes_clima=0)
+
+        # CITYPROP -> CLIMATISEUR : l'alerte change de compteur
+        commande.type_commande = 'CLIMATISEUR'
+        self.ecrire(commande.save)
+        self.assertCompteursExacts(alertes_city=0, alertes_clima=1)
+
+        # Intervention récente : plus d'échéance atteinte
+        detail.date_intervention = self.today - timedelta(days=10)
+        self.ecrire(detail.save)
+        self.assertCompteursExacts(alertes_clima=0)
+
+        detail.date_intervention = self.today - timedelta(days=100)
+        self.ecrire(detail.save)
+        self.assertCompteursExacts(alertes_clima=1)
+
+        detail.fidelise = True
+        self.ecrire(detail.save)
+        self.assertCompteursExacts(alertes_clima=0)
+
+        detail.fidelise = False
+        self.ecrire(detail.save)
+        self.ecrire(commande.delete)
+        self.assertCompteursExacts(alertes_city=0, alertes_clima=0)
+
+    def test_tapis(self):
+        commande = Commande.objects.create(
+            nom_client="Koffi", numero_client="0707000002", localisation_client="Yopougon", type_commande='TAPISPROP',
+        )
+        tapis = TapisDetails(commande=commande, date_ramassage=self.today - timedelta(days=20))
+        self.ecrire(tapis.save)
+        self.assertCompteursExacts(alertes_tapis_retard=1, alertes_tapis_fidelisation=0)
+
+        # Livraison ancienne : le retard disparaît, la fidélisation arrive à échéance
+        tapis.statut = 'LIVRE_SATISFAIT'
+        tapis.date_livraison = self.today - timedelta(days=200)
+        self.ecrire(tapis.save)
+        self.assertCompteursExacts(alertes_tapis_retard=0, alertes_tapis_fidelisation=1)
+
+        self.ecrire(tapis.delete)
+        self.assertCompteursExacts(alertes_tapis_retard=0, alertes_tapis_fidelisation=0)
+
+
+# =================================================================
+#  SOLDE HISTORIQUE ET CLÔTURES DE LA CAISSE
+# =================================================================
+# Toute écriture dans un mois passé recalcule les soldes suivants et les
+# clôtures concernées (après validation de la transaction).
+
+class SoldesCaisseTests(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.janvier = self.operation(date(2025, 1, 5), 'ENTREE', 1000)
+            self.fevrier = self.operation(date(2025, 2, 3), 'SORTIE', 200)
+            self.mars = self.operation(date(2025, 3, 2), 'ENTREE', 500)
+        cloturer_mois(2025, 1)
+        cloturer_mois(2025, 2)
+
+    def operation(self, jour, type_mouvement, montant):
+        return OperationCaisse.objects.create(
+            date=jour, equipe="Équipe 1", libelle="Opération", type_mouvement=type_mouvement, montant=montant,
+        )
+
+    def ecrire(self, fonction, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            fonction(*args)
+
+    def assertSoldes(self, attendus):
+        """attendus : soldes historiques dans l'ordre (date, id)."""
+        soldes = list(OperationCaisse.objects.order_by('date', 'id').values_list('solde_historique', flat=True))
+        self.assertEqual(soldes, [Decimal(s) for s in attendus])
+        self.assertEqual(ecarts_soldes(), [])
+
+    def assertCloture(self, mois, report, solde_cloture, nb_operations):
+        cloture = ClotureCaisse.objects.get(annee=2025, mois=mois)
+        self.assertEqual(
+            (cloture.report, cloture.solde_cloture, cloture.nb_operations),
+            (Decimal(report), Decimal(solde_cloture), nb_operations),
+        )
+
+    def test_etat_initial(self):
+        self.assertSoldes([1000, 800, 1300])
+        self.assertEqual(solde_avant(date(2025, 3, 1)), Decimal(800))
+        self.assertCloture(2, 1000, 800, 1)
+
+    def test_insertion_dans_un_mois_passe(self):
+        self.ecrire(self.operation, date(2025, 1, 10), 'SORTIE', 300)
+        self.assertSoldes([1000, 700, 500, 1000])
+        self.assertEqual(solde_avant(date(2025, 3, 1)), Decimal(500))
+        self.assertCloture(1, 0, 700, 2)
+        self.assertCloture(2, 700, 500, 1)
+
+    def test_modification_de_date_puis_de_montant(self):
+        # Mars -> janvier : le mois quitté et le mois rejoint sont recalculés
+        self.mars.date = date(2025, 1, 1)
+        self.ecrire(self.mars.save)
+        self.assertSoldes([500, 1500, 1300])
+        self.assertEqual(solde_avant(date(2025, 3, 1)), Decimal(1300))
+        self.assertCloture(1, 0, 1500, 2)
+        self.assertCloture(2, 1500, 1300, 1)
+
+        self.mars.montant = Decimal(100)
+        self.ecrire(self.mars.save)
+        self.assertSoldes([100, 1100, 900])
+        self.assertCloture(2, 1100, 900, 1)
+
+    def test_suppression(self):
+        self.ecrire(self.janvier.delete)
+        self.assertSoldes([-200, 300])
+        self.assertEqual(solde_avant(date(2025, 2, 1)), Decimal(0))
+        self.assertCloture(1, 0, 0, 0)
+        self.assertCloture(2, 0, -200, 1)
+
+
+# =================================================================
+#  ENREGISTREMENT DU BROUILLARD (formset de l'écran de caisse)
+# =================================================================
+
+class BrouillardCaisseTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@cityprop.ci', 'x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fevrier = self.operation(date(2025, 2, 10), 'ENTREE', 50)
+            self.lignes = [
+                self.operation(date(2025, 3, 2), 'ENTREE', 1000),
+                self.operation(date(2025, 3, 5), 'SORTIE', 200),
+                self.operation(date(2025, 3, 9), 'ENTREE', 300),
+            ]
+
+    def operation(self, jour, type_mouvement, montant):
+        return OperationCaisse.objects.create(
+            date=jour, equipe="Équipe 1", libelle=f"Opération du {jour}", type_mouvement=type_mouvement, montant=montant,
+        )
+
+    def ligne(self, i, operation=None, **valeurs):
+        """Champs POST de la ligne i : l'opération telle qu'affichée, puis les valeurs saisies."""
+        if operation is not None:
+            valeurs = {
+                'id': operation.pk, 'date': operation.date.isoformat(), 'equipe': operation.equipe,
+                'libelle': operation.libelle, 'type_mouvement': operation.type_mouvement,
+                'montant': operation.montant, **valeurs,
+            }
+        return {f'form-{i}-{champ}': valeur for champ, valeur in valeurs.items()}
+
+    def poster(self, *lignes):
+        donnees = {
+            'form-TOTAL_FORMS': len(lignes), 'form-INITIAL_FORMS': len(self.lignes),
+            'form-MIN_NUM_FORMS': 0, 'form-MAX_NUM_FORMS': 1000,
+        }
+        for ligne in lignes:
+            donnees.update(ligne)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"{reverse('gestion_caisse')}?mois=3&annee=2025", donnees)
+
+    def soldes(self):
+        return list(OperationCaisse.objects.order_by('date', 'id').values_list('solde_historique', flat=True))
+
+    def test_seules_les_lignes_modifiees_sont_ecrites(self):
+        inchangee, modifiee, supprimee = self.lignes
+        reponse = self.poster(
+            self.ligne(0, inchangee),
+            self.ligne(1, modifiee, montant='250'),
+            self.ligne(2, supprimee, DELETE='on'),
+            self.ligne(3, date='2025-03-20', equipe="Équipe 2", libelle="Achat", type_mouvement='SORTIE', montant='100'),
+        )
+        self.assertEqual(reponse.status_code, 302)
+        self.assertIn(
+            "3 ligne(s) écrite(s) (1 ajoutée(s), 1 modifiée(s), 1 supprimée(s))",
+            str(list(get_messages(reponse.wsgi_request))[0]),
+        )
+        self.assertFalse(OperationCaisse.objects.filter(pk=supprimee.pk).exists())
+        self.assertEqual(OperationCaisse.objects.get(pk=modifiee.pk).montant, Decimal(250))
+        # Février (50), puis mars : +1000, -250, -100 (la ligne ajoutée)
+        self.assertEqual(self.soldes(), [Decimal(s) for s in (50, 1050, 800, 700)])
+        self.assertEqual(ecarts_soldes(), [])
+
+    def test_id_d_un_autre_mois_refuse(self):
+        avant = list(OperationCaisse.objects.order_by('id').values_list('id', 'date', 'montant', 'solde_historique'))
+        reponse = self.poster(
+            self.ligne(0, self.lignes[0], id=self.fevrier.pk, montant='9999'),
+            self.ligne(1, self.lignes[1]),
+            self.ligne(2, self.lignes[2]),
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(
+            list(OperationCaisse.objects.order_by('id').values_list('id', 'date', 'montant', 'solde_historique')), avant,
+        )
+        self.assertEqual(self.soldes(), [Decimal(s) for s in (50, 1050, 850, 1150)])
+
+
+# =================================================================
+#  IMPORT DE COMMANDES (doublons en base)
+# =================================================================
+
+FICHIER_IMPORT = (
+    "Date;Nom Client;Numéro Client;Localisation;Type Commande;Satisfaction / Statut;Coût\n"
+    "03/02/2025;Kouadio Émilie;0707123456;Cocody;CITYPROP;OK;15000\n"
+    "05/02/2025;Yao Koffi;0101020304;Yopougon;TAPISPROP;En cours;8000\n"
+).encode('utf-8')
+
+
+class ImportCommandesTests(TestCase):
+
+    def importer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return importer_blocs(lire_par_blocs(BytesIO(FICHIER_IMPORT), 'commandes.csv'))
+
+    def test_reimport_du_meme_fichier(self):
+        rapport = self.importer()
+        self.assertEqual((rapport['importes'], rapport['doublons']), (2, 0))
+        # La date du fichier est conservée (clé des doublons)
+        self.assertEqual(
+            sorted(timezone.localdate(d) for d in Commande.objects.values_list('date_creation', flat=True)),
+            [date(2025, 2, 3), date(2025, 2, 5)],
+        )
+
+        rapport = self.importer()
+        self.assertEqual((rapport['importes'], rapport['doublons']), (0, 2))
+        self.assertEqual(Commande.objects.count(), 2)
+
+    def test_verification_a_blanc_d_un_fichier_deja_importe(self):
+        self.importer()
+        rapport, lot, classeur = verifier_blocs(lire_par_blocs(BytesIO(FICHIER_IMPORT), 'commandes.csv'))
+        self.assertEqual((rapport['valides'], rapport['doublons']), (0, 2))
+        self.assertEqual(list(lire_lot(lot)), [])
+
+        feuille = load_workbook(BytesIO(classeur)).active
+        lignes = list(feuille.iter_rows(values_only=True))
+        resultat = lignes[0].index('Résultat')
+        self.assertEqual([ligne[resultat] for ligne in lignes[1:]], ['DOUBLON', 'DOUBLON'])
+        self.assertEqual(lignes[1][resultat + 1], MOTIFS_DOUBLONS['base'])
+
+
+# =================================================================
+#  RECHERCHE CLIENT (table d'index normalisée)
+# =================================================================
+# Chaque recherche est vérifiée avec le moteur de la base (FTS5 sur SQLite)
+# et avec le moteur simple (LIKE sur la table d'index).
+
+class RechercheCommandesTests(TestCase):
+
+    def setUp(self):
+        self.emilie = Commande.objects.create(
+            nom_client='Kouadio Émilie', numero_client='+225 07 07 12 34 56',
+            localisation_client='Cocody Angré', type_commande='CITYPROP',
+        )
+        self.koffi = Commande.objects.create(
+            nom_client='Yao Koffi', numero_client='01.01.02.03.04',
+            localisation_client='Yopougon', type_commande='TAPISPROP',
+        )
+
+    def assertTrouve(self, q, attendues):
+        for moteur in ('', 'simple'):
+            with self.subTest(q=q, moteur=moteur or connection.vendor), self.settings(RECHERCHE_MOTEUR=moteur):
+                self.assertEqual(set(Commande.objects.filter(filtre_recherche(q))), set(attendues))
+
+    def test_sans_accents_ni_casse(self):
+        self.assertTrouve('emilie', [self.emilie])
+        self.assertTrouve('ÉMILIE cocody', [self.emilie])
+        self.assertTrouve('Kouadio Émilie', [self.emilie])
+        self.assertTrouve('angre', [self.emilie])
+        self.assertTrouve('emilie yopougon', [])
+
+    def test_numero_de_telephone(self):
+        # Séparateurs ignorés, sous-chaîne des seuls chiffres
+        self.assertTrouve('07 07 12', [self.emilie])
+        self.assertTrouve('0707-123456', [self.emilie])
+        self.assertTrouve('01.02.03', [self.koffi])
+        self.assertTrouve('999', [])
+
+    def test_mots_courts(self):
+        # Moins de 3 lettres : hors trigrammes FTS5, repli sur LIKE
+        self.assertTrouve('ya', [self.koffi])
+
+
+# =================================================================
+#  PAGINATION PAR CURSEUR
+# =================================================================
+# Le parcours page par page (dans les deux sens) doit rendre exactement
+# l'ordre d'un tri complet, y compris sur des clés égales et des NULL.
+
+class PaginationCurseurTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        jours = [date(2025, 3, 1)] * 3 + [date(2025, 3, 2)] * 2 + [None] * 2
+        for i, jour in enumerate(jours):
+            commande = Commande.objects.create(
+                nom_client=f'Client {i}', numero_client=f'07000000{i:02d}',
+                localisation_client='Cocody', type_commande='CITYPROP',
+            )
+            # Résumé maintenu par les signaux : fixé directement pour le test
+            Commande.objects.filter(pk=commande.pk).update(date_operation=jour)
+
+    def attendu(self, descendant):
+        lignes = list(Commande.objects.values_list('date_operation', 'id'))
+        avec = sorted((l for l in lignes if l[0] is not None), reverse=descendant)
+        sans = sorted((l for l in lignes if l[0] is None), reverse=descendant)
+        return [pk for _, pk in avec + sans]
+
+    def parcourir(self, ordre):
+        """Ids lus page par page vers l'avant, puis à rebours depuis la dernière page."""
+        paginateur = PaginateurCurseur(Commande.objects.all(), 2, ordre)
+        pages = [paginateur.page()]
+        while pages[-1].has_next():
+            pages.append(paginateur.page(apres=pages[-1].curseur_suivant))
+        self.assertFalse(pages[0].has_previous())
+
+        arriere = [pages[-1]]
+        while arriere[-1].has_previous():
+            arriere.append(paginateur.page(avant=arriere[-1].curseur_precedent))
+        self.assertEqual(
+            [[c.pk for c in page] for page in arriere[::-1]], [[c.pk for c in page] for page in pages]
+        )
+        return [c.pk for page in pages for c in page]
+
+    def test_page_suivante_et_precedente(self):
+        paginateur = PaginateurCurseur(Commande.objects.all(), 3, ('-date_operation', '-id'))
+        premiere = paginateur.page()
+        deuxieme = paginateur.page(apres=premiere.curseur_suivant)
+        self.assertEqual([c.pk for c in [*premiere, *deuxieme]], self.attendu(True)[:6])
+        self.assertTrue(deuxieme.has_previous())
+        retour = paginateur.page(avant=deuxieme.curseur_precedent)
+        self.assertEqual([c.pk for c in retour], [c.pk for c in premiere])
+
+    def test_cles_egales_et_null_en_dernier(self):
+        # Pages de 2 sur 3 dates égales : la limite tombe au milieu d'un groupe
+        self.assertEqual(self.parcourir(('-date_operation', '-id')), self.attendu(True))
+        self.assertEqual(self.parcourir(('date_operation', 'id')), self.attendu(False))
+
+    def test_jeton_invalide(self):
+        paginateur = PaginateurCurseur(Commande.objects.all(), 2, ('-date_operation', '-id'))
+        self.assertEqual([c.pk for c in paginateur.page(apres='xx')], self.attendu(True)[:2])
+
+    def test_compte_en_cache(self):
+        qs = Commande.objects.all()
+        self.assertEqual(compter(qs, 'compte:test'), (7, False))
+        Commande.objects.filter(date_operation__isnull=True).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(compter(qs, 'compte:test'), (7, False))
+        # Sans clé : toujours recompté
+        self.assertEqual(compter(qs), (5, False))
+
+    def test_compte_estime(self):
+        qs = Commande.objects.all()
+        with self.settings(PAGINATION_SEUIL_ESTIMATION=5):
+            with patch('gestion.pagination.estimer_compte', return_value=50000):
+                self.assertEqual(compter(qs), (50000, True))
+            # Estimation sous le seuil : COUNT exact
+            with patch('gestion.pagination.estimer_compte', return_value=3):
+                self.assertEqual(compter(qs), (7, False))
+            # Pas d'estimation hors PostgreSQL
+            if connection.vendor != 'postgresql':
+                self.assertIsNone(estimer_compte(qs))
+                self.assertEqual(compter(qs), (7, False))
+
+
+# =================================================================
+#  CACHE DES PDF DE FACTURES (empreinte, ETag, invalidation)
+# =================================================================
+# Le moteur PDF est remplacé par un rendu factice qui compte ses appels.
+
+PDF_FACTICE = b'%PDF-1.4 facture'
+
+
+@patch('gestion.documents.rendre_pdf', return_value=PDF_FACTICE)
+class CachePdfFactureTests(TestCase):
+
+    def setUp(self):
+        commande = Commande.objects.create(
+            nom_client='Kouadio Émilie', numero_client='0707123456',
+            localisation_client='Cocody', type_commande='CITYPROP',
+        )
+        self.facture = Facture.objects.create(commande=commande, type_document='FACTURE')
+        self.ligne = FactureLigne.objects.create(
+            facture=self.facture, designation='Nettoyage', quantite=2, prix_unitaire=15000,
+        )
+        self.url = reverse('telecharger_devis_pdf', args=[self.facture.pk])
+
+    def pdf(self):
+        facture = Facture.objects.select_related('commande').prefetch_related('lignes').get(pk=self.facture.pk)
+        return pdf_facture(facture)
+
+    def assertInvalide(self):
+        self.assertFalse(DocumentPDF.objects.filter(facture=self.facture).exists())
+
+    def test_pdf_stocke_reutilise(self, rendu):
+        self.assertEqual(self.pdf(), PDF_FACTICE)
+        self.assertEqual(self.pdf(), PDF_FACTICE)
+        self.assertEqual(rendu.call_count, 1)
+        self.assertEqual(DocumentPDF.objects.filter(facture=self.facture).count(), 1)
+
+    def test_etag_et_304(self, rendu):
+        reponse = self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.content, PDF_FACTICE)
+        etag = reponse['ETag']
+
+        with self.assertNumQueries(2):  # facture + lignes : ni PDF stocké ni rendu
+            reponse = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(reponse.status_code, 304)
+        self.assertEqual(rendu.call_count, 1)
+
+        # Facture modifiée : nouvelle empreinte, l'ancien ETag ne correspond plus
+        self.facture.objet = 'Entretien annuel'
+        self.facture.save()
+        reponse = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertNotEqual(reponse['ETag'], etag)
+        self.assertEqual(rendu.call_count, 2)
+
+    def test_invalidation_a_l_enregistrement_de_la_facture(self, rendu):
+        self.pdf()
+        self.facture.save()
+        self.assertInvalide()
+
+    def test_invalidation_par_les_lignes(self, rendu):
+        self.pdf()
+        FactureLigne.objects.create(facture=self.facture, designation='Déplacement', quantite=1, prix_unitaire=5000)
+        self.assertInvalide()
+
+        self.pdf()
+        self.ligne.delete()
+        self.assertInvalide()
+        self.assertEqual(rendu.call_count, 2)
+
+
+# =================================================================
+#  EXPORT EXCEL DES COMMANDES
+# =================================================================
+
+def creer_commandes_export():
+    """Une commande CITYPROP et une commande TAPISPROP, avec leurs détails."""
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        city = Commande.objects.create(
+            nom_client='Kouadio Émilie', numero_client='0707123456',
+            localisation_client='Cocody', type_commande='CITYPROP',
+        )
+        CityClimaDetails.objects.create(
+            commande=city, designation='Nettoyage bureaux', cout=25000,
+            date_intervention=date(2025, 3, 4), satisfaction='OK', fidelise=True,
+        )
+        tapis = Commande.objects.create(
+            nom_client='Yao Koffi', numero_client='0101020304',
+            localisation_client='Yopougon', type_commande='TAPISPROP',
+        )
+        TapisDetails.objects.create(
+            commande=tapis, nombre_tapis=3, cout=12000, date_ramassage=date(2025, 3, 1),
+            date_traitement=date(2025, 3, 5), date_prevue_livraison=date(2025, 3, 10),
+            statut='PRET', commentaire='Franges abîmées',
+        )
+    return city, tapis
+
+
+class ExportCommandesExcelTests(TestCase):
+
+    def test_entete_et_lignes(self):
+        city, tapis = creer_commandes_export()
+        # Une seule requête jointe, quel que soit le nombre de commandes
+        with self.assertNumQueries(1):
+            fichier = ecrire_xlsx(lignes_export(Commande.objects.order_by('id')))
+
+        lignes = list(load_workbook(fichier).active.iter_rows(values_only=True))
+        self.assertEqual(list(lignes[0]), ENTETES)
+        creation = timezone.localdate().strftime('%d/%m/%Y')
+        self.assertEqual(list(lignes[1]), [
+            'Kouadio Émilie', '0707123456', 'Cocody', 'CITYPROP', creation,
+            'Nettoyage bureaux', 25000, '04/03/2025', '-', '-', '-', 'OK - client satisfait', 'Oui', '-',
+        ])
+        self.assertEqual(list(lignes[2]), [
+            'Yao Koffi', '0101020304', 'Yopougon', 'TAPISPROP', creation,
+            '3 tapis', 12000, '01/03/2025', '05/03/2025', '10/03/2025', '-',
+            'En attente(Sortie Atelier)', 'Non', 'Franges abîmées',
+        ])
+        self.assertEqual(len(lignes), 3)
+
+
+# =================================================================
+#  EXPORTS ANALYTIQUES CSV (en-tête et filtres de période)
+# =================================================================
+
+class ExportsAnalytiquesCsvTests(TestCase):
+
+    def lire(self, jeu, **params):
+        """(en-tête, lignes) du CSV produit en flux."""
+        lignes = list(csv.reader(StringIO(''.join(flux_csv(jeu, params)))))
+        self.assertEqual(lignes[0], [colonne for colonne, _, _ in JEUX[jeu][1]])
+        return lignes[0], lignes[1:]
+
+    def test_commandes(self):
+        city, tapis = creer_commandes_export()
+        # date_operation : intervention (04/03) pour CITYPROP, ramassage (01/03) pour TAPISPROP
+        entete, lignes = self.lire('commandes', date_debut='2025-03-02', date_fin='2025-03-31')
+        self.assertEqual([ligne[entete.index('id')] for ligne in lignes], [str(city.pk)])
+        self.assertEqual(lignes[0][entete.index('date_operation')], '2025-03-04')
+        self.assertEqual(len(self.lire('commandes')[1]), 2)
+
+    def test_factures(self):
+        commande = Commande.objects.create(
+            nom_client='Awa', numero_client='0707000001', localisation_client='Cocody', type_commande='CITYPROP',
+        )
+        for jour in (date(2025, 1, 31), date(2025, 2, 1), date(2025, 2, 28), date(2025, 3, 1)):
+            facture = Facture.objects.create(commande=commande, type_document='FACTURE', date_emission=jour)
+            FactureLigne.objects.create(facture=facture, designation='Nettoyage', quantite=2, prix_unitaire=5000)
+
+        entete, lignes = self.lire('factures', date_debut='2025-02-01', date_fin='2025-02-28')
+        self.assertEqual([ligne[entete.index('date_emission')] for ligne in lignes], ['2025-02-01', '2025-02-28'])
+        self.assertEqual(lignes[0][entete.index('total_ht')], '10000')
+        self.assertEqual(len(self.lire('factures', date_debut='2025-02-01')[1]), 3)
+
+    def test_caisse(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for jour, montant in ((date(2025, 1, 5), 1000), (date(2025, 2, 5), 200), (date(2025, 3, 5), 300)):
+                OperationCaisse.objects.create(
+                    date=jour, equipe="Équipe 1", libelle="Opération", type_mouvement='ENTREE', montant=montant,
+                )
 
-# Create your tests here.
+        entete, lignes = self.lire('caisse', date_debut='2025-02-01', date_fin='2025-03-31')
+        self.assertEqual(
+            [(ligne[entete.index('date')], ligne[entete.index('solde_historique')]) for ligne in lignes],
+            [('2025-02-05', '1200'), ('2025-03-05', '1500')],
+        )
+        self.assertEqual(len(self.lire('caisse', date_fin='2025-01-31')[1]), 1)
@@ -11,6 +11,7 @@ urlpatterns = [
 
     # Commandes
     path('commande/nouvelle/', views.nouvelle_commande, name='nouvelle_commande'),
+    path('clients/infos/', views.infos_client, name='infos_client'),
     
     
     # Fiches clients (Page de détail unique)
@@ -31,23 +32,32 @@ urlpatterns = [
 
     # Export commande
     path("export-commandes/", views.export_commandes_excel, name="export_commandes_excel"),
+    path("export/<str:jeu>/<str:format_fichier>/", views.export_donnees, name="export_donnees"),
     
     # --- FACTURE ---
     path('facture/creer/<int:fiche_id>/', views.creer_facture, name='creer_facture'),
     path('facture/<int:facture_id>/', views.voir_facture, name='voir_facture'),
     path('devis/<int:facture_id>/telecharger/', views.telecharger_devis_pdf, name='telecharger_devis_pdf'),
+    path('devis/<int:facture_id>/telecharger/tache/', views.telecharger_devis_pdf_tache, name='telecharger_devis_pdf_tache'),
     # ... vos autres urls ...
     path('facture/modifier/<int:pk>/', views.modifier_facture, name='modifier_facture'),
     path('facture/supprimer/<int:pk>/', views.supprimer_facture, name='supprimer_facture'),
     
     # ... vos autres urls
     path('finance/dashboard/', views.dashboard_financier, name='dashboard_financier'),
+    path('finance/factures/archive/', views.factures_zip, name='factures_zip'),
     
     path('caisse/excel/<int:mois>/<int:annee>/', views.export_caisse_excel, name='export_excel'),
     path('caisse/pdf/<int:mois>/<int:annee>/', views.export_caisse_pdf, name='export_pdf'),
+    path('caisse/pdf/<int:mois>/<int:annee>/tache/', views.export_caisse_pdf_tache, name='export_pdf_tache'),
+    path('pdf/taches/<int:tache_id>/', views.etat_tache_pdf, name='etat_tache_pdf'),
+    path('pdf/taches/<int:tache_id>/telecharger/', views.telecharger_tache_pdf, name='telecharger_tache_pdf'),
     path('caisse/', views.gestion_caisse, name='gestion_caisse'),
+    path('caisse/cloturer/<int:mois>/<int:annee>/', views.cloturer_caisse, name='cloturer_caisse'),
     
     path('import-ajax/', views.import_commandes_ajax, name='import_commandes_ajax'),
+    path('import-ajax/<int:tache_id>/progression/', views.progression_import, name='progression_import'),
+    path('import-ajax/<int:tache_id>/rapport/', views.rapport_import, name='rapport_import'),
     path('modele-excel/', views.generer_modele_excel, name='generer_modele_excel'),
     
     path('suivi-atelier-tapis/', views.suivi_atelier_tapis, name='suivi_atelier_tapis'),
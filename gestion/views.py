@@ -1,5 +1,6 @@
 # 1. Bibliothèques Python Standard
 import datetime
+import os
 from io import BytesIO
 from datetime import timedelta
 
@@ -10,18 +11,17 @@ from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter, quote_sheetname
 from openpyxl.worksheet.datavalidation import DataValidation
 from num2words import num2words
-from xhtml2pdf import pisa
 from django.db.models import Q
 from datetime import date, timedelta
 
 # 3. Django Core (Raccourcis, Réponses & Auth)
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.template.loader import get_template
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.utils import timezone
 from datetime import datetime, timedelta, time
 
@@ -29,9 +29,9 @@ from datetime import datetime, timedelta, time
 from django.db import transaction
 from django.db.models import Sum, Count, Q
 from django.core.paginator import Paginator
-from django.forms import DateField, modelformset_factory
+from django.forms import modelformset_factory
 from django.shortcuts import render
-from django.db.models import Q, F
+from django.db.models import Q, F, Case, When
 from django.db.models.functions import Coalesce,Cast,TruncDate
 from django.core.paginator import Paginator
 from .models import Commande
@@ -45,7 +45,11 @@ from .models import (
     Facture, 
     FactureLigne, 
     OperationCaisse,
-    TapisAlerteCommentaire  # Ajouté car présent dans votre models.py précédent
+    TapisAlerteCommentaire,  # Ajouté car présent dans votre models.py précédent
+    StatistiqueJournaliere,
+    Client,
+    TacheImport,
+    TachePDF,
 )
 from django.http import JsonResponse, HttpResponse
 from django.contrib.auth.decorators import login_required
@@ -53,6 +57,20 @@ from django.utils import timezone
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.worksheet.datavalidation import DataValidation
 from .models import Commande, CityClimaDetails, TapisDetails
+from .alertes import requete_alerte, calculer_compteurs
+from .pagination import paginer
+from .recherche import filtre_recherche
+from .clients import trouver_client
+from .exports import FORMATS_ANALYTIQUES, JEUX, ecrire_arrow, ecrire_xlsx, flux_csv, lignes_export
+from .filtres import PARAMETRES_FACTURES, filtrer_commandes, filtrer_factures, lire_filtres, lire_filtres_factures
+from .statistiques import bornes_jour
+from .documents import empreinte_facture, pdf_facture, rendre_pdf
+from .caisse import (
+    GABARIT_BROUILLARD, LISTE_MOIS, bilan_mois, cloturer_mois, contexte_brouillard, enregistrer_brouillard,
+    operations_mois, solde_annuel,
+)
+from .taches import creer_import_verifie, creer_tache_import, creer_tache_pdf, expirer_taches
+from .forms import FormSetBrouillard
 
 
 
@@ -165,50 +183,36 @@ def modifier_facture(request, pk):
         'commande': commande
     })
 
-# Cette fonction est essentielle pour la conversion PDF
-
-def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html  = template.render(context_dict)
-    
-    # Créer un tampon binaire en mémoire (BytesIO)
-    result = BytesIO()
-    
-    # Générer le PDF (en utilisant le template facture_detail.html)
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
-    # Pour le débogage, vous pouvez retourner le HTML si erreur
-    return HttpResponse('Nous avons rencontré des erreurs lors de la génération du PDF: %s' % html)
-
 
 def telecharger_devis_pdf(request, facture_id):
     """
-    Génère et télécharge le PDF d'une facture/devis spécifique.
+    Télécharge le PDF d'une facture/devis spécifique. Le PDF rendu est
+    conservé avec son empreinte (voir documents.py) : un document inchangé
+    n'est pas rendu à nouveau, et l'ETag permet au navigateur de le garder.
     """
-    facture = get_object_or_404(Facture, id=facture_id) 
-    
-    # 🔑 CORRECTION CRITIQUE : Ajout de l'objet 'request' au contexte
-    # Ceci permet au template de construire l'URL absolue du logo.
-    context = {
-        'facture': facture,
-        'request': request,  
-    }
+    facture = get_object_or_404(
+        Facture.objects.select_related('commande').prefetch_related('lignes'), id=facture_id
+    )
+    empreinte = empreinte_facture(facture)
+    etag = f'"{empreinte}"'
+
+    # Le navigateur a déjà cette version : 304 sans lire ni rendre le PDF
+    inchange = get_conditional_response(request, etag=etag)
+    if inchange is not None:
+        return inchange
+
+    contenu = pdf_facture(facture, empreinte)
+    if contenu is None:
+        return HttpResponse("Impossible de générer le PDF.")
 
     # Nom du fichier pour le téléchargement
     filename = f'{facture.type_document}_CityProp_{facture.numero_document}.pdf'
-    
-    # Le template pour le PDF est 'facture_telechargement.html'
-    # Assurez-vous que render_to_pdf utilise le moteur de template Django correctement
-    pdf_response = render_to_pdf('index/facture_telechargement.html', context)
-    
-    if pdf_response:
-        # Indique au navigateur de télécharger le fichier (attachment)
-        pdf_response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return pdf_response
-    
-    return HttpResponse("Impossible de générer le PDF.")
+    response = HttpResponse(contenu, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Content-Length'] = len(contenu)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 # --- Vues de Facturation (corrigée avec la logique robuste) ---
 
@@ -225,51 +229,72 @@ def dashboard(request):
     end_date_str = request.GET.get('end_date')
     commande_filter = Q()
     details_filter = Q()
+    stats_filter = Q()
 
     if start_date_str and end_date_str:
         try:
             d_start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
             d_end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            dt_start = timezone.make_aware(datetime.combine(d_start, time.min))
-            dt_end = timezone.make_aware(datetime.combine(d_end, time.max))
-            commande_filter &= Q(date_creation__range=(dt_start, dt_end))
-            details_filter &= Q(commande__date_creation__range=(dt_start, dt_end))
+            # Plage semi-ouverte [début du premier jour, lendemain du dernier)
+            dt_start, dt_end = bornes_jour(d_start)[0], bornes_jour(d_end)[1]
+            commande_filter &= Q(date_creation__gte=dt_start, date_creation__lt=dt_end)
+            details_filter &= Q(commande__date_creation__gte=dt_start, commande__date_creation__lt=dt_end)
+            stats_filter &= Q(jour__range=(d_start, d_end))
         except ValueError: pass
 
-    # 2. KPI - VOLUMES
-    total_commandes = Commande.objects.filter(commande_filter).count()
-    total_cityprop = Commande.objects.filter(commande_filter, type_commande="CITYPROP").count()
-    total_clim = Commande.objects.filter(commande_filter, type_commande="CLIMATISEUR").count()
-    total_tapis = Commande.objects.filter(commande_filter, type_commande="TAPISPROP").count()
+    # 2. KPI - VOLUMES, KO ET FIDÉLISATION (agrégats journaliers pré-calculés)
+    par_type = {
+        ligne['type_commande']: ligne
+        for ligne in StatistiqueJournaliere.objects.filter(stats_filter)
+        .values('type_commande')
+        .annotate(
+            commandes=Sum('nb_commandes'),
+            ko=Sum('nb_ko'),
+            non_fidelises=Sum('nb_non_fidelises'),
+        )
+    }
+    total_cityprop = par_type.get('CITYPROP', {}).get('commandes') or 0
+    total_clim = par_type.get('CLIMATISEUR', {}).get('commandes') or 0
+    total_tapis = par_type.get('TAPISPROP', {}).get('commandes') or 0
+    total_commandes = sum(ligne['commandes'] or 0 for ligne in par_type.values())
 
     # 3. KO RETOUR (Cityprop satisfaction KO_RET + Tapis statut KO_RET)
-    ko_city = CityClimaDetails.objects.filter(details_filter, satisfaction="KO_RET").count()
-    ko_tapis = TapisDetails.objects.filter(details_filter, statut="KO_RET").count()
-    total_ko_ret = ko_city + ko_tapis
+    total_ko_ret = sum(ligne['ko'] or 0 for ligne in par_type.values())
 
     # 4. ALERTE FIDÉLISATION GLOBALE (Tous les non fidélisés)
-    non_fidel_city = CityClimaDetails.objects.filter(details_filter, fidelise=False).count()
-    non_fidel_tapis = TapisDetails.objects.filter(details_filter, fidelise=False).count()
-    total_a_fideliser = non_fidel_city + non_fidel_tapis
-
-    # 5. RETARDS TAPIS (Plus de 11 jours et non livré)
-    alertes_tapis_7j = TapisDetails.objects.filter(
-        details_filter,
-        date_ramassage__lte=today - timedelta(days=11),
-        statut__in=["NON_RESPECTE", "PRET", "CLIENT_INDISPO"]
-    ).count()
-
-    # 6. GRAPHIQUE COMPARATIF (Dates en Français)
+    total_a_fideliser = sum(ligne['non_fidelises'] or 0 for ligne in par_type.values())
+
+    # 5. RETARDS TAPIS (Échéance de retard dépassée et non livré)
+    alertes_tapis_7j = requete_alerte('alertes_tapis_retard', today).filter(details_filter).count()
+
+    # 6. GRAPHIQUE COMPARATIF (Dates en Français) - 14 jours en une requête
+    par_jour = dict(
+        StatistiqueJournaliere.objects.filter(jour__gte=today - timedelta(days=13), jour__lte=today)
+        .values('jour')
+        .annotate(total=Sum('nb_commandes'))
+        .values_list('jour', 'total')
+    )
     stats_actuelle, stats_precedente, labels_jours = [], [], []
     for i in range(6, -1, -1):
         dA = today - timedelta(days=i)
-        stats_actuelle.append(Commande.objects.filter(date_creation__date=dA).count())
+        stats_actuelle.append(par_jour.get(dA, 0))
         labels_jours.append(jours_fr.get(dA.strftime('%a'), dA.strftime('%a')))
-        stats_precedente.append(Commande.objects.filter(date_creation__date=dA - timedelta(days=7)).count())
+        stats_precedente.append(par_jour.get(dA - timedelta(days=7), 0))
 
     # 7. LISTES
     commandes_recents = Commande.objects.filter(commande_filter).order_by('-date_creation')[:5]
-    top_clients = Commande.objects.filter(commande_filter).values("nom_client").annotate(total=Count("id")).order_by("-total")[:5]
+    if commande_filter:
+        # Sur une période : regroupement sur la clé étrangère client (indexée)
+        top_clients = (
+            Commande.objects.filter(commande_filter, client__isnull=False)
+            .values("client_id", nom=F("client__nom"))
+            .annotate(total=Count("id")).order_by("-total")[:5]
+        )
+    else:
+        # Tous temps confondus : compteurs maintenus sur Client (index client_top_idx)
+        top_clients = Client.objects.order_by("-nb_commandes", "id").values(
+            "nom", total=F("nb_commandes")
+        )[:5]
 
     context = {
         "total_commandes": total_commandes, "total_cityprop": total_cityprop,
@@ -346,107 +371,63 @@ def nouvelle_commande(request):
         return redirect('liste_fiches')
 
     return render(request, 'index/nouvelle_commande.html')
+
+
+ORDRE_FICHES = ('-date_operation', '-id')
+
+
 @login_required
 def liste_fiches(request):
     # 1. Optimisation SQL initiale
     commandes_qs = Commande.objects.select_related('cityclimadetails', 'tapisdetails').all()
 
-    # 2. Récupération des filtres
-    search_query = request.GET.get('q', '')
-    type_filter = request.GET.get('type_commande', '')
-    statut_filter = request.GET.get('statut', '')
-    nom_filter = request.GET.get('nom_client', '')
-    numero_filter = request.GET.get('numero_client', '')
-    date_crea = request.GET.get('date_crea', '') 
-    date_debut = request.GET.get('date_debut', '') 
-    date_fin = request.GET.get('date_fin', '')     
-    fidelise_filter = request.GET.get('fidelise', '')
-
-    # 3. Application des filtres SQL
-    if search_query:
-        commandes_qs = commandes_qs.filter(
-            Q(nom_client__icontains=search_query) |
-            Q(numero_client__icontains=search_query) |
-            Q(localisation_client__icontains=search_query)
-        )
-    if type_filter:
-        commandes_qs = commandes_qs.filter(type_commande=type_filter)
-    
-    if nom_filter:
-        commandes_qs = commandes_qs.filter(nom_client__icontains=nom_filter)
-        
-    if numero_filter:
-        commandes_qs = commandes_qs.filter(numero_client__icontains=numero_filter)
-
-    if date_crea:
-        commandes_qs = commandes_qs.filter(date_creation__date=date_crea)
+    # 2. Filtres (communs avec l'export, voir filtres.py)
+    filtres = lire_filtres(request.GET)
+    commandes_qs = filtrer_commandes(commandes_qs, filtres)
 
-    if statut_filter:
-        commandes_qs = commandes_qs.filter(
-            Q(tapisdetails__statut=statut_filter) | 
-            Q(cityclimadetails__satisfaction=statut_filter)
-        )
-
-    if fidelise_filter == "oui":
-        commandes_qs = commandes_qs.filter(Q(cityclimadetails__fidelise=True) | Q(tapisdetails__fidelise=True))
-    elif fidelise_filter == "non":
-        commandes_qs = commandes_qs.filter(Q(cityclimadetails__fidelise=False) | Q(tapisdetails__fidelise=False))
-
-    # 4. Conversion en liste pour le TRI MÉTIER (Dates hybrides)
-    commandes_list = list(commandes_qs.distinct())
+    # 3. Pagination : plus récent au plus ancien (id pour départager les égalités)
+    # Numérotée pour les petits résultats, par curseur au-delà
+    page_obj = paginer(request, commandes_qs, 10, ORDRE_FICHES)
 
-    def obtenir_date_tri(cmd):
-        """Récupère la date d'opération selon le type"""
-        try:
-            if cmd.type_commande == 'TAPISPROP' and hasattr(cmd, 'tapisdetails') and cmd.tapisdetails:
-                return cmd.tapisdetails.date_ramassage or cmd.date_creation.date()
-            if hasattr(cmd, 'cityclimadetails') and cmd.cityclimadetails:
-                return cmd.cityclimadetails.date_intervention or cmd.date_creation.date()
-        except:
-            pass
-        return cmd.date_creation.date()
-
-    # Tri : Plus récent au plus ancien
-    commandes_list.sort(key=obtenir_date_tri, reverse=True)
-
-    # 5. Filtrage par PLAGE (Correction de l'AttributeError ici)
-    if date_debut or date_fin:
-        try:
-            # On utilise datetime.strptime car "from datetime import datetime" est utilisé
-            d_deb = datetime.strptime(date_debut, '%Y-%m-%d').date() if date_debut else None
-            d_fin = datetime.strptime(date_fin, '%Y-%m-%d').date() if date_fin else None
-            
-            commandes_list = [
-                c for c in commandes_list 
-                if (not d_deb or obtenir_date_tri(c) >= d_deb) and (not d_fin or obtenir_date_tri(c) <= d_fin)
-            ]
-        except (ValueError, TypeError):
-            pass
-
-    # 6. Pagination
-    paginator = Paginator(commandes_list, 10) 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    # 7. Contexte
+    # 4. Contexte
     context = {
         'commandes': page_obj,
         'today': timezone.now().date(),
-        'search_query': search_query,
-        'type_filter': type_filter,
-        'statut_filter': statut_filter,
-        'nom_filter': nom_filter,
-        'numero_filter': numero_filter,
-        'date_crea': date_crea,
-        'date_debut': date_debut,
-        'date_fin': date_fin,
-        'fidelise_filter': fidelise_filter,
+        'search_query': filtres['q'],
+        'type_filter': filtres['type_commande'],
+        'statut_filter': filtres['statut'],
+        'nom_filter': filtres['nom_client'],
+        'numero_filter': filtres['numero_client'],
+        'date_crea': filtres['date_crea'],
+        'date_debut': filtres['date_debut'],
+        'date_fin': filtres['date_fin'],
+        'fidelise_filter': filtres['fidelise'],
     }
     
     return render(request, 'index/liste_fiches.html', context)
 
 
 
+@login_required
+def infos_client(request):
+    """Client existant pour un numéro (saisie d'une nouvelle commande) : lecture par index unique."""
+    client = trouver_client(request.GET.get('numero', ''))
+    if client is None:
+        return JsonResponse({'existe': False})
+
+    historique = client.commandes.order_by('-date_creation').values(
+        'id', 'type_commande', 'date_creation', 'statut_code'
+    )[:5]
+    return JsonResponse({
+        'existe': True,
+        'nom': client.nom,
+        'localisation': client.localisation,
+        'nb_commandes': client.nb_commandes,
+        'date_derniere_commande': client.date_derniere_commande,
+        'valeur_totale': client.valeur_totale,
+        'historique': list(historique),
+    })
+
 @login_required
 def detail_fiche(request, fiche_id):
     commande = get_object_or_404(Commande, id=fiche_id)
@@ -523,12 +504,22 @@ def detail_fiche(request, fiche_id):
         messages.success(request, "La fiche a été mise à jour avec succès !")
         return redirect('detail_fiche', fiche_id=fiche_id)
 
+    # Historique du client (lecture par la clé étrangère indexée)
+    historique_client = []
+    if commande.client_id:
+        historique_client = (
+            Commande.objects.filter(client_id=commande.client_id).exclude(pk=commande.pk)
+            .order_by('-date_creation')[:5]
+        )
+
     # Contexte pour le rendu
     context = {
         'commande': commande,
         'cityclima': cityclima,
         'tapis': tapis,
         'factures': Facture.objects.filter(commande=commande).order_by('-date_emission'),
+        'client': commande.client,
+        'historique_client': historique_client,
     }
     return render(request, 'index/detail_fiche.html', context)
 @login_required
@@ -629,76 +620,36 @@ def alertes_fidelisation(request):
     # Construction du filtre de recherche
     search_filter = Q()
     if search_query:
-        search_filter = (Q(commande__nom_client__icontains=search_query) | 
-                         Q(commande__numero_client__icontains=search_query))
-                        
-    # 1. Récupération CITYPROP (> 180 jours)
-    city_qs = CityClimaDetails.objects.filter(
-        search_filter, 
-        fidelise=False,
-        commande__type_commande='CITYPROP',
-        date_intervention__lte=now - timedelta(days=180)
-    ).select_related('commande')
-
-    # 2. Récupération CLIMATISEUR (> 90 jours)
-    clima_qs = CityClimaDetails.objects.filter(
-        search_filter, 
-        fidelise=False,
-        commande__type_commande='CLIMATISEUR',
-        date_intervention__lte=now - timedelta(days=90)
-    ).select_related('commande')
-
-    # 3. Récupération TAPIS (> 180 jours après LIVRAISON)
-    tapis_qs = TapisDetails.objects.filter(
-        search_filter, 
-        fidelise=False,
-        statut__in=['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT'],
-        date_livraison__lte=now - timedelta(days=180)
-    ).select_related('commande')
-
-    alertes_list = []
-    
-    # Normalisation
-    for obj in city_qs:
-        alertes_list.append({
-            'id': obj.id,
-            'type': "CITYPROP",
-            'nom_client': obj.commande.nom_client,
-            'numero_client': obj.commande.numero_client,
-            'date_cle': obj.date_intervention,
-            'url_commande': obj.commande.id,
-        })
-
-    for obj in clima_qs:
-        alertes_list.append({
-            'id': obj.id,
-            'type': "CLIMATISEUR",
-            'nom_client': obj.commande.nom_client,
-            'numero_client': obj.commande.numero_client,
-            'date_cle': obj.date_intervention,
-            'url_commande': obj.commande.id,
-        })
-        
-    for obj in tapis_qs:
-        alertes_list.append({
-            'id': obj.id,
-            'type': "TAPISPROP",
-            'nom_client': obj.commande.nom_client,
-            'numero_client': obj.commande.numero_client,
-            'date_cle': obj.date_livraison, 
-            'url_commande': obj.commande.id,
-        })
-        
-    # Tri par date (la plus ancienne en haut)
-    alertes_list.sort(key=lambda x: x['date_cle'] if x['date_cle'] else now)
-    
-    # PAGINATION MISE À JOUR : 7 éléments par page
-    paginator = Paginator(alertes_list, 7) 
-    page_obj = paginator.get_page(page_number)
+        search_filter = filtre_recherche(search_query)
+
+    # Une seule requête sur Commande : CITYPROP, CLIMATISEUR (échéance après intervention)
+    # et TAPIS (échéance après LIVRAISON), via les règles du registre d'alertes
+    alerte_tapis = Q(tapisdetails__in=requete_alerte('alertes_tapis_fidelisation', now))
+    alertes = Commande.objects.filter(
+        Q(cityclimadetails__in=requete_alerte('alertes_city', now)) |
+        Q(cityclimadetails__in=requete_alerte('alertes_clima', now)) |
+        alerte_tapis
+    ).filter(search_filter).annotate(
+        alerte_id=Case(When(alerte_tapis, then='tapisdetails__id'), default='cityclimadetails__id'),
+        date_cle=Case(When(alerte_tapis, then='tapisdetails__date_livraison'), default='cityclimadetails__date_intervention'),
+    ).values('id', 'alerte_id', 'type_commande', 'nom_client', 'numero_client', 'date_cle')
+
+    # PAGINATION : 7 éléments par page, la plus ancienne en haut
+    page_obj = paginer(request, alertes, 7, ('date_cle', 'id'))
+
+    # Normalisation (uniquement les lignes de la page)
+    page_obj.object_list = [{
+        'id': a['alerte_id'],
+        'type': a['type_commande'],
+        'nom_client': a['nom_client'],
+        'numero_client': a['numero_client'],
+        'date_cle': a['date_cle'],
+        'url_commande': a['id'],
+    } for a in page_obj.object_list]
 
     context = {
         "page_obj": page_obj,
-        "total_alertes": len(alertes_list),
+        "total_alertes": page_obj.total,
         "search_query": search_query,
     }
     return render(request, "index/fidelisation.html", context)
@@ -831,13 +782,6 @@ def alertes_tapis_retard(request):
 
     today = timezone.now().date()
 
-    # Statuts qui stoppent l'alerte
-    STATUTS_FINAUX = [
-       'LIVRE_SATISFAIT',
-        'LIVRE_INSATISFAIT',
-        'ABANDON'
-    ]
-
     # =========================
     # FILTRES (GET)
     # =========================
@@ -846,24 +790,15 @@ def alertes_tapis_retard(request):
     nb_tapis = request.GET.get("nb_tapis", "")
 
     # =========================
-    # QUERYSET DE BASE
+    # QUERYSET DE BASE (échéance de retard dépassée, statuts finaux exclus)
     # =========================
-    alertes = TapisDetails.objects.filter(
-        date_ramassage__isnull=False,
-        date_ramassage__lte=today - timedelta(days=11)
-    ).exclude(
-        statut__in=STATUTS_FINAUX
-    )
+    alertes = requete_alerte('alertes_tapis_retard', today)
 
     # =========================
     # RECHERCHE GLOBALE
     # =========================
     if search:
-        alertes = alertes.filter(
-            Q(commande__nom_client__icontains=search) |
-            Q(commande__numero_client__icontains=search) |
-            Q(commande__localisation_client__icontains=search)
-        )
+        alertes = alertes.filter(filtre_recherche(search, 'commande_id'))
 
     # =========================
     # FILTRES SPÉCIFIQUES
@@ -874,19 +809,15 @@ def alertes_tapis_retard(request):
     if nb_tapis:
         alertes = alertes.filter(nombre_tapis=nb_tapis)
 
-    alertes = alertes.order_by("-date_ramassage")
-
     # =========================
-    # PAGINATION
+    # PAGINATION (10 lignes / page, plus récent en haut)
     # =========================
-    paginator = Paginator(alertes, 10)  # 10 lignes / page
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginer(request, alertes.select_related("commande"), 10, ("-date_ramassage", "-id"))
 
     context = {
         "alertes": page_obj,
         "page_obj": page_obj,
-        "total_alertes": alertes.count(),
+        "total_alertes": page_obj.total,
 
         # valeurs filtres
         "search": search,
@@ -982,125 +913,52 @@ def detail_alerte_tapis(request, id):
 
     return render(request, "index/detail_alerte_tapis.html", context)
 
-@login_required
 @login_required
 def export_commandes_excel(request):
-    commandes = Commande.objects.all().order_by('-date_creation')
-
-    # ... (Gardez vos filtres existants ici sans changement) ...
-    # [Filtres type_filter, nom_filter, etc.]
+    # Mêmes paramètres GET et même ordre que liste_fiches : seules les lignes filtrées sont exportées
+    commandes = filtrer_commandes(Commande.objects.all(), lire_filtres(request.GET)).order_by(*ORDRE_FICHES)
+
+    # Une requête jointe lue par paquets, classeur en écriture seule (voir exports.py)
+    fichier = ecrire_xlsx(lignes_export(commandes))
+    return FileResponse(
+        fichier, as_attachment=True, filename="export_complet_cityprop.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Commandes Détaillées"
-
-    # 🎨 Styles
-    header_fill = PatternFill(start_color="157347", end_color="157347", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-    center = Alignment(vertical="center", horizontal="center", wrap_text=True)
-
-    # 📌 Nouveaux En-têtes (Tous les champs)
-    headers = [
-        "Client", "Numéro", "Localisation", "Type", "Date Création",
-        "Désignation / Détails", "Coût (FCFA)", "Date Intervention / Ramassage",
-        "Fin de Traitement", "Prévu Livraison", "Livraison Réelle",
-        "Statut / Satisfaction", "Fidélisé", "Commentaire"
-    ]
-    ws.append(headers)
-
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = center
-
-    # 📊 Données
-    for c in commandes:
-        desig_details = "-"
-        cout = 0
-        date_1 = "-" # Intervention ou Ramassage
-        date_2 = "-" # Fin de Traitement (Tapis uniquement)
-        date_3 = "-" # Prévue (Tapis uniquement)
-        date_4 = "-" # Réelle (Tapis uniquement)
-        statut_text = "-"
-        fidelise = "Non"
-        comm = "-"
-
-        if c.type_commande in ["CITYPROP", "CLIMATISEUR"] and hasattr(c, "cityclimadetails"):
-            d = c.cityclimadetails
-            desig_details = d.designation or "Sans désignation"
-            cout = d.cout or 0
-            date_1 = d.date_intervention.strftime("%d/%m/%Y") if d.date_intervention else "-"
-            statut_text = d.get_satisfaction_display() if d.satisfaction else "-"
-            fidelise = "Oui" if d.fidelise else "Non"
-
-        elif c.type_commande == "TAPISPROP" and hasattr(c, "tapisdetails"):
-            t = c.tapisdetails
-            desig_details = f"{t.nombre_tapis} tapis"
-            cout = t.cout or 0
-            date_1 = t.date_ramassage.strftime("%d/%m/%Y") if t.date_ramassage else "-"
-            date_2 = t.date_traitement.strftime("%d/%m/%Y") if t.date_traitement else "-"
-            date_3 = t.date_prevue_livraison.strftime("%d/%m/%Y") if t.date_prevue_livraison else "-"
-            date_4 = t.date_livraison.strftime("%d/%m/%Y") if t.date_livraison else "-"
-            statut_text = t.get_statut_display()
-            fidelise = "Oui" if t.fidelise else "Non"
-            comm = t.commentaire or "-"
 
-        ws.append([
-            c.nom_client,
-            c.numero_client,
-            c.localisation_client,
-            c.type_commande,
-            c.date_creation.strftime("%d/%m/%Y"),
-            desig_details,
-            cout,
-            date_1,
-            date_2,
-            date_3,
-            date_4,
-            statut_text,
-            fidelise,
-            comm
-        ])
+@login_required
+def export_donnees(request, jeu, format_fichier):
+    """
+    Exports analytiques typés (commandes + détails, factures, caisse) :
+    CSV en flux, ou Parquet / Feather (pyarrow). Les commandes acceptent les
+    filtres de liste_fiches ; factures et caisse acceptent date_debut / date_fin.
+    """
+    if jeu not in JEUX or format_fichier not in FORMATS_ANALYTIQUES:
+        raise Http404("Export inconnu.")
+    nom = f"{jeu}_{timezone.localdate():%Y%m%d}.{format_fichier}"
 
-    # 📐 Ajustement automatique des colonnes (Largeurs adaptées)
-    widths = [20, 15, 25, 12, 12, 35, 12, 15, 15, 15, 15, 20, 10, 30]
-    for i, w in enumerate(widths, start=1):
-        ws.column_dimensions[get_column_letter(i)].width = w
+    if format_fichier == 'csv':
+        response = StreamingHttpResponse(flux_csv(jeu, request.GET), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{nom}"'
+        return response
 
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = 'attachment; filename="export_complet_cityprop.xlsx"'
-    wb.save(response)
-    return response
+    try:
+        fichier = ecrire_arrow(jeu, request.GET, format_fichier)
+    except ImportError:
+        return HttpResponse(
+            "Export Parquet / Feather indisponible : installer pyarrow (pip install pyarrow).",
+            status=501, content_type='text/plain; charset=utf-8',
+        )
+    return FileResponse(fichier, as_attachment=True, filename=nom, content_type='application/octet-stream')
 
 @login_required
 def alertes_counts(request):
-    today = timezone.now().date()
-    
-    # 1. Alertes Fidélisation (Global : City, Clima et Tapis livrés depuis longtemps)
-    count_city = CityClimaDetails.objects.filter(
-        fidelise=False, commande__type_commande='CITYPROP', 
-        date_intervention__lte=today - timedelta(days=180)).count()
-    
-    count_clima = CityClimaDetails.objects.filter(
-        fidelise=False, commande__type_commande='CLIMATISEUR', 
-        date_intervention__lte=today - timedelta(days=90)).count()
-        
-    count_tapis_fid = TapisDetails.objects.filter(
-        fidelise=False, statut__in=['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT'],
-        date_livraison__lte=today - timedelta(days=180)).count()
-
-    # 2. Alertes Retard Tapis (Tapis ramassés mais non livrés après 7 jours)
-    alertes_tapis_retard = TapisDetails.objects.filter(
-        date_ramassage__isnull=False,
-        date_ramassage__lte=today - timedelta(days=7)
-    ).exclude(statut__in=['LIVRE_SATISFAIT', 'LIVRE_INSATISFAIT', 'ABANDON']).count()
+    # Mêmes règles et délais que la barre latérale (registre gestion/alertes.py)
+    compteurs = calculer_compteurs()
 
     return {
-        'total_fidelisation': count_city + count_clima + count_tapis_fid,
-        'alertes_tapis_retard': alertes_tapis_retard,
+        'total_fidelisation': compteurs['alertes_city'] + compteurs['alertes_clima'] + compteurs['alertes_tapis_fidelisation'],
+        'alertes_tapis_retard': compteurs['alertes_tapis_retard'],
     }
 
 @login_required
@@ -1178,11 +1036,7 @@ def listes_tapis_abandon(request):
 
     # Recherche globale (client, numéro, localisation)
     if search:
-        commandes = commandes.filter(
-            Q(commande__nom_client__icontains=search) |
-            Q(commande__numero_client__icontains=search) |
-            Q(commande__localisation_client__icontains=search)
-        )
+        commandes = commandes.filter(filtre_recherche(search, 'commande_id'))
 
     # Filtre date de ramassage
     if date_ramassage:
@@ -1192,19 +1046,15 @@ def listes_tapis_abandon(request):
     if nb_tapis:
         commandes = commandes.filter(nombre_tapis=nb_tapis)
 
-    commandes = commandes.order_by("-date_ramassage")
-
     # =========================
-    # PAGINATION
+    # PAGINATION (10 lignes par page, plus récent en haut)
     # =========================
-    paginator = Paginator(commandes, 10)  # 10 lignes par page
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginer(request, commandes.select_related("commande"), 10, ("-date_ramassage", "-id"))
 
     context = {
         "commandes": page_obj,
         "page_obj": page_obj,
-        "total_abandons": commandes.count(),
+        "total_abandons": page_obj.total,
 
         # garder les valeurs des filtres
         "search": search,
@@ -1220,111 +1070,48 @@ def dashboard_financier(request):
     # 1. Base : Uniquement les factures avec optimisation de la base de données
     queryset = Facture.objects.filter(type_document='FACTURE').select_related('commande').order_by('-date_emission')
 
-    # 2. Récupération des filtres
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
-    type_cmd = request.GET.get('type_commande')
-    search_name = request.GET.get('search_name')
-
-    # 3. Validation de l'intervalle de date (Sécurité Serveur)
-    if start_date and end_date:
-        if start_date > end_date:
-            messages.error(request, "Incohérence : La date 'Du' est supérieure à la date 'Au'.")
-            start_date = end_date = None  # Réinitialisation en cas d'erreur
-        else:
-            queryset = queryset.filter(date_emission__range=[start_date, end_date])
-    elif start_date:
-        queryset = queryset.filter(date_emission__gte=start_date)
-    elif end_date:
-        queryset = queryset.filter(date_emission__lte=end_date)
-
-    # 4. Filtre par type et recherche par nom/numéro
-    if type_cmd:
-        queryset = queryset.filter(commande__type_commande=type_cmd)
-    
-    if search_name:
-        queryset = queryset.filter(
-            Q(commande__nom_client__icontains=search_name) | 
-            Q(numero_document__icontains=search_name)
-        )
+    # 2. Filtres (communs avec l'archive ZIP, voir filtres.py)
+    filtres = lire_filtres_factures(request.GET)
+    if filtres['periode_inversee']:
+        messages.error(request, "Incohérence : La date 'Du' est supérieure à la date 'Au'.")
+    queryset = filtrer_factures(queryset, filtres)
 
-    # 5. Calcul du montant total filtré (Le "coût" pour le client sur la période)
-    total_periode = queryset.aggregate(Sum('montant_final_net'))['montant_final_net__sum'] or 0
-    count_factures = queryset.count()
+    # 3. Calcul du montant total filtré (Le "coût" pour le client sur la période)
+    # (somme et nombre dans le même agrégat, le nombre est réutilisé par la pagination)
+    agregats = queryset.aggregate(total=Sum('montant_final_net'), nombre=Count('id'))
+    total_periode = agregats['total'] or 0
+    count_factures = agregats['nombre']
 
-    # 6. Pagination compacte (15 par page)
-    paginator = Paginator(queryset, 7)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 4. Pagination compacte (7 par page, plus récente en haut)
+    page_obj = paginer(request, queryset, 7, ('-date_emission', '-id'), total=count_factures)
 
     context = {
         'factures': page_obj,
         'total_encaisse': total_periode,
         'nombre_factures': count_factures,
-        'start_date': start_date,
-        'end_date': end_date,
-        'type_cmd': type_cmd,
-        'search_name': search_name,
+        'start_date': filtres['start_date'],
+        'end_date': filtres['end_date'],
+        'type_cmd': filtres['type_commande'],
+        'search_name': filtres['search_name'],
         'type_choices': ['CITYPROP', 'CLIMATISEUR', 'TAPISPROP']
     }
     return render(request, 'index/dashboard_financier.html', context)
 
-@login_required
-@user_passes_test(lambda u: u.is_staff) # Remplacez par votre test is_admin
-def gestion_caisse(request):
-    # 1. Gestion des dates
-    maintenant = timezone.now()
-    mois_id = int(request.GET.get('mois', maintenant.month))
-    annee_id = int(request.GET.get('annee', maintenant.year))
-
-    mois_noms = {
-        1: "Janvier", 2: "Février", 3: "Mars", 4: "Avril", 5: "Mai", 6: "Juin",
-        7: "Juillet", 8: "Août", 9: "Septembre", 10: "Octobre", 11: "Novembre", 12: "Décembre"
-    }
 
-    # 2. Calcul du Report (Solde des mois précédents)
-    date_debut_mois = maintenant.replace(year=annee_id, month=mois_id, day=1, hour=0, minute=0, second=0, microsecond=0)
-    mouvements_passes = OperationCaisse.objects.filter(date__lt=date_debut_mois)
-    entrees_total = mouvements_passes.filter(type_mouvement='ENTREE').aggregate(Sum('montant'))['montant__sum'] or 0
-    sorties_total = mouvements_passes.filter(type_mouvement='SORTIE').aggregate(Sum('montant'))['montant__sum'] or 0
-    report_solde = entrees_total - sorties_total
+@login_required
+@user_passes_test(is_admin)
+def factures_zip(request):
+    """
+    Toutes les factures filtrées du tableau de bord financier, en une archive
+    ZIP de PDF rendue par le travailleur (suivie comme les autres tâches PDF).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Méthode non autorisée.'}, status=405)
+    filtres = lire_filtres_factures(request.GET)
+    parametres = {nom: filtres[nom] for nom in PARAMETRES_FACTURES}
+    return _tache_pdf_creee(creer_tache_pdf('ARCHIVE', parametres, request.user))
 
-    # 3. Préparer le Queryset filtré
-    queryset_filtre = OperationCaisse.objects.filter(
-        date__month=mois_id, 
-        date__year=annee_id
-    ).order_by('date', 'id')
 
-    # Configuration du FormSet (extra=0 pour éviter les lignes vides fantômes)
-    CaisseFormSet = modelformset_factory(
-        OperationCaisse, 
-        fields=('date', 'equipe', 'libelle', 'type_mouvement', 'montant'), 
-        extra=0, 
-        can_delete=True
-    )
-    
-    # 4. Traitement du formulaire
-    if request.method == 'POST':
-        formset = CaisseFormSet(request.POST, queryset=queryset_filtre) 
-        if formset.is_valid():
-            formset.save() 
-            messages.success(request, f"Brouillard de {mois_noms[mois_id]} mis à jour avec succès !")
-            # Redirection indispensable pour éviter le message de renvoi de formulaire au rafraîchissement
-            return redirect(f'/caisse/?mois={mois_id}&annee={annee_id}')
-        else:
-            messages.error(request, "Erreur de validation. Vérifiez que tous les champs obligatoires sont remplis.")
-    else:
-        formset = CaisseFormSet(queryset=queryset_filtre)
-        
-    context = {
-        'formset': formset,
-        'report_solde': report_solde,
-        'mois_actuel_nom': mois_noms[mois_id],
-        'mois_actuel_id': mois_id,
-        'annee_actuelle': annee_id,
-        'liste_mois': mois_noms,
-    }
-    return render(request, 'index/gestion_caisse.html', context)
 # --- GENERATION EXCEL ---
 
 from openpyxl.utils import get_column_letter
@@ -1333,15 +1120,12 @@ from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
 @login_required
 @user_passes_test(is_admin)
 def export_caisse_excel(request, mois, annee):
-    mouvements = OperationCaisse.objects.filter(date__month=mois, date__year=annee).order_by('date', 'id')
     nom_mois = dict(LISTE_MOIS).get(int(mois))
 
-    # Calcul du report
-    date_debut_mois = timezone.now().replace(year=int(annee), month=int(mois), day=1, hour=0, minute=0)
-    mouvements_passes = OperationCaisse.objects.filter(date__lt=date_debut_mois)
-    entrees_p = mouvements_passes.filter(type_mouvement='ENTREE').aggregate(Sum('montant'))['montant__sum'] or 0
-    sorties_p = mouvements_passes.filter(type_mouvement='SORTIE').aggregate(Sum('montant'))['montant__sum'] or 0
-    report_solde = entrees_p - sorties_p
+    # Report : clôture du mois, ou solde historique avant le mois
+    report_solde = bilan_mois(annee, mois).report
+    # Solde progressif par ligne calculé par la base (même requête que le PDF)
+    mouvements = operations_mois(annee, mois, report_solde)
 
     wb = Workbook()
     ws = wb.active
@@ -1388,11 +1172,9 @@ def export_caisse_excel(request, mois, annee):
         if cell.column == 8: cell.font = Font(bold=True)
 
     # --- DONNÉES ---
-    solde_courant = report_solde
     for i, m in enumerate(mouvements, 1):
         entree = m.montant if m.type_mouvement == 'ENTREE' else 0
         sortie = m.montant if m.type_mouvement == 'SORTIE' else 0
-        solde_courant += (entree - sortie)
 
         ws.append([
             i,
@@ -1402,7 +1184,7 @@ def export_caisse_excel(request, mois, annee):
             "",
             entree if entree > 0 else "",
             sortie if sortie > 0 else "",
-            solde_courant
+            m.solde_prog
         ])
         for cell in ws[ws.max_row]: cell.border = thin_border
 
@@ -1422,57 +1204,72 @@ def export_caisse_excel(request, mois, annee):
 @login_required
 @user_passes_test(is_admin)
 def export_caisse_pdf(request, mois, annee):
-    # 1. Récupération des mouvements du mois
-    mouvements = OperationCaisse.objects.filter(
-        date__month=mois, 
-        date__year=annee
-    ).order_by('date', 'id')
-    
-    # 2. Calcul du report initial (Cumul des mois précédents)
-    date_debut_mois = timezone.now().replace(year=int(annee), month=int(mois), day=1, hour=0, minute=0)
-    prev = OperationCaisse.objects.filter(date__lt=date_debut_mois)
-    entrees_p = prev.filter(type_mouvement='ENTREE').aggregate(Sum('montant'))['montant__sum'] or 0
-    sorties_p = prev.filter(type_mouvement='SORTIE').aggregate(Sum('montant'))['montant__sum'] or 0
-    report_solde = float(entrees_p - sorties_p)
-
-    # 3. Calcul du solde progressif par ligne
-    solde_courant = report_solde
-    for m in mouvements:
-        montant = float(m.montant) if m.montant else 0.0
-        if m.type_mouvement == 'ENTREE':
-            solde_courant += montant
-        else:
-            solde_courant -= montant
-        m.solde_prog = solde_courant
-
-    # 4. Contexte pour le template
-    context = {
-        'mouvements': mouvements,
-        'mois_nom': dict(LISTE_MOIS).get(int(mois), "Inconnu"),
-        'annee': annee,
-        'report_solde': report_solde,
-    }
-    
-    # 5. Rendu du PDF
-    template = get_template('index/pdf_template.html')
-    html = template.render(context)
-    result = BytesIO()
-    
-    # xhtml2pdf génère le PDF à partir du HTML encodé
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
+    # Mouvements, report et solde progressif (voir caisse.py), rendu par le moteur PDF configuré
+    contenu = rendre_pdf(GABARIT_BROUILLARD, contexte_brouillard(mois, annee))
+    if contenu is not None:
+        response = HttpResponse(contenu, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="Brouillard_{mois}_{annee}.pdf"'
         return response
-    
+
     return HttpResponse("Erreur technique lors de la génération du PDF", status=500)
 
-LISTE_MOIS = [
-    (1, 'JAN'), (2, 'FÉV'), (3, 'MAR'), (4, 'AVR'),
-    (5, 'MAI'), (6, 'JUN'), (7, 'JUL'), (8, 'AOÛ'),
-    (9, 'SEP'), (10, 'OCT'), (11, 'NOV'), (12, 'DÉC')
-]
+
+# --- PDF EN ARRIÈRE-PLAN (mise en file, état, téléchargement) ---
+def _tache_pdf_creee(tache):
+    return JsonResponse({
+        'status': 'success',
+        'tache_id': tache.pk,
+        'url_etat': reverse('etat_tache_pdf', args=[tache.pk]),
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def export_caisse_pdf_tache(request, mois, annee):
+    # Même document que export_caisse_pdf, rendu par "manage.py traiter_taches"
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Méthode non autorisée.'}, status=405)
+    if not 1 <= mois <= 12:
+        return JsonResponse({'status': 'error', 'message': 'Mois invalide.'}, status=400)
+    return _tache_pdf_creee(creer_tache_pdf('BROUILLARD', {'mois': mois, 'annee': annee}, request.user))
+
+
+@login_required
+def telecharger_devis_pdf_tache(request, facture_id):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Méthode non autorisée.'}, status=405)
+    facture = get_object_or_404(Facture.objects.only('id'), id=facture_id)
+    return _tache_pdf_creee(creer_tache_pdf('FACTURE', {'facture_id': facture.pk}, request.user))
+
+
+@login_required
+def etat_tache_pdf(request, tache_id):
+    tache = get_object_or_404(TachePDF.objects.defer('contenu'), pk=tache_id)
+    if tache.utilisateur_id not in (None, request.user.pk) and not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Accès refusé.'}, status=403)
+    if tache.statut == 'EN_COURS' and expirer_taches():
+        tache.refresh_from_db(fields=['statut', 'message'])
+    return JsonResponse({
+        'status': 'success',
+        'statut': tache.statut,
+        'terminee': tache.terminee,
+        'message': tache.message,
+        'url_telechargement': reverse('telecharger_tache_pdf', args=[tache.pk])
+        if tache.statut == 'TERMINE' else None,
+    })
+
+
+@login_required
+def telecharger_tache_pdf(request, tache_id):
+    tache = get_object_or_404(TachePDF, pk=tache_id, statut='TERMINE')
+    if tache.utilisateur_id not in (None, request.user.pk) and not request.user.is_staff:
+        return HttpResponse(status=403)
+    contenu = bytes(tache.contenu)
+    response = HttpResponse(contenu, content_type=tache.type_contenu)
+    response['Content-Disposition'] = f'attachment; filename="{tache.nom_fichier}"'
+    response['Content-Length'] = len(contenu)
+    return response
+
 
 @login_required
 @user_passes_test(is_admin)
@@ -1484,33 +1281,29 @@ def gestion_caisse(request):
         mois_id = timezone.now().month
         annee = timezone.now().year
 
-    queryset = OperationCaisse.objects.filter(
-        date__month=mois_id, date__year=annee
-    ).order_by('date', 'id')
+    # Solde ligne (cumul du mois) calculé par la base ; le JS le recalcule en saisie
+    queryset = operations_mois(annee, mois_id)
 
-    stats_annee = OperationCaisse.objects.filter(date__year=annee).aggregate(
-        total_in=Sum('montant', filter=Q(type_mouvement='ENTREE')),
-        total_out=Sum('montant', filter=Q(type_mouvement='SORTIE'))
-    )
-    
-    solde_annuel = (stats_annee['total_in'] or 0) - (stats_annee['total_out'] or 0)
+    # Mois clôturés lus dans leurs clôtures, mois ouverts agrégés sur leur plage
+    bilan = bilan_mois(annee, mois_id)
+    cumul_annuel = solde_annuel(annee)
 
     CaisseFormSet = modelformset_factory(
         OperationCaisse,
         fields=('date', 'equipe', 'libelle', 'type_mouvement', 'montant'),
-        extra=0, can_delete=True
+        formset=FormSetBrouillard, extra=0, can_delete=True
     )
 
     if request.method == 'POST':
         formset = CaisseFormSet(request.POST, queryset=queryset)
         if formset.is_valid():
-            instances = formset.save(commit=False)
-            for obj in formset.deleted_objects:
-                obj.delete()
-            for instance in instances:
-                if instance.date.month == mois_id and instance.date.year == annee:
-                    instance.save()
-            messages.success(request, "Enregistrement réussi.")
+            # Lignes modifiées uniquement, en masse et dans une transaction (voir caisse.py)
+            ecritures = enregistrer_brouillard(formset, annee, mois_id)
+            total = sum(ecritures.values())
+            messages.success(request, (
+                f"Enregistrement réussi : {total} ligne(s) écrite(s) ({ecritures['ajoutees']} ajoutée(s), "
+                f"{ecritures['modifiees']} modifiée(s), {ecritures['supprimees']} supprimée(s))."
+            ) if total else "Aucune modification à enregistrer.")
             return redirect(f"{reverse('gestion_caisse')}?mois={mois_id}&annee={annee}")
 
     formset = CaisseFormSet(queryset=queryset)
@@ -1520,117 +1313,98 @@ def gestion_caisse(request):
         'mois_actuel_id': mois_id,
         'annee_actuelle': annee,
         'liste_mois': dict(LISTE_MOIS),
-        'solde_annuel': solde_annuel,
+        'solde_annuel': cumul_annuel,
+        'bilan': bilan,
     })
-    
 
-# Dictionnaire de correspondance (Label Excel -> Code Base de données)
-TRADUCTION_STATUTS = {
-    'En cours': 'NON_RESPECTE',
-    'En attente': 'PRET',
-    'Tapis prêt Client indisponible': 'CLIENT_INDISPO',
-    'Livré - Client satisfait': 'LIVRE_SATISFAIT',
-    'Livré - Client insatisfait': 'LIVRE_INSATISFAIT',
-    'Tapis abandonné': 'ABANDON',
-    'OK': 'OK',
-    'KO_Retouche': 'KO_RET',
-    'KO_Refus': 'KO_REFUS'
-}
+
+@login_required
+@user_passes_test(is_admin)
+def cloturer_caisse(request, mois, annee):
+    """Clôture (ou clôture à nouveau) le mois : report, entrées, sorties et solde figés."""
+    if request.method == 'POST' and 1 <= mois <= 12:
+        cloture = cloturer_mois(annee, mois, request.user)
+        messages.success(
+            request, f"Mois {dict(LISTE_MOIS)[mois]} {annee} clôturé : solde {cloture.solde_cloture:,.0f} FCFA."
+        )
+    return redirect(f"{reverse('gestion_caisse')}?mois={mois}&annee={annee}")
+    
 
 @login_required
 def import_commandes_ajax(request):
-    if request.method == 'POST' and request.FILES.get('file'):
+    # Le fichier est mis en file d'attente : le traitement (validation pandas,
+    # insertions par lots) est fait par "manage.py traiter_taches".
+    # mode=verification : contrôle à blanc ; jeton : import d'un fichier déjà vérifié.
+    if request.method == 'POST' and (request.FILES.get('file') or request.POST.get('jeton')):
         try:
-            file = request.FILES['file']
-            df = pd.read_excel(file)
-            df.columns = [c.strip() for c in df.columns]
-            df = df.replace({pd.NA: None, float('nan'): None}) 
-
-            count = 0
-            doublons_ignores = 0
-            
-            with transaction.atomic():
-                for index, row in df.iterrows():
-                    line_num = index + 2 
-
-                    # --- 1. RÉCUPÉRATION ET VALIDATION DATE (OBLIGATOIRE) ---
-                    raw_date_crea = row.get('Date')
-                    if not raw_date_crea:
-                        raise ValueError(f"Ligne {line_num}: La 'Date' (Création) est obligatoire.")
-                    
-                    try:
-                        date_enregistre = pd.to_datetime(raw_date_crea).date()
-                    except:
-                        raise ValueError(f"Ligne {line_num}: Format de Date '{raw_date_crea}' invalide.")
-
-                    # --- 2. AUTRES PILIERS ---
-                    nom = str(row.get('Nom Client') or '').strip()
-                    num = str(row.get('Numéro Client') or '').strip()
-                    loc = str(row.get('Localisation') or '').strip()
-                    raw_type = str(row.get('Type Commande') or '').strip().upper()
-
-                    if not all([nom, num, loc, raw_type]):
-                        raise ValueError(f"Ligne {line_num}: Nom, Numéro, Localisation et Type sont obligatoires.")
-
-                    # --- 3. GESTION DES DOUBLONS ---
-                    if Commande.objects.filter(nom_client=nom, numero_client=num, 
-                                            date_creation=date_enregistre, type_commande=raw_type).exists():
-                        doublons_ignores += 1
-                        continue
-
-                    # --- 4. CRÉATION DE LA COMMANDE ---
-                    commande = Commande.objects.create(
-                        nom_client=nom, numero_client=num,
-                        localisation_client=loc, type_commande=raw_type,
-                        date_creation=date_enregistre
-                    )
-
-                    # --- 5. GESTION DES DÉTAILS ---
-                    is_fidelise = str(row.get('Fidélisé') or '').strip().lower() in ['oui', 'yes', 'true', '1']
-                    
-                    def get_opt_date(val):
-                        if val is None or str(val).strip() == '': return None
-                        try: return pd.to_datetime(val).date()
-                        except: return None
-
-                    # Traduction du statut Excel -> Code technique
-                    statut_label = str(row.get('Satisfaction / Statut') or 'En cours').strip()
-                    statut_technique = TRADUCTION_STATUTS.get(statut_label, 'NON_RESPECTE')
-
-                    if raw_type in ['CITYPROP', 'CLIMATISEUR']:
-                        CityClimaDetails.objects.create(
-                            commande=commande,
-                            date_intervention=get_opt_date(row.get('Date Intervention')) or date_enregistre,
-                            fidelise=is_fidelise,
-                            satisfaction=statut_technique
-                        )
-                    
-                    elif raw_type == 'TAPISPROP':
-                        try:
-                            nb = int(float(row.get('Tapis (Nb)') or 0))
-                            prix = float(row.get('Coût') or 0)
-                        except: nb, prix = 0, 0
-
-                        TapisDetails.objects.create(
-                            commande=commande,
-                            fidelise=is_fidelise,
-                            nombre_tapis=nb,
-                            cout=prix,
-                            date_ramassage=get_opt_date(row.get('Date Ramassage')) or date_enregistre,
-                            date_traitement=get_opt_date(row.get('Date Fin Traitement')),
-                            date_livraison=get_opt_date(row.get('Date Livraison')),
-                            statut=statut_technique,
-                            commentaire=str(row.get('Commentaire') or '').strip()
-                        )
-                    count += 1
-
-            return JsonResponse({'status': 'success', 'message': f'{count} importés, {doublons_ignores} doublons ignorés.'})
+            if request.POST.get('jeton'):
+                tache = creer_import_verifie(request.POST['jeton'], request.user)
+            else:
+                tache = creer_tache_import(
+                    request.FILES['file'], request.user,
+                    verification=request.POST.get('mode') == 'verification',
+                )
         except ValueError as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'message': f"Erreur: {str(e)}"}, status=400)
+        return JsonResponse({
+            'status': 'success',
+            'tache_id': tache.pk,
+            'url_progression': reverse('progression_import', args=[tache.pk]),
+        })
     return JsonResponse({'status': 'error', 'message': 'Fichier manquant.'}, status=400)
 
+
+@login_required
+def progression_import(request, tache_id):
+    tache = get_object_or_404(TacheImport.objects.defer('fichier', 'lot_valide', 'rapport'), pk=tache_id)
+    if tache.utilisateur_id not in (None, request.user.pk) and not request.user.is_staff:
+        return JsonResponse({'status': 'error', 'message': 'Accès refusé.'}, status=403)
+    if tache.statut == 'EN_COURS' and expirer_taches():
+        tache.refresh_from_db(fields=['statut', 'message', 'date_fin'])
+
+    debit = None
+    if tache.date_debut and tache.lignes_traitees:
+        ecoule = ((tache.date_fin or timezone.now()) - tache.date_debut).total_seconds()
+        debit = round(tache.lignes_traitees / ecoule, 1) if ecoule > 0 else None
+
+    return JsonResponse({
+        'status': 'success',
+        'statut': tache.statut,
+        'terminee': tache.terminee,
+        'lignes_total': tache.lignes_total,
+        'lignes_traitees': tache.lignes_traitees,
+        'importes': tache.importes,
+        'doublons': tache.doublons,
+        'rejetees': tache.lignes_rejetees,
+        'mode': tache.mode,
+        'valides': tache.lignes_valides,
+        'avertissements': tache.avertissements,
+        'jeton': tache.jeton,
+        'url_rapport': reverse('rapport_import', args=[tache.pk])
+        if tache.mode == 'VERIFICATION' and tache.statut == 'TERMINE' else None,
+        'erreurs': tache.erreurs,
+        'message': tache.message,
+        'pourcentage': round(100 * tache.lignes_traitees / tache.lignes_total) if tache.lignes_total else 0,
+        'eta_secondes': tache.duree_restante(),
+        'lignes_par_seconde': debit,
+    })
+
+
+@login_required
+def rapport_import(request, tache_id):
+    """Classeur annoté d'une vérification à blanc (résultat et détail par ligne)."""
+    tache = get_object_or_404(
+        TacheImport.objects.only('utilisateur', 'nom_fichier', 'rapport'), pk=tache_id, mode='VERIFICATION'
+    )
+    if tache.utilisateur_id not in (None, request.user.pk) and not request.user.is_staff:
+        return HttpResponse(status=403)
+    nom = os.path.splitext(tache.nom_fichier)[0]
+    response = HttpResponse(
+        bytes(tache.rapport), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="verification_{nom}.xlsx"'
+    return response
+
 @login_required
 def generer_modele_excel(request):
     colonnes = [
@@ -1708,15 +1482,12 @@ def suivi_atelier_tapis(request):
 
     # On ne suit que ce qui est encore en atelier (NON_RESPECTE)
     tapis_list = TapisDetails.objects.filter(
-        statut__in=['NON_RESPECTE']
+        statut='NON_RESPECTE'  # égalité : index tapis_statut_traitement_idx
     ).select_related('commande')
 
     # 🔎 FILTRE NOM / NUMÉRO
     if query:
-        tapis_list = tapis_list.filter(
-            Q(commande__nom_client__icontains=query) |
-            Q(commande__numero_client__icontains=query)
-        )
+        tapis_list = tapis_list.filter(filtre_recherche(query, 'commande_id'))
 
     # 📅 FILTRE DATE (Basé sur date_traitement)
     if date_filtre:
@@ -1744,12 +1515,8 @@ def suivi_atelier_tapis(request):
                 Q(date_traitement__isnull=True)
             )
 
-    tapis_list = tapis_list.order_by('date_traitement')
-
-    # Pagination
-    paginator = Paginator(tapis_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination (échéance de traitement la plus proche en haut)
+    page_obj = paginer(request, tapis_list, 10, ('date_traitement', 'id'))
 
     return render(request, 'index/suivi_tapis.html', {
         'page_obj': page_obj
@@ -1760,25 +1527,20 @@ def suivi_retouche_clima(request):
     # Filtrer uniquement les clients acceptant une retouche
     retouches_list = CityClimaDetails.objects.filter(
         satisfaction='KO_RET'
-    ).select_related('commande').order_by('date_intervention')
+    ).select_related('commande')
 
     # Recherche par nom ou numéro
     query = request.GET.get('q', '').strip()
     if query:
-        retouches_list = retouches_list.filter(
-            Q(commande__nom_client__icontains=query) |
-            Q(commande__numero_client__icontains=query)
-        )
+        retouches_list = retouches_list.filter(filtre_recherche(query, 'commande_id'))
 
-    # Pagination de 8 éléments par page
-    paginator = Paginator(retouches_list, 8)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination de 8 éléments par page (intervention la plus ancienne en haut)
+    page_obj = paginer(request, retouches_list, 8, ('date_intervention', 'id'))
 
     return render(request, 'index/suivi_retouche.html', {
         'page_obj': page_obj,
         'query': query,
-        'total': retouches_list.count()
+        'total': page_obj.total
     })
 
     